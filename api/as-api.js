@@ -3,59 +3,248 @@ const app = express();
 const port = process.env.PORT || 3001;
 const bodyParser = require('body-parser');
 const { spawn } = require('child_process');
+const os = require('os');
+const readline = require('readline');
 const path = require("path");
 
 // Parse incoming request bodies in a middleware before your handlers
 app.use(bodyParser.urlencoded({ extended: true }));
 app.use(bodyParser.json());
 
-let pythonPath;
-process.env.PYTHONPATH = 'main_lon:main_lat';
+// python executable, number of warm python workers (see main_worker.py) and longest time one request may take
+const pythonCmd = process.env.PYTHON_CMD || 'py';
+const poolSize = parseInt(process.env.PY_WORKERS) || os.cpus().length;
+const jobTimeout = parseInt(process.env.PY_JOB_TIMEOUT_MS) || 120000;
+// workers that exit before they are ready are restarted after 1, 2, 4... seconds, the pool gives up after this many
+const maxSpawnFailures = 5;
 
-// Define your /process_data route
-app.post('/process_data',(req, res) => {
-    // Get the input data from the request body
-    let inputData = req.body;
-    let file1 = JSON.stringify(inputData.file1);
-    let file2 = JSON.stringify(inputData.file2);
-    let selected = parseInt(inputData.selected);
+// Pool of long-lived python workers, each one answers one request at a time
+class WorkerPool {
+    constructor(size) {
+        this.size = size;
+        this.workers = [];
+        this.queue = [];
+        this.nextId = 0;
+        // workers in a row that exited before being ready and workers waiting to be restarted
+        this.spawnFailures = 0;
+        this.restarting = 0;
+        for (let i = 0; i < size; i++) {
+            this.spawnWorker();
+        }
+    }
+
+    spawnWorker() {
+        const worker = {
+            process: spawn(pythonCmd, ['-m', 'main_worker'], { cwd: __dirname }),
+            job: null,
+            timer: null,
+            ready: false,
+            retired: false,
+        };
+
+        // the worker answers with one JSON object per line
+        readline.createInterface({ input: worker.process.stdout }).on('line', line => {
+            let message;
+            try {
+                message = JSON.parse(line);
+            } catch (e) {
+                console.log(`Worker ${worker.process.pid}: ${line}`);
+                return;
+            }
+            if (message.event === 'ready') {
+                worker.ready = true;
+                this.spawnFailures = 0;
+                return;
+            }
+            if (worker.job === null) {
+                return;
+            }
+            // streamed requests send one record per finished stage before their answer
+            if (message.record !== undefined) {
+                if (worker.job.onRecord) {
+                    worker.job.onRecord(message.record);
+                }
+                return;
+            }
+            const job = worker.job;
+            worker.job = null;
+            clearTimeout(worker.timer);
+            job.resolve(message);
+            this.dispatch();
+        });
+
+        worker.process.stderr.on('data', data => {
+            console.error(`Worker ${worker.process.pid}: ${data}`);
+        });
+
+        // restart crashed workers and fail the request they were serving
+        worker.process.on('exit', code => {
+            console.error(`Worker ${worker.process.pid} exited with code ${code}`);
+            this.retire(worker);
+        });
+
+        // the worker could not be started (python not found for example) or could not be killed,
+        // 'exit' is not always emitted after it
+        worker.process.on('error', err => {
+            console.error(`Python worker error: ${err.message}`);
+            this.retire(worker);
+        });
+
+        // writing a request to a worker that is gone, the request is failed by retire
+        worker.process.stdin.on('error', err => {
+            console.error(`Could not send the request to the python worker: ${err.message}`);
+        });
 
-    if (selected === 0) {
-        pythonPath = 'main_lon'
+        this.workers.push(worker);
     }
-    else if (selected === 1) {
-        pythonPath = 'main_lat'
+
+    // remove a worker from the pool, fail its request and start a new worker (once per worker)
+    // until maxSpawnFailures workers in a row could not start (python not found for example)
+    retire(worker) {
+        if (worker.retired) {
+            return;
+        }
+        worker.retired = true;
+        clearTimeout(worker.timer);
+        this.workers = this.workers.filter(w => w !== worker);
+        if (worker.job !== null) {
+            const job = worker.job;
+            worker.job = null;
+            job.resolve({ success: false, error: 'An error occurred.' });
+        }
+
+        if (!worker.ready) {
+            this.spawnFailures++;
+        }
+        if (this.spawnFailures >= maxSpawnFailures) {
+            console.error(`${this.spawnFailures} python workers in a row could not start, check PYTHON_CMD (${pythonCmd})`);
+            this.failQueue();
+            return;
+        }
+        this.restarting++;
+        setTimeout(() => {
+            this.restarting--;
+            this.spawnWorker();
+            this.dispatch();
+        }, 1000 * 2 ** this.spawnFailures);
     }
 
-    // replace the double quote at the beginning and end of the string with a single quote
-    file1 = file1.replace(/^"(.*)"$/, '$1');
-    file2 = file2.replace(/^"(.*)"$/, '$1');
+    // fail the queued requests once no worker is left to answer them
+    failQueue() {
+        if (this.workers.length > 0 || this.restarting > 0) {
+            return;
+        }
+        for (const job of this.queue.splice(0)) {
+            job.resolve({ success: false, error: 'An error occurred.' });
+        }
+    }
 
-    // Call the Python script and pass in the input data as arguments
-    const cmd = `py -m ${pythonPath} '${file1}' '${file2}'`;
-    console.log(`Executing command: ${cmd}`);
-    const process = spawn('py', ['-m', pythonPath, `${file1}`, `${file2}`]);
+    run(request, onRecord = null) {
+        return new Promise(resolve => {
+            this.queue.push({ request: { ...request, id: this.nextId++ }, resolve: resolve, onRecord: onRecord });
+            this.dispatch();
+            if (this.spawnFailures >= maxSpawnFailures) {
+                this.failQueue();
+            }
+        });
+    }
 
-    // Listen for data coming back from the Python script
-    let result = '';
-    process.stdout.on('data', data => {
-        result += data.toString();
-    });
+    dispatch() {
+        for (const worker of this.workers) {
+            if (this.queue.length === 0) {
+                return;
+            }
+            if (worker.job === null) {
+                worker.job = this.queue.shift();
+                // a stuck analysis fails its request and the worker is killed and replaced
+                worker.timer = setTimeout(() => {
+                    console.error(`Worker ${worker.process.pid} timed out after ${jobTimeout} ms`);
+                    this.retire(worker);
+                    worker.process.kill('SIGKILL');
+                }, jobTimeout);
+                worker.process.stdin.write(JSON.stringify(worker.job.request) + '\n');
+            }
+        }
+    }
+}
+
+const pool = new WorkerPool(poolSize);
+
+// worker request of an API request body, null when the axis is not valid
+function workerRequest(inputData) {
+    let selected = parseInt(inputData.selected);
+
+    // 0: longitudinal, 1: lateral, 2: both axes at once (file3 holds the lateral stability derivatives)
+    if (selected !== 0 && selected !== 1 && selected !== 2) {
+        return null;
+    }
+    const names = selected === 2 ? ['file1', 'file2', 'file3'] : ['file1', 'file2'];
 
-    // Listen for the Python script to finish
-    process.on('close', code => {
-        if (code === 0) {
-            // If the Python script exits with code 0 (success), return the result to the client
-            console.log("RESULT: " + result)
-            res.json({ success: true, result: result });
+    const request = { selected: selected };
+    for (const name of names) {
+        if (inputData[name] === undefined) {
+            return null;
+        }
+        // replace the double quote at the beginning and end of the string with a single quote
+        request[name] = JSON.stringify(inputData[name]).replace(/^"(.*)"$/, '$1');
+    }
+    return request;
+}
+
+// Define your /process_data route
+app.post('/process_data',(req, res) => {
+    // Get the input data from the request body
+    const request = workerRequest(req.body);
+
+    if (request === null) {
+        res.json({ success: false, error: 'An error occurred.' });
+        return;
+    }
+    const selected = request.selected;
+
+    // Send the input data to a warm python worker
+    console.log(`Dispatching request (selected=${selected}) to the worker pool`);
+    pool.run(request).then(answer => {
+        if (answer.success) {
+            // If the analysis succeeded, return the result to the client
+            console.log(`Analysis done, ${answer.result.length} characters`);
+            res.json({ success: true, result: answer.result, matrices: answer.matrices });
         } else {
-            // If the Python script exits with a non-zero code (error), return an error message to the client
+            // If the analysis failed, return an error message to the client
             res.json({ success: false, error: 'An error occurred.' });
         }
     });
 });
 
+// Streaming route: newline-delimited JSON records sent as each stage finishes
+// (matrices and eigenvalues first, plots last), numeric arrays are base64 encoded (see service/protocol.py)
+app.post('/process_data_stream', (req, res) => {
+    const request = workerRequest(req.body);
+
+    if (request === null) {
+        res.status(400).json({ success: false, error: 'An error occurred.' });
+        return;
+    }
+    request.format = 'ndjson';
+    if (req.body.plots) {
+        request.plots = req.body.plots;
+    }
+
+    res.setHeader('Content-Type', 'application/x-ndjson');
+    let ended = false;
+    pool.run(request, record => {
+        ended = ended || record.type === 'end';
+        res.write(JSON.stringify(record) + '\n');
+    }).then(answer => {
+        // a worker crash stops the stream before its "end" record
+        if (!ended) {
+            res.write(JSON.stringify({ type: 'end', success: false, error: 'An error occurred.' }) + '\n');
+        }
+        res.end();
+    });
+});
+
 // Start the server
 app.listen(port, () => {
-    console.log('Server started on port ' + port + '.');
+    console.log('Server started on port ' + port + ' with ' + poolSize + ' python workers.');
 });
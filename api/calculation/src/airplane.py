@@ -1,7 +1,6 @@
+import json
 import sys
 
-from calculation.src.lateral.lat_plot_stability import PlotLateralModes
-
 sys.path.append("calculation/src")
 
 from longitudinal.lon_aircraft_matrix import LongAircraftMatrix
@@ -10,6 +9,16 @@ from longitudinal.lon_plot_stability import PlotLongitudinalModes
 
 from lateral.lat_aircraft_matrix import LatAircraftMatrix
 from lateral.lat_control_matrix import LatControlMatrix
+from lateral.lat_plot_stability import PlotLateralModes
+
+from analysis.frequency_response import frequency_response
+from analysis.root_locus import feedback_path, root_locus
+from analysis.time_response import time_response
+
+from data.flight_condition import FlightCondition
+from data.flight_data import read_flight_data
+
+from service.rendering import render_mode
 
 
 class Airplane(LongAircraftMatrix, LongControlMatrix, LatAircraftMatrix, LatControlMatrix):
@@ -19,13 +28,16 @@ class Airplane(LongAircraftMatrix, LongControlMatrix, LatAircraftMatrix, LatCont
     '''
 
     def __init__(self, name, wing_area, aspect_ratio, taper_ratio, wingspan, wing_mean_chord, wing_oswald, axis="longitudinal", user_file=None):
+        # the files are parsed and validated once for both parents (aircraft and control matrix)
+        flight_data = read_flight_data(axis, user_file)
         if axis == "longitudinal":
-            LongAircraftMatrix.__init__(self, user_file=user_file)
-            LongControlMatrix.__init__(self, user_file=user_file)
+            LongAircraftMatrix.__init__(self, flight_data)
+            LongControlMatrix.__init__(self, flight_data)
         elif axis == "lateral":
-            LatAircraftMatrix.__init__(self, user_file=user_file)
-            LatControlMatrix.__init__(self, user_file=user_file)
+            LatAircraftMatrix.__init__(self, flight_data)
+            LatControlMatrix.__init__(self, flight_data)
 
+        self.axis = axis
         self.name = name
         self.wing_area = wing_area  # S
         self.aspect_ratio = aspect_ratio  # A
@@ -34,6 +46,27 @@ class Airplane(LongAircraftMatrix, LongControlMatrix, LatAircraftMatrix, LatCont
         self.wing_mean_chord = wing_mean_chord  # c
         self.wing_oswald = wing_oswald  # e
         self.user_file = user_file
+        self.plots = {}
+        self.frequency_response = None
+
+    @classmethod
+    def combined(cls, name, wing_area, aspect_ratio, taper_ratio, wingspan, wing_mean_chord, wing_oswald, user_file):
+        '''
+        Longitudinal and lateral Airplane of one aircraft built from a single parsed input set
+        :param user_file: [longitudinal stability derivatives, lateral stability derivatives, flight conditions]
+        as json strings or parsed dicts, the flight conditions are parsed and validated once for both axes
+        :return: dict axis -> Airplane
+        '''
+        long_der, lat_der, cruise_conditions = [
+            item if isinstance(item, dict) else json.loads(item) for item in user_file
+        ]
+        flight_condition = FlightCondition.from_json(cruise_conditions)
+
+        return {
+            axis: cls(name, wing_area, aspect_ratio, taper_ratio, wingspan, wing_mean_chord, wing_oswald, axis,
+                      [stability_der, cruise_conditions, flight_condition])
+            for axis, stability_der in [("longitudinal", long_der), ("lateral", lat_der)]
+        }
 
     def get_longitudinal_aicraft_matrix(self):
         # ----------------- Calculate the aircraft matrix for longitudinal stability ----------------- #
@@ -126,12 +159,74 @@ class Airplane(LongAircraftMatrix, LongControlMatrix, LatAircraftMatrix, LatCont
     def get_cruise_condition(self, coeff):
         return f"{self.cruise_conditions[coeff]['value']} {self.cruise_conditions[coeff]['unit']}"
 
-    def lon_plot_stability(self, mode):
-        plot_aircraft_stability = PlotLongitudinalModes(self.get_natural_frequency(), self.get_damping_ratio())
-        data = plot_aircraft_stability.plot_modes(mode)
+    def set_frequency_response(self, omega=None):
+        '''
+        Bode data of every state/control pair: (jwI-A)^-1 * B over the frequency grid omega (rad/s)
+        '''
+        self.frequency_response = frequency_response(self.aircraft_matrix, self.control_matrix, omega)
+        return self.frequency_response
+
+    def get_frequency_response(self):
+        return self.frequency_response
+
+    def set_root_locus(self, path, gains, resolution=0.01):
+        '''
+        Closed-loop eigenvalues of the feedback control = -k * state over the gains k
+        :param path: "q:elevator", "r:rudder", ... (state:control of the axis)
+        :return: dict with the gains, the continuous branches and the imaginary axis crossings (analysis/root_locus.py)
+        '''
+        state, control = feedback_path(self.axis, path)
+        return root_locus(self.aircraft_matrix, self.control_matrix, state, control, gains, resolution)
+
+    def set_eigenvalue_sensitivity(self):
+        '''
+        Ranked sensitivity of every mode to every stability derivative and cruise condition
+        :return: dict mode -> rows (parameter, d_eigenvalue, d_natural_frequency, d_damping_ratio, ...)
+        '''
+        if self.axis == "longitudinal":
+            return LongAircraftMatrix.calculate_long_eigenvalue_sensitivity(self, self.wing_area, self.aspect_ratio,
+                                                                           self.wing_oswald, self.wing_mean_chord)
+        return LatAircraftMatrix.calculate_lateral_eigenvalue_sensitivity(self, self.wing_area, self.wingspan)
+
+    def get_eigenvalue_sensitivity(self):
+        return self.sensitivity
+
+    def simulate_response(self, response="free", control=None, duration=20.0, dt=0.01, amplitude=1.0, x0=None,
+                          start=0.0, width=1.0):
+        '''
+        Exact time response of the aircraft/control matrices (matrix exponential discretization)
+        :param response: "free" (from x0), "step", "impulse" or "doublet"
+        :param control: "elevator"/"throttle" for the longitudinal axis, "rudder"/"aileron" for the lateral axis
+        :param x0: initial state(s), (4,) or (M, 4) to simulate many initial conditions at once
+        :return: time vector and states (..., K + 1, 4)
+        '''
+        if control is None:
+            control = "elevator" if self.axis == "longitudinal" else "aileron"
+        return time_response(self.aircraft_matrix, self.control_matrix, response, control, duration, dt, amplitude,
+                             x0, start, width)
+
+    def lon_plot_stability(self, mode, output="png", decimate=1):
+        '''
+        :param output: "png" for a base64 png image, "data" for the time vector and state histories as typed arrays
+        :param decimate: keep one sample out of decimate in "data" output
+        '''
+        data = render_mode(self.lon_mode_plotter(), mode, output, decimate)
+        self.plots[mode] = data
         return data
 
-    def lat_plot_stability(self, mode):
-        plot_aircraft_stability = PlotLateralModes(self.get_lateral_eigenvalues(), self.get_lateral_eigenvectors())
-        data = plot_aircraft_stability.plot_modes(mode)
+    def lon_mode_plotter(self):
+        return PlotLongitudinalModes(self.aircraft_matrix, self.control_matrix, self.get_eigenvalues(),
+                                     self.get_eigenvectors(), self.modes, self.flight_condition.V)
+
+    def lat_plot_stability(self, mode, output="png", decimate=1):
+        '''
+        :param output: "png" for a base64 png image, "data" for the time vector and state histories as typed arrays
+        :param decimate: keep one sample out of decimate in "data" output
+        '''
+        data = render_mode(self.lat_mode_plotter(), mode, output, decimate)
+        self.plots[mode] = data
         return data
+
+    def lat_mode_plotter(self):
+        return PlotLateralModes(self.aircraft_matrix, self.control_matrix, self.get_lateral_eigenvalues(),
+                                self.get_lateral_eigenvectors(), self.modes)
@@ -0,0 +1,44 @@
+import numpy as np
+
+# default frequency grid in rad/s, wide enough for the phugoid and the short period/roll modes
+DEFAULT_OMEGA = np.logspace(-3, 2, 500)
+
+
+def frequency_response(aircraft_matrix, control_matrix, omega=None, output_matrix=None, feedthrough_matrix=None):
+    '''
+    Frequency response C(jwI - A)^-1 B + D for every input/output pair
+    All the frequencies (and all the stacked matrices) are solved in one batched linear solve
+    :param aircraft_matrix: (..., n, n) array A
+    :param control_matrix: (..., n, m) array B
+    :param omega: (W,) frequencies in rad/s
+    :param output_matrix: (p, n) or (..., p, n) array C, identity (every state is an output) by default
+    :param feedthrough_matrix: (p, m) or (..., p, m) array D, zero by default
+    :return: dict with omega (W,) and response, magnitude, magnitude_db, phase (degrees, unwrapped)
+    all (..., W, p, m)
+    '''
+    A = np.asarray(aircraft_matrix, dtype=float)
+    B = np.asarray(control_matrix, dtype=float)
+    omega = DEFAULT_OMEGA if omega is None else np.asarray(omega, dtype=float)
+    n = A.shape[-1]
+
+    # (..., W, n, n) stack of jwI - A
+    resolvent = 1j * omega[:, None, None] * np.eye(n) - A[..., None, :, :]
+    response = np.linalg.solve(resolvent, np.broadcast_to(B[..., None, :, :], resolvent.shape[:-1] + B.shape[-1:]))
+
+    if output_matrix is not None:
+        response = np.asarray(output_matrix)[..., None, :, :] @ response
+    if feedthrough_matrix is not None:
+        response = response + np.asarray(feedthrough_matrix)[..., None, :, :]
+
+    magnitude = np.abs(response)
+    with np.errstate(divide="ignore"):
+        magnitude_db = 20 * np.log10(magnitude)
+    phase = np.degrees(np.unwrap(np.angle(response), axis=-3))
+
+    return {
+        "omega": omega,
+        "response": response,
+        "magnitude": magnitude,
+        "magnitude_db": magnitude_db,
+        "phase": phase,
+    }
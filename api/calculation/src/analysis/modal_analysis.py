@@ -0,0 +1,254 @@
+import itertools
+
+import numpy as np
+
+
+def modal_analysis(matrices):
+    '''
+    Batched modal analysis of stacked state matrices
+    One eig decomposition per matrix, all of them in a single numpy call
+    :param matrices: (..., 4, 4) array of aircraft matrices (a single (4, 4) matrix works too)
+    :return: dict of arrays, the eigenvalue axis is the last one:
+        eigenvalues (..., 4), eigenvectors (..., 4, 4) (column k belongs to eigenvalue k),
+        natural_frequency, damping_ratio, period and time_to_half (..., 4)
+        period is inf for real eigenvalues, time_to_half is negative for unstable modes (time to double)
+    '''
+    eigenvalues, eigenvectors = np.linalg.eig(np.asarray(matrices))
+
+    real_parts = eigenvalues.real
+    imag_parts = np.abs(eigenvalues.imag)
+    natural_frequency = np.abs(eigenvalues)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        damping_ratio = -real_parts / natural_frequency
+        period = np.where(imag_parts > 0, 2 * np.pi / imag_parts, np.inf)
+        time_to_half = np.where(real_parts != 0, np.log(2) / -real_parts, np.inf)
+
+    return {
+        "eigenvalues": eigenvalues,
+        "eigenvectors": eigenvectors,
+        "natural_frequency": natural_frequency,
+        "damping_ratio": damping_ratio,
+        "period": period,
+        "time_to_half": time_to_half,
+    }
+
+
+def second_order_parameters(first, second):
+    '''
+    Natural frequency and damping ratio of the mode whose roots are first and second
+    (s - l1)(s - l2) = s^2 + 2 zeta wn s + wn^2, valid for a complex pair and for two real roots
+    wn is nan when the roots have opposite signs
+    '''
+    with np.errstate(invalid="ignore", divide="ignore"):
+        natural_frequency = np.sqrt((first * second).real)
+        damping_ratio = -(first + second).real / (2 * natural_frequency)
+    return natural_frequency, damping_ratio
+
+
+# modes of each axis, the pairs are the oscillatory ones (two roots per mode)
+MODES = {
+    "longitudinal": ["phugoid", "short_period"],
+    "lateral": ["Rolling", "Spiral", "Dutch Roll"],
+}
+PAIRED_MODES = {"phugoid", "short_period", "Dutch Roll"}
+
+
+def mode_content(eigenvectors):
+    '''
+    :param eigenvectors: (..., 4, 4) eigenvectors, column k belongs to eigenvalue k
+    :return: (..., 4, 4) share of every state in every eigenvector (each column sums to 1)
+    '''
+    magnitude = np.abs(eigenvectors)
+    return magnitude / magnitude.sum(axis=-2, keepdims=True)
+
+
+def _select(score, count):
+    '''
+    :return: mask (..., 4) of the count highest scores and the gap between the last selected and the next score
+    '''
+    order = np.argsort(-score, axis=-1, kind="stable")
+    selected = np.zeros(score.shape, dtype=bool)
+    np.put_along_axis(selected, order[..., :count], True, axis=-1)
+    ranked = np.take_along_axis(score, order, axis=-1)
+    return selected, ranked[..., count - 1] - ranked[..., count]
+
+
+def classify_modes(eigenvalues, axis, eigenvectors=None):
+    '''
+    Label every eigenvalue of stacked matrices with its mode, from its eigenvector content and its location
+    longitudinal: the phugoid pair is the one whose eigenvectors are mostly speed and pitch angle, the short period
+    the one mostly angle of attack (w) and pitch rate (theta = q / lambda, so this also ranks the roots by magnitude)
+    lateral: the Dutch roll pair is the most oscillatory one with the most yaw rate, of the two other roots the roll
+    is the one mostly roll rate and the spiral the one mostly bank angle (phi = p / lambda)
+    Without eigenvectors the location alone is used: magnitude for the longitudinal pairs, imaginary part then
+    magnitude for the lateral modes
+    :param eigenvalues: (..., 4) eigenvalues
+    :param axis: "longitudinal" or "lateral"
+    :param eigenvectors: (..., 4, 4) eigenvectors, column k belongs to eigenvalue k
+    :return: labels (..., 4) index in MODES[axis] of the mode of every eigenvalue, and margin (...) the smallest
+    score gap of the decisions (close to 0 when the classification is ambiguous)
+    '''
+    eigenvalues = np.asarray(eigenvalues)
+    content = None if eigenvectors is None else mode_content(np.asarray(eigenvectors))
+    magnitude = np.abs(eigenvalues)
+    labels = np.empty(eigenvalues.shape, dtype=np.int8)
+
+    if axis == "longitudinal":
+        if content is None:
+            score = -magnitude
+        else:
+            score = content[..., 0, :] + content[..., 3, :] - content[..., 1, :] - content[..., 2, :]
+        phugoid, margin = _select(score, 2)
+        labels[...] = np.where(phugoid, MODES[axis].index("phugoid"), MODES[axis].index("short_period"))
+        return labels, margin
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        oscillation = np.nan_to_num(np.abs(eigenvalues.imag) / magnitude)
+    if content is None:
+        dutch_score, roll_score = oscillation, magnitude
+    else:
+        dutch_score, roll_score = oscillation + content[..., 2, :], content[..., 1, :] - content[..., 3, :]
+
+    dutch_roll, margin = _select(dutch_score, 2)
+    # of the two roots left, the roll has the highest roll score
+    rolling, roll_margin = _select(np.where(dutch_roll, -np.inf, roll_score), 1)
+
+    labels[...] = MODES[axis].index("Spiral")
+    labels[rolling] = MODES[axis].index("Rolling")
+    labels[dutch_roll] = MODES[axis].index("Dutch Roll")
+    return labels, np.minimum(margin, roll_margin)
+
+
+def mode_indices(eigenvalues, labels, axis):
+    '''
+    :param labels: (..., 4) labels from classify_modes
+    :return: dict mode -> (...) index of the root of the mode (the one with a positive imaginary part for pairs)
+    '''
+    eigenvalues = np.asarray(eigenvalues)
+    indices = {}
+    for code, mode in enumerate(MODES[axis]):
+        if mode not in PAIRED_MODES:
+            indices[mode] = np.argmax(labels == code, axis=-1)
+            continue
+        # the two roots of the mode come first in a stable sort of "not this mode"
+        pair = np.argsort(labels != code, axis=-1, kind="stable")[..., :2]
+        roots = np.take_along_axis(eigenvalues, pair, axis=-1)
+        indices[mode] = np.where(roots[..., 0].imag >= roots[..., 1].imag, pair[..., 0], pair[..., 1])
+    return indices
+
+
+def mode_parameters(eigenvalues, labels, axis):
+    '''
+    :param labels: (..., 4) labels from classify_modes
+    :return: dict mode -> dict of (...) arrays eigenvalue (the root with a positive imaginary part for pairs),
+    natural_frequency, damping_ratio and unstable
+    '''
+    eigenvalues = np.asarray(eigenvalues)
+    modes = {}
+    for code, mode in enumerate(MODES[axis]):
+        if mode in PAIRED_MODES:
+            pair = np.argsort(labels != code, axis=-1, kind="stable")[..., :2]
+            roots = np.take_along_axis(eigenvalues, pair, axis=-1)
+            natural_frequency, damping_ratio = second_order_parameters(roots[..., 0], roots[..., 1])
+            modes[mode] = {
+                "eigenvalue": np.where(roots[..., 0].imag >= roots[..., 1].imag, roots[..., 0], roots[..., 1]),
+                "natural_frequency": natural_frequency,
+                "damping_ratio": damping_ratio,
+                "unstable": np.any(roots.real > 0, axis=-1),
+            }
+            continue
+
+        roots = np.take_along_axis(eigenvalues, np.argmax(labels == code, axis=-1)[..., None], axis=-1)[..., 0]
+        natural_frequency = np.abs(roots)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            damping_ratio = -roots.real / natural_frequency
+        modes[mode] = {
+            "eigenvalue": roots,
+            "natural_frequency": natural_frequency,
+            "damping_ratio": damping_ratio,
+            "unstable": roots.real > 0,
+        }
+    return modes
+
+
+def label_modes(eigenvalues, axis, eigenvectors=None):
+    '''
+    Label the eigenvalues of stacked matrices with the classical modes (see classify_modes)
+    :param eigenvalues: (..., 4) eigenvalues
+    :param axis: "longitudinal" or "lateral"
+    :param eigenvectors: (..., 4, 4) eigenvectors, the location of the eigenvalues alone is used without them
+    :return: dict mode -> dict of (...) arrays eigenvalue (the root with a positive imaginary part for pairs),
+    natural_frequency, damping_ratio and unstable
+    '''
+    return mode_parameters(eigenvalues, classify_modes(eigenvalues, axis, eigenvectors)[0], axis)
+
+
+# ----------------- tracking across sweeps ----------------- #
+def match_eigenvalues(reference, eigenvalues):
+    '''
+    Best assignment between two sets of eigenvalues of stacked matrices
+    Every permutation is compared at once (n! of them, 24 for the 4x4 matrices of one axis)
+    :param reference: (M, n) eigenvalues
+    :param eigenvalues: (M, n) eigenvalues of the neighbouring matrices
+    :return: (M, n) permutations (reference[i, j] continues as eigenvalues[i, match[i, j]]) and (M,) largest
+    distance between two matched eigenvalues
+    '''
+    n = reference.shape[-1]
+    permutations = np.array(list(itertools.permutations(range(n))))
+    distance = np.abs(reference[:, None, :] - eigenvalues[:, permutations])
+    best = np.argmin(distance.sum(axis=-1), axis=1)
+    return permutations[best], distance[np.arange(len(best)), best].max(axis=-1)
+
+
+def grid_neighbours(shape):
+    '''
+    Neighbour of every point of a flattened grid (first axis varies slowest) that comes before it:
+    the previous point along the last axis whose index is not zero, -1 for the first point
+    :return: (points,) indices, always smaller than the index of the point
+    '''
+    shape = tuple(shape)
+    strides = np.cumprod((1,) + shape[:0:-1])[::-1]
+    coordinates = np.stack(np.unravel_index(np.arange(int(np.prod(shape))), shape), axis=-1)
+    nonzero = coordinates != 0
+    # last axis with a nonzero coordinate, the first point has none
+    axis = len(shape) - 1 - np.argmax(nonzero[:, ::-1], axis=-1)
+    return np.where(nonzero.any(axis=-1), np.arange(len(coordinates)) - strides[axis], -1)
+
+
+def track_modes(eigenvalues, labels, margin, previous=None, threshold=0.05):
+    '''
+    Keep the mode labels consistent across the neighbouring points of a sweep
+    The points whose classification is ambiguous (margin below threshold) take the labels of their neighbour,
+    carried over by matching the eigenvalues of the two points. A chain of ambiguous neighbours is followed back to
+    its first unambiguous point by pointer jumping, in log2(chain length) array passes.
+    :param eigenvalues: (N, 4) eigenvalues of the sweep
+    :param labels: (N, 4) and margin (N,) from classify_modes
+    :param previous: (N,) index of the neighbour of every point, smaller than the index of the point (-1 for none),
+    the previous point by default, see grid_neighbours for grids
+    :return: (N, 4) labels
+    '''
+    eigenvalues = np.asarray(eigenvalues)
+    labels = np.array(labels)
+    previous = np.arange(len(labels)) - 1 if previous is None else np.asarray(previous)
+
+    ambiguous = np.flatnonzero((np.asarray(margin) < threshold) & (previous >= 0))
+    if len(ambiguous) == 0:
+        return labels
+
+    match, _ = match_eigenvalues(eigenvalues[previous[ambiguous]], eigenvalues[ambiguous])
+    # labels[point] = labels[source[point]][order[point]], every point is its own source at first
+    source = np.arange(len(labels))
+    order = np.tile(np.arange(labels.shape[1]), (len(labels), 1))
+    source[ambiguous] = previous[ambiguous]
+    order[ambiguous] = np.argsort(match, axis=-1)
+
+    # jump over the ambiguous sources until every point refers to an unambiguous one
+    pending = ambiguous[np.isin(source[ambiguous], ambiguous)]
+    while len(pending):
+        order[pending] = np.take_along_axis(order[source[pending]], order[pending], axis=-1)
+        source[pending] = source[source[pending]]
+        pending = pending[source[pending] != source[source[pending]]]
+
+    labels[ambiguous] = np.take_along_axis(labels[source[ambiguous]], order[ambiguous], axis=-1)
+    return labels
@@ -0,0 +1,124 @@
+import numpy as np
+
+from analysis.modal_analysis import match_eigenvalues
+
+# states and controls of each axis, in the order of the matrix rows/columns
+STATES = {
+    "longitudinal": ["u", "w", "q", "theta"],
+    "lateral": ["v", "p", "r", "phi"],
+}
+CONTROLS = {
+    "longitudinal": ["elevator", "throttle"],
+    "lateral": ["rudder", "aileron"],
+}
+
+
+def feedback_path(axis, path):
+    '''
+    :param path: "state:control", e.g. "q:elevator" (pitch damper) or "r:rudder" (yaw damper)
+    :return: (state index, control index) in the matrices of the axis
+    '''
+    state, _, control = path.partition(":")
+    if state not in STATES[axis] or control not in CONTROLS[axis]:
+        raise ValueError(f"Unknown {axis} feedback path {path}, states: {STATES[axis]}, controls: {CONTROLS[axis]}")
+    return STATES[axis].index(state), CONTROLS[axis].index(control)
+
+
+def closed_loop_matrices(aircraft_matrix, control_matrix, state, control, gains):
+    '''
+    Closed-loop matrices A - k * b * e_state^T of the feedback control = -k * state, for every gain k
+    :param state: index of the fed back state, control: index of the actuated control
+    :param gains: (N,) gains
+    :return: (N, n, n) array
+    '''
+    A = np.asarray(aircraft_matrix, dtype=float)
+    loop = np.zeros_like(A)
+    loop[:, state] = np.asarray(control_matrix, dtype=float)[:, control]
+    return A - np.asarray(gains, dtype=float)[:, None, None] * loop
+
+
+def adjacent_matching(eigenvalues):
+    '''
+    :param eigenvalues: (N, n) eigenvalues in the order returned by eig
+    :return: (N - 1, n) permutations (eigenvalue j of gain i continues as eigenvalue match[i, j] of gain i + 1)
+    and (N - 1,) largest distance moved by a branch between the two gains, see match_eigenvalues
+    '''
+    return match_eigenvalues(eigenvalues[:-1], eigenvalues[1:])
+
+
+def match_branches(eigenvalues):
+    '''
+    Reorder the eigenvalues of every gain so that each column is one continuous branch of the locus
+    :param eigenvalues: (N, n) eigenvalues of increasing gains
+    :return: (N, n) array, column j is branch j
+    '''
+    if len(eigenvalues) < 2:
+        return eigenvalues
+    match, _ = adjacent_matching(eigenvalues)
+    order = np.empty(eigenvalues.shape, dtype=np.intp)
+    order[0] = np.arange(eigenvalues.shape[1])
+    for index, permutation in enumerate(match):
+        order[index + 1] = permutation[order[index]]
+    return np.take_along_axis(eigenvalues, order, axis=1)
+
+
+def stability_crossings(gains, branches):
+    '''
+    :return: list of the gains where a branch crosses the imaginary axis, with its direction
+    '''
+    real = branches.real
+    crossings = []
+    for step, branch in zip(*np.nonzero(np.sign(real[:-1]) != np.sign(real[1:]))):
+        # linear interpolation of the gain where the real part is zero
+        k0, k1 = gains[step], gains[step + 1]
+        r0, r1 = real[step, branch], real[step + 1, branch]
+        crossings.append({
+            "gain": float(k0 - r0 * (k1 - k0) / (r1 - r0)),
+            "branch": int(branch),
+            "direction": "unstable" if r1 > 0 else "stable",
+        })
+    return sorted(crossings, key=lambda crossing: crossing["gain"])
+
+
+def root_locus(aircraft_matrix, control_matrix, state, control, gains, resolution=0.01, refinements=10,
+               max_points=50000):
+    '''
+    Closed-loop eigenvalues of one feedback path over a range of gains
+    The eigenvalues of all the gains are computed in one batched eig call, then the gain steps where a branch moves
+    by more than resolution times the size of the locus are halved (one batched call per refinement pass)
+    :param state: index of the fed back state, control: index of the actuated control (see feedback_path)
+    :param gains: initial gains, sorted and refined where the branches move fast
+    :param resolution: largest branch move between two gains, relative to the largest eigenvalue magnitude
+    :param refinements: maximum number of refinement passes
+    :param max_points: refinement stops once the locus has this many gains
+    :return: dict with the gains (N,), the branches (N, n) (column j is a continuous branch), the open-loop
+    eigenvalues (n,) in the order of the branches and the gains where a branch crosses the imaginary axis
+    '''
+    gains = np.unique(np.asarray(gains, dtype=float))
+    eigenvalues = np.linalg.eigvals(closed_loop_matrices(aircraft_matrix, control_matrix, state, control, gains))
+
+    for _ in range(refinements):
+        if len(gains) >= max_points:
+            break
+        _, moves = adjacent_matching(eigenvalues)
+        fast = moves > resolution * np.abs(eigenvalues).max()
+        if not np.any(fast):
+            break
+        fast = np.flatnonzero(fast)[:max_points - len(gains)]
+        new_gains = (gains[fast] + gains[fast + 1]) / 2
+        new_eigenvalues = np.linalg.eigvals(closed_loop_matrices(aircraft_matrix, control_matrix, state, control,
+                                                                 new_gains))
+        order = np.argsort(np.concatenate([gains, new_gains]), kind="stable")
+        gains = np.concatenate([gains, new_gains])[order]
+        eigenvalues = np.concatenate([eigenvalues, new_eigenvalues])[order]
+
+    branches = match_branches(eigenvalues)
+    # open_loop[j] is the point of branch j at the zero gain, matched to the branches at the gain closest to zero
+    open_loop = np.linalg.eigvals(np.asarray(aircraft_matrix, dtype=float))
+    match, _ = match_eigenvalues(branches[None, np.argmin(np.abs(gains))], open_loop[None])
+    return {
+        "gains": gains,
+        "branches": branches,
+        "open_loop": open_loop[match[0]],
+        "crossings": stability_crossings(gains, branches),
+    }
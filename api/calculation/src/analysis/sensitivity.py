@@ -0,0 +1,97 @@
+import numpy as np
+
+from analysis.modal_analysis import classify_modes, mode_indices
+
+# complex-step size, the derivative has no subtractive cancellation so the step can be tiny
+COMPLEX_STEP = 1e-30
+
+
+def sensitivity_parameters(cruise_conditions, stability_der):
+    '''
+    :param cruise_conditions: parsed flight conditions json (name -> {"value": ...})
+    :param stability_der: parsed stability derivatives json
+    :return: dicts name -> nominal value of the inputs that can be differentiated
+    (the -1111 "computed" markers are left out)
+    '''
+    def values(data):
+        return {name: item["value"] for name, item in data.items()
+                if isinstance(item.get("value"), (int, float)) and item["value"] != -1111}
+
+    return values(cruise_conditions), values(stability_der)
+
+
+def matrix_derivatives(build_matrix, cruise_conditions, stability_der):
+    '''
+    Derivative of the aircraft matrix with respect to every input, all in one vectorized pass
+    Row k of the batch perturbs input k by an imaginary step, so that Im(A_k) / h = dA/dp_k
+    (complex-step differentiation through the calculate_* formulas, exact to machine precision)
+    :param build_matrix: function(cruise_conditions, stability_der) -> (N, n, n) aircraft matrices
+    :return: names of the inputs and (P, n, n) array of dA/dp
+    '''
+    names = list(cruise_conditions) + list(stability_der)
+    steps = np.eye(len(names)) * COMPLEX_STEP * 1j
+
+    def perturbed(values):
+        return {name: value + steps[names.index(name)] for name, value in values.items()}
+
+    matrices = build_matrix(perturbed(cruise_conditions), perturbed(stability_der))
+    return names, matrices.imag / COMPLEX_STEP
+
+
+def eigenvalue_derivatives(aircraft_matrix, matrix_derivative):
+    '''
+    First order perturbation of the eigenvalues: dl_k = w_k^T dA v_k / (w_k^T v_k)
+    with v_k the right and w_k the left eigenvectors (rows of V^-1, so that w_k^T v_k = 1)
+    :param aircraft_matrix: (n, n) array A
+    :param matrix_derivative: (P, n, n) array of dA/dp
+    :return: eigenvalues (n,), right eigenvectors (n, n) and the eigenvalue derivatives (P, n)
+    '''
+    eigenvalues, right = np.linalg.eig(aircraft_matrix)
+    left = np.linalg.inv(right)
+    derivatives = np.einsum("ki,pij,jk->pk", left, matrix_derivative, right)
+    return eigenvalues, right, derivatives
+
+
+def eigenvalue_sensitivity(aircraft_matrix, build_matrix, cruise_conditions, stability_der, axis):
+    '''
+    Ranked sensitivity of every mode to every input coefficient and cruise condition
+    :param aircraft_matrix: (n, n) nominal aircraft matrix
+    :param build_matrix: function(cruise_conditions, stability_der) -> (N, n, n) aircraft matrices
+    :param cruise_conditions: dict name -> nominal value
+    :param stability_der: dict name -> nominal value
+    :param axis: "longitudinal" or "lateral" (mode names)
+    :return: dict mode -> list of rows sorted by |p * dl/dp| (largest first), every row holds
+    parameter, value, d_eigenvalue, d_natural_frequency, d_damping_ratio and the same three scaled by the
+    parameter value (change for a 100% change of the parameter, comparable between parameters)
+    '''
+    names, matrix_derivative = matrix_derivatives(build_matrix, cruise_conditions, stability_der)
+    eigenvalues, eigenvectors, derivatives = eigenvalue_derivatives(aircraft_matrix, matrix_derivative)
+    values = np.array([{**cruise_conditions, **stability_der}[name] for name in names], dtype=float)
+
+    natural_frequency = np.abs(eigenvalues)
+    # wn = |l|, zeta = -Re(l) / |l|
+    d_natural_frequency = (np.conj(eigenvalues) * derivatives).real / natural_frequency
+    d_damping_ratio = (-derivatives.real * natural_frequency + eigenvalues.real * d_natural_frequency) \
+        / natural_frequency ** 2
+
+    table = {}
+    # same labels as the modes of the Airplane, from the eigenvector content and not the location of the roots
+    labels, _ = classify_modes(eigenvalues, axis, eigenvectors)
+    for mode, k in mode_indices(eigenvalues, labels, axis).items():
+        k = int(k)
+        scaled = np.abs(values * derivatives[:, k])
+        table[mode] = [
+            {
+                "parameter": names[p],
+                "value": float(values[p]),
+                "d_eigenvalue": complex(derivatives[p, k]),
+                "d_natural_frequency": float(d_natural_frequency[p, k]),
+                "d_damping_ratio": float(d_damping_ratio[p, k]),
+                "scaled_eigenvalue": complex(values[p] * derivatives[p, k]),
+                "scaled_natural_frequency": float(values[p] * d_natural_frequency[p, k]),
+                "scaled_damping_ratio": float(values[p] * d_damping_ratio[p, k]),
+            }
+            for p in np.argsort(-scaled, kind="stable")
+        ]
+
+    return table
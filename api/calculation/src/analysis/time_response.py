@@ -0,0 +1,151 @@
+import numpy as np
+from scipy.linalg import expm
+
+# column of the control matrix of each control surface
+CONTROLS = {
+    "elevator": 0,
+    "throttle": 1,
+    "rudder": 0,
+    "aileron": 1,
+}
+
+
+class LinearSimulator:
+    '''
+    This class simulates x' = A x + B u exactly for a piecewise constant input (zero-order hold)
+    The system is discretized once with a matrix exponential, every step is then a matrix-vector product
+    '''
+
+    def __init__(self, aircraft_matrix, control_matrix, dt):
+        '''
+        :param aircraft_matrix: (..., n, n) array A, stacked matrices are simulated together
+        :param control_matrix: (..., n, m) array B
+        :param dt: time step in seconds
+        '''
+        A = np.asarray(aircraft_matrix, dtype=float)
+        B = np.asarray(control_matrix, dtype=float)
+        n = A.shape[-1]
+        m = B.shape[-1]
+        batch_shape = np.broadcast_shapes(A.shape[:-2], B.shape[:-2])
+
+        # exp([[A, B], [0, 0]] dt) = [[Ad, Bd], [0, I]]
+        augmented = np.zeros(batch_shape + (n + m, n + m))
+        augmented[..., :n, :n] = A
+        augmented[..., :n, n:] = B
+        discrete = expm(augmented * dt)
+
+        self.dt = dt
+        self.n_states = n
+        self.n_inputs = m
+        self.A = A
+        self.B = B
+        self.Ad = discrete[..., :n, :n]
+        self.Bd = discrete[..., :n, n:]
+
+    def simulate(self, x0=None, inputs=None, steps=None):
+        '''
+        :param x0: (..., n) initial states, zero by default
+        :param inputs: (..., K, m) input samples held over each step, zero (free response) by default
+        :param steps: number of steps K when no inputs are given
+        :return: time vector (K + 1,) and states (..., K + 1, n)
+        '''
+        if inputs is not None:
+            inputs = np.asarray(inputs, dtype=float)
+            steps = inputs.shape[-2]
+        if steps is None:
+            raise ValueError("steps is needed for a free response")
+
+        x = np.zeros(self.n_states) if x0 is None else np.asarray(x0, dtype=float)
+        x = x + np.zeros(self.Ad.shape[:-1])
+
+        # states are row vectors: x_{k+1} = x_k Ad^T + u_k Bd^T
+        Ad_T = np.swapaxes(self.Ad, -1, -2)
+        Bd_T = np.swapaxes(self.Bd, -1, -2)
+
+        if inputs is not None:
+            forced = inputs @ Bd_T
+            x = x + np.zeros(forced.shape[:-2] + (self.n_states,))
+
+        states = np.empty(x.shape[:-1] + (steps + 1, self.n_states))
+        states[..., 0, :] = x
+        for k in range(steps):
+            x = (x[..., None, :] @ Ad_T)[..., 0, :]
+            if inputs is not None:
+                x = x + forced[..., k, :]
+            states[..., k + 1, :] = x
+
+        return np.arange(steps + 1) * self.dt, states
+
+
+# ----------------- input signals ----------------- #
+def step_signal(steps, dt, amplitude=1.0, start=0.0):
+    t = np.arange(steps) * dt
+    return np.where(t >= start, amplitude, 0.0)
+
+
+def doublet_signal(steps, dt, amplitude=1.0, start=0.0, width=1.0):
+    '''
+    +amplitude during width seconds, then -amplitude during width seconds
+    '''
+    t = np.arange(steps) * dt
+    signal = np.zeros(steps)
+    signal[(t >= start) & (t < start + width)] = amplitude
+    signal[(t >= start + width) & (t < start + 2 * width)] = -amplitude
+    return signal
+
+
+def control_inputs(signal, control, n_inputs=2):
+    '''
+    :return: (K, n_inputs) input samples with the signal on the given control (name or column)
+    '''
+    column = CONTROLS[control] if isinstance(control, str) else control
+    inputs = np.zeros((len(signal), n_inputs))
+    inputs[:, column] = signal
+    return inputs
+
+
+def time_response(aircraft_matrix, control_matrix, response="free", control="elevator", duration=20.0, dt=0.01,
+                  amplitude=1.0, x0=None, start=0.0, width=1.0):
+    '''
+    Free or forced response of the linear model
+    :param response: "free" (from x0), "step", "impulse" or "doublet" on the given control
+    :param control: "elevator", "throttle", "rudder", "aileron" or a control matrix column
+    :return: time vector (K + 1,) and states (..., K + 1, 4)
+    '''
+    simulator = LinearSimulator(aircraft_matrix, control_matrix, dt)
+    steps = int(round(duration / dt))
+
+    if response == "free":
+        return simulator.simulate(x0=x0, steps=steps)
+
+    if response == "impulse":
+        # an impulse on the input moves the state by B * amplitude at t = 0
+        column = CONTROLS[control] if isinstance(control, str) else control
+        kick = simulator.B[..., :, column] * amplitude
+        start_state = kick if x0 is None else np.asarray(x0) + kick
+        return simulator.simulate(x0=start_state, steps=steps)
+
+    if response == "step":
+        signal = step_signal(steps, dt, amplitude, start)
+    elif response == "doublet":
+        signal = doublet_signal(steps, dt, amplitude, start, width)
+    else:
+        raise ValueError(f"Unknown response {response}")
+
+    return simulator.simulate(x0=x0, inputs=control_inputs(signal, control, simulator.n_inputs))
+
+
+def mode_response(aircraft_matrix, control_matrix, eigenvector, duration, samples=1000, reference=None):
+    '''
+    Free response of the coupled model started on the eigenvector of one mode, so that only this mode is excited
+    The eigenvector is scaled so that its reference component is 1, its real part excites both roots of a pair
+    :param duration: simulated time in seconds, sampled at samples regularly spaced times
+    :param reference: index of the state starting at 1, the largest component of the eigenvector by default
+    :return: time vector (samples,) and states (samples, n)
+    '''
+    eigenvector = np.asarray(eigenvector)
+    if reference is None:
+        reference = np.argmax(np.abs(eigenvector))
+    x0 = (eigenvector / eigenvector[reference]).real
+    return time_response(aircraft_matrix, control_matrix, "free", duration=duration, dt=duration / (samples - 1),
+                         x0=x0)
@@ -0,0 +1,123 @@
+import numpy as np
+
+# numerator coefficients smaller than this (relative to the polynomials they come from) are round-off
+RELATIVE_TOLERANCE = 1e-10
+
+
+def characteristic_polynomial(matrices):
+    '''
+    Coefficients of det(sI - A) with the Faddeev-LeVerrier recursion, batched over the leading axes
+    :param matrices: (..., n, n) array
+    :return: (..., n + 1) array, highest power first (numpy.polyval convention), leading coefficient 1
+    '''
+    A = np.asarray(matrices)
+    n = A.shape[-1]
+    identity = np.eye(n)
+
+    coefficients = np.zeros(A.shape[:-2] + (n + 1,), dtype=np.result_type(A, float))
+    coefficients[..., 0] = 1
+
+    M = np.zeros_like(A, dtype=coefficients.dtype)
+    for k in range(1, n + 1):
+        M = A @ M + coefficients[..., k - 1, None, None] * identity
+        coefficients[..., k] = -np.trace(A @ M, axis1=-2, axis2=-1) / k
+
+    return coefficients
+
+
+def transfer_functions(aircraft_matrix, control_matrix, output_matrix=None):
+    '''
+    Numeric transfer functions C(sI - A)^-1 B for every input/output pair
+    For output i and input j the numerator is det(sI - A + b_j c_i) - det(sI - A) (matrix determinant lemma)
+    :param aircraft_matrix: (..., n, n) array A
+    :param control_matrix: (..., n, m) array B
+    :param output_matrix: (p, n) or (..., p, n) array C, identity (every state is an output) by default
+    :return: dict of arrays:
+        numerator (..., p, m, n + 1) and denominator (..., n + 1) coefficients, highest power first
+        poles (..., n), zeros (..., p, m, n - 1) padded with nan, gain (..., p, m)
+        so that G(s) = gain * prod(s - zeros) / prod(s - poles)
+    '''
+    A = np.asarray(aircraft_matrix)
+    B = np.asarray(control_matrix)
+    n = A.shape[-1]
+    C = np.eye(n) if output_matrix is None else np.asarray(output_matrix)
+
+    denominator = characteristic_polynomial(A)
+
+    # (..., p, m, n, n) stack of A - b_j c_i
+    rank_one = np.einsum("...aj,...ib->...ijab", B, C)
+    closed = characteristic_polynomial(A[..., None, None, :, :] - rank_one)
+    numerator = closed - denominator[..., None, None, :]
+
+    # the subtraction leaves round-off where the exact coefficient is zero
+    scale = np.maximum(np.abs(closed).max(axis=-1), np.abs(denominator).max(axis=-1)[..., None, None])
+    numerator[np.abs(numerator) <= RELATIVE_TOLERANCE * scale[..., None]] = 0.0
+
+    poles = np.linalg.eigvals(A)
+    zeros, gain = _zeros_and_gain(numerator)
+
+    return {
+        "numerator": numerator,
+        "denominator": denominator,
+        "poles": poles,
+        "zeros": zeros,
+        "gain": gain,
+    }
+
+
+def _zeros_and_gain(numerator):
+    zeros = np.full(numerator.shape[:-1] + (numerator.shape[-1] - 2,), np.nan, dtype=complex)
+    gain = np.zeros(numerator.shape[:-1])
+
+    for index in np.ndindex(*numerator.shape[:-1]):
+        coefficients = np.trim_zeros(numerator[index], "f")
+        if len(coefficients) == 0:
+            continue
+        gain[index] = coefficients[0]
+        roots = np.roots(coefficients)
+        zeros[index][:len(roots)] = roots
+
+    return zeros, gain
+
+
+def format_polynomial(coefficients, variable="s"):
+    '''
+    :param coefficients: polynomial coefficients, highest power first
+    :return: string like "1.0*s^4 + 4.89*s^3 - 0.2*s + 0.22"
+    '''
+    degree = len(coefficients) - 1
+    terms = []
+    for power, coefficient in enumerate(coefficients):
+        if coefficient == 0:
+            continue
+        power = degree - power
+        value = f"{abs(coefficient):.15g}"
+        if "." not in value and "e" not in value:
+            value += ".0"
+        if power > 1:
+            value += f"*{variable}^{power}"
+        elif power == 1:
+            value += f"*{variable}"
+        sign = "-" if coefficient < 0 else "+"
+        terms.append((sign, value))
+
+    if not terms:
+        return "0"
+
+    text = ("-" if terms[0][0] == "-" else "") + terms[0][1]
+    for sign, value in terms[1:]:
+        text += f" {sign} {value}"
+    return text
+
+
+def format_transfer_function(numerator, denominator):
+    '''
+    Render one transfer function as text: numerator, a line of dashes and the denominator
+    '''
+    num = format_polynomial(numerator)
+    den = format_polynomial(denominator)
+    if num == "0":
+        return "0"
+    return f"{num}\n" \
+           f"{'-' * len(den)}\n" \
+           f"{den}"
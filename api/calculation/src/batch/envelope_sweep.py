@@ -0,0 +1,200 @@
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from analysis.modal_analysis import classify_modes, modal_analysis
+from data.flight_condition import json_values, recompute_dependents
+from lateral.lat_batch_matrix import LatBatchMatrix
+from longitudinal.lon_batch_matrix import LongBatchMatrix
+
+DEFAULT_FILES = {
+    "longitudinal": ["calculation/flights/longitudinal/longitudinalSD.json",
+                     "calculation/flights/longitudinal/flightConditions.json"],
+    "lateral": ["calculation/flights/lateral/lateralSD.json",
+                "calculation/flights/lateral/flightConditions.json"],
+}
+
+# chunks submitted per worker process, one running and one waiting so that no worker is idle
+IN_FLIGHT = 2
+
+
+def parse_range(text):
+    '''
+    :param text: "start:stop:num" (num evenly spaced values, both ends included) or "v1,v2,..."
+    :return: numpy array of values
+    '''
+    if ":" in text:
+        start, stop, num = text.split(":")
+        return np.linspace(float(start), float(stop), int(num))
+    return np.array([float(value) for value in text.split(",")])
+
+
+def build_grid(axes):
+    '''
+    :param axes: dict name -> values of every swept cruise condition
+    :return: dict name -> flattened column, one row per grid point (first axis varies slowest)
+    '''
+    names = list(axes)
+    mesh = np.meshgrid(*[np.asarray(axes[name], dtype=float) for name in names], indexing="ij")
+    return {name: values.ravel() for name, values in zip(names, mesh)}
+
+
+def load_points(path):
+    '''
+    :param path: json file with a list of points, e.g. [{"h": 0.0, "V": 120.0}, ...]
+    :return: dict name -> column
+    '''
+    with open(path, "r") as f:
+        points = json.load(f)
+    return {name: np.array([point[name] for point in points], dtype=float) for name in points[0]}
+
+
+def load_nominal(axis, user_file=None):
+    '''
+    :param user_file: [stability derivatives path, flight conditions path], the bundled files by default
+    :return: (cruise conditions, stability derivatives) as dicts name -> value
+    '''
+    paths = user_file or DEFAULT_FILES[axis]
+    with open(paths[0], "r") as f:
+        stability_der = json.load(f)
+    with open(paths[1], "r") as f:
+        cruise_conditions = json.load(f)
+
+    return json_values(cruise_conditions), json_values(stability_der)
+
+
+def swept_conditions(cruise_nominal, points):
+    '''
+    Cruise conditions of a batch of points, everything that is not swept is kept from the nominal flight conditions
+    (shared by run_sweep and the gain schedule so that both give the same matrices for the same point)
+    :param points: dict name -> column of the swept cruise conditions
+    :return: dict name -> column (or nominal scalar)
+    '''
+    cruise_conditions = dict(cruise_nominal)
+    cruise_conditions.update(points)
+    # a swept altitude or airspeed changes the density, speed of sound, Mach and dynamic pressure
+    return recompute_dependents(cruise_conditions, points)
+
+
+def batch_matrices(axis, cruise_conditions, stability_der, geometric_content):
+    '''
+    :param cruise_conditions: dict name -> column (or scalar) of cruise conditions
+    :param stability_der: dict name -> column (or scalar) of stability derivatives
+    :return: (aircraft matrices, control matrices) stacked along the first axis
+    '''
+    S = geometric_content["S"]["value"]
+    if axis == "longitudinal":
+        batch = LongBatchMatrix(cruise_conditions, stability_der)
+        batch.calculate_derivatives(S, geometric_content["AR"]["value"], geometric_content["e"]["value"],
+                                    geometric_content["c"]["value"])
+        return batch.set_long_stability_aircraft_matrix(), batch.set_long_stability_control_matrix()
+
+    batch = LatBatchMatrix(cruise_conditions, stability_der)
+    batch.calculate_derivatives(S, geometric_content["b"]["value"])
+    return batch.set_lat_stability_aircraft_matrix(), batch.set_lat_stability_control_matrix()
+
+
+def sweep_chunk(axis, cruise_conditions, stability_der, geometric_content):
+    '''
+    Matrices and modal results of one chunk of flight conditions (runs in a worker process)
+    :return: dict of arrays with one row per point
+    '''
+    aircraft_matrix, control_matrix = batch_matrices(axis, cruise_conditions, stability_der, geometric_content)
+
+    modal = modal_analysis(aircraft_matrix)
+    # the eigenvectors are only kept as the mode of every eigenvalue (see track_modes to relabel a sweep)
+    mode_labels, mode_margin = classify_modes(modal["eigenvalues"], axis, modal["eigenvectors"])
+
+    return {
+        "aircraft_matrix": aircraft_matrix,
+        "control_matrix": control_matrix,
+        "eigenvalues": modal["eigenvalues"],
+        "natural_frequency": modal["natural_frequency"],
+        "damping_ratio": modal["damping_ratio"],
+        "mode_labels": mode_labels,
+        "mode_margin": mode_margin,
+    }
+
+
+def report_progress(done, total, points, elapsed):
+    rate = points / elapsed if elapsed > 0 else float("inf")
+    print(f"\rchunk {done}/{total} - {points} points - {rate:,.0f} points/s", end="", file=sys.stderr, flush=True)
+    if done == total:
+        print(file=sys.stderr)
+
+
+def run_sweep(axis, grid, geometric_content, nominal=None, workers=None, chunk_size=None, progress=report_progress,
+              on_chunk=None, keep=None):
+    '''
+    Evaluate the pipeline over every point of the grid, chunks are spread over a process pool
+    :param grid: dict name -> column of the swept cruise conditions (or stability derivatives)
+    :param nominal: (cruise conditions, stability derivatives) dicts for everything that is not swept
+    :param workers: number of processes, one per core by default (1 runs in this process)
+    :param chunk_size: points per chunk
+    :param progress: callback(done chunks, total chunks, done points, elapsed seconds)
+    :param on_chunk: callback(start row, inputs, results) called as each chunk completes
+    :param keep: names of the results to concatenate, all by default (an empty tuple keeps none of them,
+    on_chunk then reduces the chunks as they come and the memory stays bounded by IN_FLIGHT * workers chunks)
+    :return: (inputs, results) dicts of arrays with one row per grid point, in grid order
+    '''
+    cruise_nominal, stability_nominal = nominal or load_nominal(axis)
+    size = len(next(iter(grid.values())))
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, min(50000, -(-size // (workers * 4))))
+    starts = list(range(0, size, chunk_size))
+
+    def chunk_inputs(start):
+        rows = slice(start, start + chunk_size)
+        stability_der = dict(stability_nominal)
+        points = {}
+        for name, column in grid.items():
+            if name in stability_nominal:
+                stability_der[name] = column[rows]
+            else:
+                points[name] = column[rows]
+        return swept_conditions(cruise_nominal, points), stability_der
+
+    chunks = [None] * len(starts)
+    begin = time.perf_counter()
+    done_points = 0
+
+    def collect(index, result):
+        nonlocal done_points
+        rows = len(result["eigenvalues"])
+        done_points += rows
+        if on_chunk is not None:
+            on_chunk(starts[index], {name: column[starts[index]:starts[index] + rows] for name, column in grid.items()},
+                     result)
+        chunks[index] = {name: values for name, values in result.items() if keep is None or name in keep}
+        if progress is not None:
+            progress(sum(chunk is not None for chunk in chunks), len(starts), done_points, time.perf_counter() - begin)
+
+    if workers == 1:
+        for index, start in enumerate(starts):
+            collect(index, sweep_chunk(axis, *chunk_inputs(start), geometric_content))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # at most IN_FLIGHT chunks per worker are submitted at once, the next one is submitted as each one
+            # finishes and a finished future (and its result) is dropped as soon as it is collected
+            pending = iter(enumerate(starts))
+            futures = {}
+
+            def submit():
+                for index, start in itertools.islice(pending, IN_FLIGHT * workers - len(futures)):
+                    futures[executor.submit(sweep_chunk, axis, *chunk_inputs(start), geometric_content)] = index
+
+            submit()
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    collect(futures[future], future.result())
+                    del futures[future]
+                submit()
+
+    results = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]} if chunks else {}
+    return dict(grid), results
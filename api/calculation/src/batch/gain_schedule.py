@@ -0,0 +1,176 @@
+import bisect
+import json
+import time
+
+import numpy as np
+
+from batch.envelope_sweep import batch_matrices, build_grid, load_nominal, swept_conditions
+
+# scheduling variables, in the order of the table dimensions
+VARIABLES = ("h", "V", "m")
+
+MATRICES = ("aircraft_matrix", "control_matrix")
+
+# query points interpolated together, their corner rows fit in the cpu cache
+LOOKUP_BLOCK = 256
+
+
+class GainSchedule:
+    '''
+    This class holds the aircraft and control matrices precomputed over a regular altitude / speed / mass grid
+    Every model is a row of one contiguous float64 table of shape (n_h, n_V, n_m, size of the flattened matrices),
+    lookup() interpolates it multilinearly for a batch of query points
+    '''
+
+    def __init__(self, grid, table, layout):
+        '''
+        :param grid: dict h/V/m -> strictly increasing values of the axis
+        :param table: array (n_h, n_V, n_m, width) of the flattened matrices
+        :param layout: dict (axis, matrix) -> (offset, shape) of each matrix in a table row
+        '''
+        self.grid = {name: np.asarray(grid[name], dtype=float) for name in VARIABLES}
+        for name, values in self.grid.items():
+            if values.ndim != 1 or len(values) < 2 or np.any(np.diff(values) <= 0):
+                raise ValueError(f"The {name} axis needs at least two strictly increasing values")
+
+        self.table = np.ascontiguousarray(table, dtype=float)
+        self.layout = dict(layout)
+        self.shape = tuple(len(self.grid[name]) for name in VARIABLES)
+
+        # the table seen as one row per grid point and the row offsets of the 8 corners of a grid cell
+        self.rows = self.table.reshape(-1, self.table.shape[-1])
+        n_V, n_m = self.shape[1], self.shape[2]
+        self.corners = np.array([[di, dj, dk] for di in (0, 1) for dj in (0, 1) for dk in (0, 1)])
+        self.strides = (n_V * n_m, n_m, 1)
+        self.corner_offsets = self.corners @ np.array(self.strides)
+
+        # position of every matrix in a row and the axes as python lists for lookup_point
+        self.slices = [(key, offset, offset + int(np.prod(shape)), tuple(shape))
+                       for key, (offset, shape) in self.layout.items()]
+        self.grid_lists = {name: values.tolist() for name, values in self.grid.items()}
+
+    @classmethod
+    def build(cls, grid, geometric_content, nominal=None, axes=("longitudinal", "lateral")):
+        '''
+        Precompute the matrices of every grid point with the batch builders
+        :param grid: dict h/V/m -> values of the axis
+        :param nominal: dict axis -> (cruise conditions, stability derivatives), the bundled files by default
+        :param axes: axes whose matrices are stored
+        '''
+        points = build_grid({name: grid[name] for name in VARIABLES})
+        shape = tuple(len(grid[name]) for name in VARIABLES)
+
+        columns = []
+        layout = {}
+        offset = 0
+        for axis in axes:
+            cruise_nominal, stability_nominal = (nominal or {}).get(axis) or load_nominal(axis)
+            cruise_conditions = swept_conditions(cruise_nominal, points)
+            for name, matrices in zip(MATRICES, batch_matrices(axis, cruise_conditions, stability_nominal,
+                                                               geometric_content)):
+                layout[(axis, name)] = (offset, matrices.shape[1:])
+                columns.append(matrices.reshape(len(matrices), -1))
+                offset += columns[-1].shape[1]
+
+        table = np.concatenate(columns, axis=1).reshape(shape + (offset,))
+        return cls(grid, table, layout)
+
+    def cell(self, name, values):
+        '''
+        :return: (index of the lower grid value, interpolation weight of the upper one) of every query value
+        '''
+        axis = self.grid[name]
+        values = np.asarray(values, dtype=float)
+        outside = (values < axis[0]) | (values > axis[-1])
+        if np.any(outside):
+            raise ValueError(f"{name} outside of the schedule [{axis[0]}, {axis[-1]}]: {values[outside][:5]}")
+        index = np.clip(np.searchsorted(axis, values, side="right") - 1, 0, len(axis) - 2)
+        weight = (values - axis[index]) / (axis[index + 1] - axis[index])
+        return index, weight
+
+    def interpolate(self, h, V, m):
+        '''
+        :return: array (points, width) of the interpolated table rows
+        '''
+        (i, wi), (j, wj), (k, wk) = [self.cell(name, values) for name, values in zip(VARIABLES, (h, V, m))]
+        base = (i * self.shape[1] + j) * self.shape[2] + k
+
+        # weight of every corner of the cell: (1 - w) for the lower and w for the upper grid value of each axis
+        lower_upper = [np.stack([1 - w, w], axis=-1) for w in (wi, wj, wk)]
+        weights = (lower_upper[0][:, self.corners[:, 0]] * lower_upper[1][:, self.corners[:, 1]]
+                   * lower_upper[2][:, self.corners[:, 2]])
+
+        # the 8 corner rows are gathered block by block so that they stay in the cpu cache
+        values = np.empty((len(base), self.rows.shape[1]))
+        for start in range(0, len(base), LOOKUP_BLOCK):
+            block = slice(start, start + LOOKUP_BLOCK)
+            np.matmul(weights[block, None, :], self.rows[base[block, None] + self.corner_offsets],
+                      out=values[block, None, :])
+        return values
+
+    def lookup(self, h, V, m):
+        '''
+        Multilinear interpolation of the matrices at a batch of points
+        :param h: altitudes (m), V: true airspeeds (m/s), m: masses (kg), scalars or arrays of the same length
+        :return: dict (axis, matrix) -> array (points, rows, columns), a single matrix for scalar queries
+        '''
+        if np.ndim(h) == 0 and np.ndim(V) == 0 and np.ndim(m) == 0:
+            return self.lookup_point(h, V, m)
+
+        h, V, m = np.broadcast_arrays(*[np.asarray(values, dtype=float) for values in (h, V, m)])
+        values = self.interpolate(h.ravel(), V.ravel(), m.ravel())
+        return {key: values[:, start:stop].reshape((len(values),) + shape) for key, start, stop, shape in self.slices}
+
+    def lookup_point(self, h, V, m):
+        '''
+        Multilinear interpolation of the matrices at one point, without the array overhead of lookup()
+        :return: dict (axis, matrix) -> matrix
+        '''
+        base = 0
+        cell = []
+        for name, value, stride in zip(VARIABLES, (h, V, m), self.strides):
+            grid = self.grid_lists[name]
+            value = float(value)
+            if not grid[0] <= value <= grid[-1]:
+                raise ValueError(f"{name} outside of the schedule [{grid[0]}, {grid[-1]}]: {value}")
+            index = min(bisect.bisect_right(grid, value) - 1, len(grid) - 2)
+            weight = (value - grid[index]) / (grid[index + 1] - grid[index])
+            cell.append((1.0 - weight, weight))
+            base += index * stride
+
+        # corner weights in the order of self.corners (h slowest, m fastest)
+        (h0, h1), (V0, V1), (m0, m1) = cell
+        weights = np.array([h0 * V0 * m0, h0 * V0 * m1, h0 * V1 * m0, h0 * V1 * m1,
+                            h1 * V0 * m0, h1 * V0 * m1, h1 * V1 * m0, h1 * V1 * m1])
+        values = weights @ self.rows[base + self.corner_offsets]
+        return {key: values[start:stop].reshape(shape) for key, start, stop, shape in self.slices}
+
+    def save(self, path):
+        '''
+        Write the schedule to an npz file (grid, table and layout)
+        '''
+        layout = [[axis, name, offset, list(shape)] for (axis, name), (offset, shape) in self.layout.items()]
+        np.savez(path, table=self.table, layout=json.dumps(layout), **self.grid)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            layout = {(axis, name): (offset, tuple(shape))
+                      for axis, name, offset, shape in json.loads(str(data["layout"]))}
+            return cls({name: data[name] for name in VARIABLES}, data["table"], layout)
+
+
+def build_schedule(grid, geometric_content, nominal=None, axes=("longitudinal", "lateral")):
+    '''
+    :return: (GainSchedule, json friendly summary of the table)
+    '''
+    begin = time.perf_counter()
+    schedule = GainSchedule.build(grid, geometric_content, nominal, axes)
+    return schedule, {
+        "shape": list(schedule.shape),
+        "points": int(np.prod(schedule.shape)),
+        "models": [f"{axis}.{name}" for axis, name in schedule.layout],
+        "table_bytes": int(schedule.table.nbytes),
+        "build_time": time.perf_counter() - begin,
+        "grid": {name: [float(values[0]), float(values[-1]), len(values)] for name, values in schedule.grid.items()},
+    }
@@ -0,0 +1,94 @@
+import numpy as np
+
+from analysis.modal_analysis import mode_parameters
+from batch.envelope_sweep import load_nominal, run_sweep
+
+PERCENTILES = [1, 5, 50, 95, 99]
+
+
+def draw_samples(distributions, nominal_values, samples, seed=None):
+    '''
+    :param distributions: dict name -> {"distribution": "normal", "sigma": s[, "mean": m]}
+    or {"distribution": "uniform", "low": l, "high": h}, the mean defaults to the nominal value
+    :param nominal_values: dict name -> nominal value (stability derivatives and cruise conditions)
+    :param samples: number of samples
+    :return: dict name -> (samples,) column
+    '''
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, spec in distributions.items():
+        if name not in nominal_values:
+            raise KeyError(f"{name} is not a stability derivative or a cruise condition")
+        distribution = spec.get("distribution", "normal")
+        if distribution == "normal":
+            columns[name] = rng.normal(spec.get("mean", nominal_values[name]), spec["sigma"], samples)
+        elif distribution == "uniform":
+            columns[name] = rng.uniform(spec["low"], spec["high"], samples)
+        else:
+            raise ValueError(f"Unknown distribution {distribution}")
+    return columns
+
+
+def statistics(values):
+    '''
+    :return: mean, std, min, max and percentiles of the finite values
+    '''
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return None
+    return {
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "percentiles": dict(zip(PERCENTILES, np.percentile(values, PERCENTILES).tolist())),
+    }
+
+
+def monte_carlo(axis, distributions, geometric_content, samples=100000, seed=None, nominal=None, workers=None,
+                chunk_size=None, progress=None, store=None):
+    '''
+    Propagate the uncertainty of stability derivatives (or cruise conditions) to the modes
+    The samples go through the batch matrix builders and the batched eigen analysis chunk by chunk,
+    only the natural frequency, damping ratio and stability of every mode are kept per sample
+    :param distributions: see draw_samples
+    :param samples: number of samples
+    :param nominal: (cruise conditions, stability derivatives) dicts, the bundled files by default
+    :param store: ResultStore receiving the samples and every result of each chunk as it completes
+    :return: dict with the per mode statistics, the probability of instability and the per sample arrays
+    '''
+    cruise_nominal, stability_nominal = nominal or load_nominal(axis)
+    columns = draw_samples(distributions, {**cruise_nominal, **stability_nominal}, samples, seed)
+
+    modes = {}
+
+    def reduce_chunk(start, inputs, results):
+        if store is not None:
+            store.append(start, inputs, results)
+        labelled = mode_parameters(results["eigenvalues"], results["mode_labels"], axis)
+        rows = slice(start, start + len(results["eigenvalues"]))
+        for mode, parameters in labelled.items():
+            if mode not in modes:
+                modes[mode] = {
+                    "natural_frequency": np.empty(samples),
+                    "damping_ratio": np.empty(samples),
+                    "unstable": np.empty(samples, dtype=bool),
+                }
+            for name, values in modes[mode].items():
+                values[rows] = parameters[name]
+
+    run_sweep(axis, columns, geometric_content, (cruise_nominal, stability_nominal), workers=workers,
+              chunk_size=chunk_size or 50000, progress=progress, on_chunk=reduce_chunk, keep=())
+
+    unstable = np.zeros(samples, dtype=bool)
+    report = {"samples": samples, "modes": {}}
+    for mode, values in modes.items():
+        unstable |= values["unstable"]
+        report["modes"][mode] = {
+            "natural_frequency": statistics(values["natural_frequency"]),
+            "damping_ratio": statistics(values["damping_ratio"]),
+            "probability_of_instability": float(values["unstable"].mean()),
+        }
+    report["probability_of_instability"] = float(unstable.mean())
+
+    return report, columns, modes
@@ -0,0 +1,228 @@
+'''
+Chunked columnar store of sweep and Monte Carlo results.
+
+    store/
+        index.json                  columns (dtype, shape of one row), chunks (first row, rows, min/max of every input)
+        chunk-000000000000/
+            V.npy                   one fixed dtype .npy file per column, (rows,) + row shape
+            eigenvalues.npy
+            ...
+
+Chunks are written as they complete (in any order) and index.json is replaced atomically after each one, so a reader
+never sees a partial chunk. Readers memory-map the .npy files and only open the chunks whose input ranges can match
+a query, the rows of a selection are the only data read from disk.
+'''
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from analysis.modal_analysis import mode_parameters
+
+INDEX = "index.json"
+
+
+def chunk_name(start):
+    return f"chunk-{start:012d}"
+
+
+def write_index(path, index):
+    '''
+    Replace index.json atomically (temporary file then rename)
+    '''
+    fd, tmp_path = tempfile.mkstemp(dir=path, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, os.path.join(path, INDEX))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def mode_columns(axis, results):
+    '''
+    :return: dict "<mode>.<parameter>" -> column of the per mode metrics, from the labels of the sweep chunk
+    '''
+    if "mode_labels" not in results:
+        return {}
+    modes = mode_parameters(results["eigenvalues"], results["mode_labels"], axis)
+    return {f"{mode}.{name}": values for mode, parameters in modes.items() for name, values in parameters.items()}
+
+
+class ResultStore:
+    '''
+    This class writes and reads a store directory, see the module docstring for the layout
+    '''
+
+    def __init__(self, path, index):
+        self.path = path
+        self.index = index
+
+    @classmethod
+    def create(cls, path, axis=None, dtypes=None, overwrite=False, metadata=None):
+        '''
+        :param axis: "longitudinal" or "lateral", adds the per mode metrics of every chunk with mode labels
+        :param dtypes: dict column -> dtype overriding the dtype of the first chunk (e.g. "<f4" to halve a column)
+        :param overwrite: replace an existing store
+        :param metadata: json friendly description of the run kept in the index
+        '''
+        if os.path.exists(os.path.join(path, INDEX)):
+            if not overwrite:
+                raise ValueError(f"{path} already holds a result store")
+            shutil.rmtree(path)
+        os.makedirs(path, exist_ok=True)
+
+        index = {
+            "axis": axis,
+            "metadata": metadata or {},
+            "dtypes": {name: np.dtype(dtype).str for name, dtype in (dtypes or {}).items()},
+            "inputs": [],
+            "columns": {},
+            "chunks": [],
+        }
+        write_index(path, index)
+        return cls(path, index)
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, INDEX), "r") as f:
+            return cls(path, json.load(f))
+
+    # ----------------- writing ----------------- #
+    def append(self, start, inputs, results):
+        '''
+        Write one chunk, the signature is the on_chunk callback of run_sweep
+        :param start: first row of the chunk in the whole run
+        :param inputs: dict name -> (rows,) column of the swept flight conditions (or stability derivatives)
+        :param results: dict name -> (rows, ...) array of the chunk results
+        '''
+        columns = dict(inputs)
+        columns.update(results)
+        columns.update(mode_columns(self.index["axis"], results))
+        rows = len(next(iter(columns.values())))
+
+        if not self.index["columns"]:
+            self.index["inputs"] = list(inputs)
+            for name, values in columns.items():
+                dtype = self.index["dtypes"].get(name, np.asarray(values).dtype.str)
+                self.index["columns"][name] = {"dtype": dtype, "shape": list(np.shape(values)[1:])}
+        elif set(columns) != set(self.index["columns"]):
+            raise ValueError(f"The chunk columns {sorted(columns)} differ from the store columns")
+
+        directory = os.path.join(self.path, chunk_name(start))
+        os.makedirs(directory, exist_ok=True)
+        for name, values in columns.items():
+            spec = self.index["columns"][name]
+            values = np.asarray(values).astype(spec["dtype"], copy=False)
+            if len(values) != rows or list(values.shape[1:]) != spec["shape"]:
+                raise ValueError(f"{name} has shape {values.shape}, expected ({rows}, {spec['shape']})")
+            np.save(os.path.join(directory, f"{name}.npy"), values)
+
+        # a chunk written again replaces the previous one
+        self.index["chunks"] = [chunk for chunk in self.index["chunks"] if chunk["start"] != start]
+        self.index["chunks"].append({
+            "start": int(start),
+            "rows": int(rows),
+            "ranges": {name: [float(np.min(inputs[name])), float(np.max(inputs[name]))] for name in inputs},
+        })
+        self.index["chunks"].sort(key=lambda chunk: chunk["start"])
+        write_index(self.path, self.index)
+
+    def update(self, rows, columns):
+        '''
+        Overwrite some rows of existing columns in place (e.g. the relabelled modes of a tracked sweep)
+        :param rows: sorted indices of the rows in the whole run
+        :param columns: dict column -> values of these rows
+        '''
+        rows = np.asarray(rows)
+        for chunk in self.index["chunks"]:
+            first, last = np.searchsorted(rows, [chunk["start"], chunk["start"] + chunk["rows"]])
+            if first == last:
+                continue
+            for name, values in columns.items():
+                path = os.path.join(self.path, chunk_name(chunk["start"]), f"{name}.npy")
+                target = np.load(path, mmap_mode="r+")
+                target[rows[first:last] - chunk["start"]] = values[first:last]
+                target.flush()
+                del target
+
+    # ----------------- reading ----------------- #
+    @property
+    def rows(self):
+        return sum(chunk["rows"] for chunk in self.index["chunks"])
+
+    @property
+    def columns(self):
+        return list(self.index["columns"])
+
+    def chunk(self, chunk, name):
+        '''
+        :return: read-only memory map of one column of one chunk (an entry of index["chunks"])
+        '''
+        return np.load(os.path.join(self.path, chunk_name(chunk["start"]), f"{name}.npy"), mmap_mode="r")
+
+    def chunks(self, columns=None):
+        '''
+        Iterate over the chunks in row order
+        :return: generator of (first row, dict column -> memory map)
+        '''
+        for chunk in self.index["chunks"]:
+            yield chunk["start"], {name: self.chunk(chunk, name) for name in columns or self.columns}
+
+    def column(self, name):
+        '''
+        :return: the whole column in memory, in row order
+        '''
+        spec = self.index["columns"][name]
+        values = np.empty((self.rows,) + tuple(spec["shape"]), dtype=spec["dtype"])
+        row = 0
+        for chunk in self.index["chunks"]:
+            values[row:row + chunk["rows"]] = self.chunk(chunk, name)
+            row += chunk["rows"]
+        return values
+
+    def select(self, columns=None, **ranges):
+        '''
+        Rows whose inputs are all inside the given ranges, e.g. select(["eigenvalues"], h=(0, 3000), V=(100, 150))
+        Chunks whose indexed min/max cannot match are skipped without being opened
+        :param columns: columns to return, all of them by default
+        :param ranges: input name -> (low, high) inclusive range
+        :return: dict column -> array of the matching rows (and "row", their index in the whole run)
+        '''
+        for name in ranges:
+            if name not in self.index["inputs"]:
+                raise ValueError(f"{name} is not an input of the store, inputs: {self.index['inputs']}")
+        columns = columns or self.columns
+
+        parts = {name: [] for name in ["row"] + list(columns)}
+        for chunk in self.index["chunks"]:
+            if any(chunk["ranges"][name][1] < low or chunk["ranges"][name][0] > high
+                   for name, (low, high) in ranges.items()):
+                continue
+
+            mask = np.ones(chunk["rows"], dtype=bool)
+            for name, (low, high) in ranges.items():
+                values = self.chunk(chunk, name)
+                mask &= (values >= low) & (values <= high)
+            rows = np.flatnonzero(mask)
+            if len(rows) == 0:
+                continue
+
+            parts["row"].append(chunk["start"] + rows)
+            for name in columns:
+                parts[name].append(np.asarray(self.chunk(chunk, name)[rows]))
+
+        selection = {}
+        for name, values in parts.items():
+            if values:
+                selection[name] = np.concatenate(values)
+            elif name == "row":
+                selection[name] = np.empty(0, dtype=np.intp)
+            else:
+                spec = self.index["columns"][name]
+                selection[name] = np.empty((0,) + tuple(spec["shape"]), dtype=spec["dtype"])
+        return selection
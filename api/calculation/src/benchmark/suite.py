@@ -0,0 +1,306 @@
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from analysis.modal_analysis import classify_modes, modal_analysis
+from batch.gain_schedule import GainSchedule
+from data import atmosphere
+from calculation.src.pipeline import LATERAL_MODES, LONGITUDINAL_MODES, build_airplane, load_geometry
+from lateral.lat_batch_matrix import lat_batch_matrices
+from longitudinal.lon_batch_matrix import long_batch_matrices
+from service.rendering import RENDERERS, render_modes
+from what_if import WhatIfModel
+
+FILES = {
+    "longitudinal": ["calculation/flights/longitudinal/longitudinalSD.json",
+                     "calculation/flights/longitudinal/flightConditions.json"],
+    "lateral": ["calculation/flights/lateral/lateralSD.json",
+                "calculation/flights/lateral/flightConditions.json"],
+}
+
+ENTRY_POINTS = {
+    "longitudinal": "main_lon",
+    "lateral": "main_lat",
+}
+
+
+def measure(function, repeat=5, min_time=0.2):
+    '''
+    Time one call of function: the number of calls per repetition is grown until a repetition lasts min_time
+    :return: dict of seconds per call (min, median, mean, stdev) with the number of calls and repetitions
+    '''
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def read_files(axis):
+    with open(FILES[axis][0], "r") as f:
+        stability_der = f.read()
+    with open(FILES[axis][1], "r") as f:
+        cruise_conditions = f.read()
+    return [stability_der, cruise_conditions]
+
+
+# ----------------- single point stages ----------------- #
+def calculate_derivatives(airplane):
+    if airplane.axis == "longitudinal":
+        S, c = airplane.wing_area, airplane.wing_mean_chord
+        airplane.calculate_Xu(S)
+        airplane.calculate_Xw(airplane.aspect_ratio, airplane.wing_oswald, S)
+        airplane.calculate_Zu(S)
+        airplane.calculate_Zw(S)
+        airplane.calculate_Zw_dot(c, S)
+        airplane.calculate_Zq(c, S)
+        airplane.calculate_Mu(c, S)
+        airplane.calculate_Mw(c, S)
+        airplane.calculate_Mw_dot(c, S)
+        airplane.calculate_Mq(c, S)
+    else:
+        S, b = airplane.wing_area, airplane.wingspan
+        airplane.calculate_Yv(S)
+        for name in ["Yp", "Yr", "Lv", "Lp", "Lr", "Nv", "Np", "Nr"]:
+            getattr(airplane, "calculate_" + name)(S, b)
+
+
+def assemble_matrices(airplane):
+    if airplane.axis == "longitudinal":
+        airplane.set_long_stability_aircraft_matrix()
+        airplane.get_longitudinal_control_matrix()
+    else:
+        airplane.set_lat_stability_aircraft_matrix()
+        airplane.get_lateral_control_matrix()
+
+
+def prepared_airplane(axis, user_file, geometric_content):
+    airplane = build_airplane(axis, user_file, geometric_content)
+    if axis == "longitudinal":
+        airplane.get_longitudinal_aicraft_matrix()
+        airplane.get_longitudinal_control_matrix()
+        airplane.set_eigenvalues()
+        airplane.set_natural_frequency()
+        airplane.set_damping_ratio()
+    else:
+        airplane.get_lateral_aircraft_matrix()
+        airplane.get_lateral_control_matrix()
+        airplane.set_lateral_eigenvalues()
+        airplane.set_lateral_natural_frequency()
+        airplane.set_lateral_damping_ratio()
+    return airplane
+
+
+def stage_benchmarks(axis, geometric_content):
+    '''
+    :return: dict stage name -> function timing that stage alone for the bundled flight data
+    '''
+    files = read_files(axis)
+    user_file = [json.loads(item) for item in files]
+    airplane = prepared_airplane(axis, user_file, geometric_content)
+
+    stages = {
+        "json_load": lambda: build_airplane(axis, files, geometric_content),
+        "derivatives": lambda: calculate_derivatives(airplane),
+        "matrix_assembly": lambda: assemble_matrices(airplane),
+    }
+
+    if axis == "longitudinal":
+        stages["eigen_analysis"] = airplane.set_eigenvalues
+        stages["transfer_functions"] = airplane.set_long_transfer_functions
+        modes, plot, plotter = LONGITUDINAL_MODES, airplane.lon_plot_stability, airplane.lon_mode_plotter()
+    else:
+        stages["eigen_analysis"] = airplane.set_lateral_eigenvalues
+        stages["transfer_functions"] = airplane.set_lateral_transfer_functions
+        modes, plot, plotter = LATERAL_MODES, airplane.lat_plot_stability, airplane.lat_mode_plotter()
+
+    stages["frequency_response"] = airplane.set_frequency_response
+    stages["root_locus"] = lambda: airplane.set_root_locus("q:elevator" if axis == "longitudinal" else "r:rudder",
+                                                           np.linspace(-5, 5, 1000))
+    # one coefficient changed back and forth, the derivative, the matrix entry and the eigen analysis are redone
+    model = WhatIfModel(airplane)
+    coefficient = "C_m_q" if axis == "longitudinal" else "C_N_r"
+    values = itertools.cycle([model.inputs[coefficient] * 1.01, model.inputs[coefficient]])
+    stages["what_if_edit"] = lambda: (model.set(coefficient, next(values)), model.modes())
+    for mode in modes:
+        stages[f"plot_{mode}"] = lambda mode=mode: plot(mode, "png")
+        stages[f"plot_data_{mode}"] = lambda mode=mode: plot(mode, "data")
+    # every mode of the axis at once, with each renderer of service/rendering.py
+    for renderer in RENDERERS:
+        stages[f"plots_{renderer}"] = lambda renderer=renderer: list(render_modes(plotter, modes, "png",
+                                                                                  renderer=renderer))
+
+    return stages
+
+
+# ----------------- batch stages ----------------- #
+def synthetic_batch(axis, size, seed=0):
+    '''
+    :return: cruise conditions and stability derivative columns scattered +-20% around the bundled flight data
+    '''
+    rng = np.random.default_rng(seed)
+    stability_der, cruise_conditions = [json.loads(item) for item in read_files(axis)]
+
+    def columns(data):
+        return {name: item["value"] * rng.uniform(0.8, 1.2, size) if item["value"] != -1111 else item["value"]
+                for name, item in data.items() if isinstance(item.get("value"), (int, float))}
+
+    return columns(cruise_conditions), columns(stability_der)
+
+
+def batch_benchmarks(axis, geometric_content, size):
+    cruise_conditions, stability_der = synthetic_batch(axis, size)
+    S = geometric_content["S"]["value"]
+
+    if axis == "longitudinal":
+        def build():
+            return long_batch_matrices(cruise_conditions, stability_der, S, geometric_content["AR"]["value"],
+                                       geometric_content["e"]["value"], geometric_content["c"]["value"])
+    else:
+        def build():
+            return lat_batch_matrices(cruise_conditions, stability_der, S, geometric_content["b"]["value"])
+
+    aircraft_matrices = build()[1]
+    modal = modal_analysis(aircraft_matrices)
+
+    # interpolated models of a gain schedule over the envelope, at random points
+    schedule = GainSchedule.build({"h": np.linspace(0, 12000, 13), "V": np.linspace(80, 250, 18),
+                                   "m": np.linspace(4000, 6000, 5)}, geometric_content, axes=(axis,))
+    rng = np.random.default_rng(0)
+    queries = [rng.uniform(0, 12000, size), rng.uniform(80, 250, size), rng.uniform(4000, 6000, size)]
+
+    return {
+        f"batch_matrices_{size}": build,
+        f"batch_eigen_analysis_{size}": lambda: modal_analysis(aircraft_matrices),
+        f"batch_mode_classification_{size}": lambda: classify_modes(modal["eigenvalues"], axis, modal["eigenvectors"]),
+        f"gain_schedule_lookup_{size}": lambda: schedule.lookup(*queries),
+        "gain_schedule_lookup_point": lambda: schedule.lookup(6096.0, 137.2, 4990.0),
+        f"atmosphere_exact_{size}": lambda: atmosphere.density(queries[0]),
+        f"atmosphere_table_{size}": lambda: atmosphere.standard_table().density(queries[0]),
+    }
+
+
+# ----------------- full runs ----------------- #
+def run_process(arguments):
+    # the disk tier of the result cache is disabled so that every run computes the analysis
+    environment = dict(os.environ, AS_CACHE_DIR="")
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + arguments, check=True, stdout=subprocess.DEVNULL, env=environment)
+    return time.perf_counter() - start
+
+
+def process_benchmarks(axis, repeat=3, keep=None):
+    '''
+    Cold import and full command line runs, each in a fresh interpreter
+    :param keep: function(name) -> bool, the runs it rejects are not started
+    '''
+    stability_der, cruise_conditions = read_files(axis)
+    module = ENTRY_POINTS[axis]
+    results = {}
+
+    for name, arguments in [
+        (f"cold_import_{module}", ["-c", f"import {module}"]),
+        (f"full_run_{module}", ["-m", module, cruise_conditions, stability_der]),
+        (f"full_run_{module}_no_plots", ["-m", module, cruise_conditions, stability_der, "--plots", "none"]),
+    ]:
+        if keep is not None and not keep(name):
+            continue
+        timings = [run_process(arguments) for _ in range(repeat)]
+        results[name] = {
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "mean": statistics.mean(timings),
+            "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            "number": 1,
+            "repeat": repeat,
+        }
+
+    return results
+
+
+def run_suite(axes=("longitudinal", "lateral"), batch_size=10000, repeat=5, min_time=0.2, processes=True,
+              select=None, progress=None):
+    '''
+    :param select: only run the benchmarks whose name contains one of these strings
+    :param progress: callback(name, result) after each benchmark
+    :return: dict with the environment and the results (seconds per call) of every benchmark by "axis.name"
+    '''
+    geometric_content = load_geometry()
+    results = {}
+
+    def keep(name):
+        return not select or any(item in name for item in select)
+
+    for axis in axes:
+        benchmarks = stage_benchmarks(axis, geometric_content)
+        benchmarks.update(batch_benchmarks(axis, geometric_content, batch_size))
+        for name, function in benchmarks.items():
+            if keep(f"{axis}.{name}"):
+                results[f"{axis}.{name}"] = measure(function, repeat, min_time)
+                if progress is not None:
+                    progress(f"{axis}.{name}", results[f"{axis}.{name}"])
+
+        if processes:
+            for name, result in process_benchmarks(axis, keep=lambda name: keep(f"{axis}.{name}")).items():
+                results[f"{axis}.{name}"] = result
+                if progress is not None:
+                    progress(f"{axis}.{name}", result)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold=0.1):
+    '''
+    :param threshold: relative slow down of the median counted as a regression
+    :return: list of rows (name, baseline median, median, ratio, status) for the benchmarks of both runs
+    '''
+    rows = []
+    for name, result in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["median"]
+        ratio = result["median"] / before if before > 0 else float("inf")
+        if ratio > 1 + threshold:
+            status = "slower"
+        elif ratio < 1 - threshold:
+            status = "faster"
+        else:
+            status = "same"
+        rows.append({"name": name, "baseline": before, "median": result["median"], "ratio": ratio, "status": status})
+    return rows
@@ -0,0 +1,153 @@
+'''
+International Standard Atmosphere (ISA) from sea level to 32 km.
+
+Every function takes the geopotential altitude h (m) as a scalar or a numpy array (complex values are accepted
+for complex-step differentiation, the layer is chosen from the real part). AtmosphereTable interpolates
+precomputed values instead, which is faster for large batches of altitudes.
+'''
+import numpy as np
+
+R = 287.05287  # specific gas constant of air (J/(kg.K))
+GAMMA = 1.4  # heat capacity ratio of air
+G0 = 9.80665  # standard gravity (m/s^2)
+
+P0 = 101325.0  # sea level pressure (Pa)
+T0 = 288.15  # sea level temperature (K)
+
+# base altitude (m) and temperature lapse rate (K/m) of the troposphere and the two stratosphere layers
+LAYERS = [(0.0, -0.0065), (11000.0, 0.0), (20000.0, 0.001)]
+CEILING = 32000.0
+
+
+def _layer_bases():
+    '''
+    :return: temperature (K) and pressure (Pa) at the base of every layer
+    '''
+    bases = [(T0, P0)]
+    for (base, lapse), (top, _) in zip(LAYERS, LAYERS[1:]):
+        T, p = bases[-1]
+        T_top = T + lapse * (top - base)
+        if lapse == 0.0:
+            p_top = p * np.exp(-G0 * (top - base) / (R * T))
+        else:
+            p_top = p * (T_top / T) ** (-G0 / (R * lapse))
+        bases.append((T_top, p_top))
+    return bases
+
+
+LAYER_BASES = _layer_bases()
+
+
+def _check_altitude(h):
+    h = np.asarray(h)
+    real = np.real(h)
+    if np.any((real < 0.0) | (real > CEILING)):
+        raise ValueError(f"Altitude outside of the standard atmosphere [0, {CEILING:.0f}] m")
+    return h, real
+
+
+def temperature_pressure(h):
+    '''
+    :return: temperature (K) and pressure (Pa) at altitude h
+    '''
+    h, real = _check_altitude(h)
+    T = np.zeros_like(h, dtype=complex if np.iscomplexobj(h) else float)
+    p = np.zeros_like(T)
+
+    for (base, lapse), (T_base, p_base), top in zip(LAYERS, LAYER_BASES, [b for b, _ in LAYERS[1:]] + [np.inf]):
+        inside = (real >= base) & (real < top) if top != np.inf else real >= base
+        dh = h - base
+        T_layer = T_base + lapse * dh
+        if lapse == 0.0:
+            p_layer = p_base * np.exp(-G0 * dh / (R * T_base))
+        else:
+            p_layer = p_base * (T_layer / T_base) ** (-G0 / (R * lapse))
+        T = np.where(inside, T_layer, T)
+        p = np.where(inside, p_layer, p)
+
+    if T.ndim == 0:
+        return T[()], p[()]
+    return T, p
+
+
+def temperature(h):
+    return temperature_pressure(h)[0]
+
+
+def pressure(h):
+    return temperature_pressure(h)[1]
+
+
+def density(h):
+    '''
+    :return: air density (kg/m^3) at altitude h
+    '''
+    T, p = temperature_pressure(h)
+    return p / (R * T)
+
+
+def speed_of_sound(h):
+    '''
+    :return: speed of sound (m/s) at altitude h
+    '''
+    return np.sqrt(GAMMA * R * temperature(h))
+
+
+def mach(h, V):
+    '''
+    :return: Mach number of the true airspeed V (m/s) at altitude h
+    '''
+    return V / speed_of_sound(h)
+
+
+def dynamic_pressure(h, V):
+    '''
+    :return: dynamic pressure rho * V^2 / 2 (Pa) of the true airspeed V (m/s) at altitude h
+    '''
+    return density(h) * V ** 2 / 2
+
+
+class AtmosphereTable:
+    '''
+    This class holds the density and the speed of sound precomputed every step meters and interpolates them
+    linearly (the relative error is below 1e-6 with the default 10 m step)
+    The grid is uniform so the interval of an altitude is found by a division instead of a search
+    '''
+
+    def __init__(self, step=10.0, ceiling=CEILING):
+        self.step = step
+        self.ceiling = ceiling
+        self.h = np.arange(int(np.ceil(ceiling / step)) + 1) * step
+        self.values = {
+            "density": density(np.minimum(self.h, ceiling)),
+            "speed_of_sound": speed_of_sound(np.minimum(self.h, ceiling)),
+        }
+
+    def interpolate(self, name, h):
+        h = np.asarray(h, dtype=float)
+        if np.any((h < 0.0) | (h > self.ceiling)):
+            raise ValueError(f"Altitude outside of the standard atmosphere [0, {self.ceiling:.0f}] m")
+        position = h / self.step
+        index = np.minimum(position.astype(np.intp), len(self.h) - 2)
+        weight = position - index
+        values = self.values[name]
+        return values[index] + weight * (values[index + 1] - values[index])
+
+    def density(self, h):
+        return self.interpolate("density", h)
+
+    def speed_of_sound(self, h):
+        return self.interpolate("speed_of_sound", h)
+
+
+_standard_table = None
+
+
+def standard_table():
+    '''
+    :return: the AtmosphereTable shared by the process, built on first use
+    '''
+    global _standard_table
+    if _standard_table is None:
+        _standard_table = AtmosphereTable()
+    return _standard_table
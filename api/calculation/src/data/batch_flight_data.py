@@ -0,0 +1,54 @@
+import numpy as np
+
+from data.flight_condition import COMPUTED, dynamic_pressure, fill_atmosphere
+
+
+class BatchFlightData:
+    '''
+    This class holds many flight conditions at once
+    Every cruise condition and stability derivative is stored as a numpy column (one row per flight condition)
+    '''
+
+    def __init__(self, cruise_conditions, stability_der):
+        '''
+        :param cruise_conditions: dict name -> array (or scalar) of cruise conditions (m, V, Iyy, rho, ...)
+        :param stability_der: dict name -> array (or scalar) of stability derivatives (C_L_alpha, ...)
+        '''
+        names = list(cruise_conditions) + list(stability_der)
+        columns = np.broadcast_arrays(*[self._as_column(value) for value in
+                                        list(cruise_conditions.values()) + list(stability_der.values())])
+
+        columns = dict(zip(names, columns))
+        self.cruise_conditions = {name: columns[name] for name in cruise_conditions}
+        self.stability_der = {name: columns[name] for name in stability_der}
+        self.size = len(columns[names[0]]) if names else 0
+
+        # same rules as FlightData: -1111 rho, a and Mach come from the standard atmosphere at h (interpolated
+        # in the precomputed table) and q_mean == -1111 means it has to be computed from rho and V
+        self.cruise_conditions = fill_atmosphere(self.cruise_conditions, table=True)
+        self.q_mean = dynamic_pressure(self.cruise_conditions.get("q_mean", COMPUTED), self.cruise_conditions["rho"],
+                                       self.cruise_conditions["V"])
+
+    @staticmethod
+    def _as_column(value):
+        column = np.atleast_1d(np.asarray(value))
+        if not np.iscomplexobj(column):
+            column = column.astype(float)
+        return column
+
+    @classmethod
+    def from_records(cls, records):
+        '''
+        Build the columns from parsed flight data files
+        :param records: list of (cruise_conditions, stability_der) dicts in the FlightData json format
+        '''
+        cruise_names = [name for name, item in records[0][0].items() if isinstance(item.get("value"), (int, float))]
+        stability_names = [name for name, item in records[0][1].items() if isinstance(item.get("value"), (int, float))]
+
+        cruise_conditions = {name: [record[0][name]["value"] for record in records] for name in cruise_names}
+        stability_der = {name: [record[1][name]["value"] for record in records] for name in stability_names}
+
+        return cls(cruise_conditions, stability_der)
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,234 @@
+import math
+
+import numpy as np
+
+from data import atmosphere
+
+# marker used in the json files for a value that has to be computed
+COMPUTED = -1111
+
+CRUISE_CONDITIONS = ("h", "V", "X_mean_cg", "q_mean", "C_L_0", "rho", "Mach", "m", "C_mean_D0", "C_D_0", "a", "g",
+                     "gamma", "theta", "Ixx", "Iyy", "Izz", "Ixz", "epsilon", "C_T")
+
+# cruise conditions derived from the altitude or the airspeed, recomputed when those change (see recompute_dependents)
+DEPENDENT_CONDITIONS = {
+    "h": ("rho", "a", "Mach", "q_mean"),
+    "V": ("Mach", "q_mean"),
+}
+
+# values the matrix builders of each axis read, they have to be given (and be strictly positive for the second table)
+# rho, a and Mach can be -1111 when the altitude h is given (see fill_atmosphere)
+REQUIRED_CRUISE_CONDITIONS = {
+    "longitudinal": ("V", "q_mean", "C_L_0", "rho", "m", "C_D_0", "g", "theta", "Iyy"),
+    "lateral": ("V", "q_mean", "rho", "m", "g", "theta", "Ixx", "Izz"),
+}
+POSITIVE_CRUISE_CONDITIONS = {
+    "longitudinal": ("V", "rho", "m", "Iyy"),
+    "lateral": ("V", "rho", "m", "Ixx", "Izz"),
+}
+
+REQUIRED_STABILITY_DERIVATIVES = {
+    "longitudinal": ("C_D_u", "C_L_alpha", "C_L_u", "C_L_alpha_dot", "C_L_q", "C_m_u", "C_m_alpha", "C_m_alpha_dot",
+                     "C_m_q", "C_D_d_E", "C_L_d_E", "C_M_d_E", "C_D_d_T", "C_L_d_T", "C_M_d_T"),
+    "lateral": ("C_Y_beta", "C_Y_p", "C_Y_r", "C_L_beta", "C_L_p", "C_L_r", "C_N_beta", "C_N_p", "C_N_r",
+                "C_Y_delta_r", "C_L_delta_r", "C_N_delta_r", "C_Y_delta_a", "C_L_delta_a", "C_N_delta_a"),
+}
+
+
+def json_values(data):
+    '''
+    :param data: parsed flight data json (name -> {"value": ..., "unit": ...})
+    :return: dict name -> value of the numeric entries
+    '''
+    return {name: item["value"] for name, item in data.items()
+            if isinstance(item, dict) and type(item.get("value")) in (int, float)}
+
+
+def dynamic_pressure(q_mean, rho, V):
+    '''
+    q_mean as given, or rho * V^2 / 2 where it is the -1111 marker (scalars or numpy columns)
+    '''
+    if np.ndim(q_mean) == 0 and np.ndim(rho) == 0 and np.ndim(V) == 0:
+        return (rho * V ** 2) / 2 if q_mean == COMPUTED else q_mean
+    return np.where(q_mean == COMPUTED, (rho * V ** 2) / 2, q_mean)
+
+
+def replace_computed(value, computed):
+    '''
+    :return: value, with computed where it is the -1111 marker (scalars or numpy columns)
+    '''
+    if value is None:
+        return computed
+    if np.ndim(value) == 0 and np.ndim(computed) == 0:
+        return computed if value == COMPUTED else value
+    return np.where(np.asarray(value) == COMPUTED, computed, value)
+
+
+def fill_atmosphere(cruise_conditions, table=False):
+    '''
+    Standard atmosphere values of the -1111 (or missing) rho, a and Mach, from the altitude h and the airspeed V
+    q_mean keeps its marker, dynamic_pressure() computes it from the filled rho
+    :param cruise_conditions: dict name -> scalar or numpy column
+    :param table: interpolate the precomputed atmosphere table (faster for large batches, relative error < 1e-6)
+    :return: new dict with the filled values, the same values when h is not given
+    '''
+    values = dict(cruise_conditions)
+
+    def missing(name):
+        return np.any(np.asarray(values.get(name, COMPUTED)) == COMPUTED)
+
+    h = values.get("h")
+    if h is None or np.any(np.asarray(h) == COMPUTED) or not any(missing(name) for name in ("rho", "a", "Mach")):
+        return values
+
+    # complex altitudes (complex-step derivatives) go through the exact functions
+    source = atmosphere.standard_table() if table and not np.iscomplexobj(h) else atmosphere
+
+    if missing("rho"):
+        values["rho"] = replace_computed(values.get("rho"), source.density(h))
+    if missing("a"):
+        values["a"] = replace_computed(values.get("a"), source.speed_of_sound(h))
+    if missing("Mach") and "V" in values:
+        values["Mach"] = replace_computed(values.get("Mach"), values["V"] / values["a"])
+    return values
+
+
+def recompute_dependents(cruise_conditions, changed):
+    '''
+    Mark the conditions derived from the changed altitude or airspeed with -1111 (unless they are changed too),
+    so that they are recomputed for the new values instead of keeping the nominal ones
+    :param changed: names of the changed cruise conditions (swept or sampled ones)
+    :return: new dict of cruise conditions
+    '''
+    values = dict(cruise_conditions)
+    for name in changed:
+        for dependent in DEPENDENT_CONDITIONS.get(name, ()):
+            if dependent not in changed:
+                values[dependent] = COMPUTED
+    return values
+
+
+def longitudinal_factors(q_mean, m, V, Iyy, wing_area, wing_mean_chord=None):
+    '''
+    Dynamic pressure factors shared by the longitudinal derivatives (scalars or numpy columns)
+    The operations are in the same order as in the original calculate_* formulas so the results are identical
+    :param wing_mean_chord: None to get only qS_mV
+    '''
+    S = wing_area
+    c = wing_mean_chord
+    factors = {"qS_mV": (q_mean * S) / (m * V)}  # Xu, Xw, Zu, Zw, X/Z_delta_e, X/Z_delta_T
+    if c is not None:
+        factors["qSc_2mV2"] = (q_mean * S * c) / (2 * m * np.power(V, 2))  # Zw_dot, Zq
+        factors["qSc_IyyV"] = (q_mean * S * c) / (Iyy * V)  # Mu, Mw, M_delta_e, M_delta_T
+        factors["qSc2_2IyyV2"] = (q_mean * S * np.power(c, 2)) / (2 * Iyy * np.power(V, 2))  # Mw_dot
+        factors["qSc2_2IyyV"] = (q_mean * S * np.power(c, 2)) / (2 * Iyy * V)  # Mq
+    return factors
+
+
+def lateral_factors(q_mean, m, V, Ixx, Izz, wing_area, wing_span=None):
+    '''
+    Dynamic pressure factors shared by the lateral derivatives (scalars or numpy columns)
+    The operations are in the same order as in the original calculate_* formulas so the results are identical
+    :param wing_span: None to get only qS_mV
+    '''
+    S = wing_area
+    b = wing_span
+    factors = {"qS_mV": (q_mean * S) / (m * V)}  # Yv, Y_delta_r, Y_delta_a
+    if b is not None:
+        factors["qSb_2mV"] = (q_mean * S * b) / (2 * m * V)  # Yp, Yr
+        factors["qSb_IxxV"] = (q_mean * S * b) / (Ixx * V)  # Lv, L_delta_r, L_delta_a
+        factors["qSb2_2IxxV"] = (q_mean * S * b ** 2) / (2 * Ixx * V)  # Lp, Lr
+        factors["qSb_IzzV"] = (q_mean * S * b) / (Izz * V)  # Nv, N_delta_r, N_delta_a
+        factors["qSb2_2IzzV"] = (q_mean * S * b ** 2) / (2 * Izz * V)  # Np, Nr
+    return factors
+
+
+class FlightCondition:
+    '''
+    This class holds one cruise condition as plain float attributes
+    It is built once from flightConditions.json, validated, and caches the dynamic pressure factors per geometry
+    '''
+
+    __slots__ = CRUISE_CONDITIONS + ("dynamic_pressure", "_factors")
+
+    def __init__(self, axes=("longitudinal", "lateral"), **values):
+        '''
+        :param axes: axes the condition is used for, only the values their matrix builders read are required
+        :param values: cruise conditions by name (see CRUISE_CONDITIONS), -1111 for a value to compute
+        '''
+        values = fill_atmosphere(values)
+        required = [name for axis in axes for name in REQUIRED_CRUISE_CONDITIONS[axis]]
+        missing = [name for name in dict.fromkeys(required) if name not in values]
+        if missing:
+            raise ValueError(f"Missing cruise conditions: {', '.join(missing)}")
+
+        for name in CRUISE_CONDITIONS:
+            value = values.get(name)
+            if value is not None:
+                value = float(value)
+                if not math.isfinite(value):
+                    raise ValueError(f"Cruise condition {name} is not a finite number")
+            setattr(self, name, value)
+
+        if self.rho == COMPUTED:
+            raise ValueError("Cruise condition rho has to be given, or computed from the altitude h")
+
+        positive = [name for axis in axes for name in POSITIVE_CRUISE_CONDITIONS[axis]]
+        not_positive = [name for name in dict.fromkeys(positive) if not getattr(self, name) > 0]
+        if not_positive:
+            raise ValueError(f"Cruise conditions must be positive: {', '.join(not_positive)}")
+
+        self.dynamic_pressure = dynamic_pressure(self.q_mean, self.rho, self.V)
+        self._factors = {}
+
+    @classmethod
+    def from_json(cls, data, axes=("longitudinal", "lateral")):
+        return cls(axes, **{name: value for name, value in json_values(data).items() if name in CRUISE_CONDITIONS})
+
+    def longitudinal_factors(self, wing_area, wing_mean_chord=None):
+        key = ("longitudinal", wing_area, wing_mean_chord)
+        if key not in self._factors:
+            self._factors[key] = longitudinal_factors(self.dynamic_pressure, self.m, self.V, self.Iyy, wing_area,
+                                                      wing_mean_chord)
+        return self._factors[key]
+
+    def lateral_factors(self, wing_area, wing_span=None):
+        key = ("lateral", wing_area, wing_span)
+        if key not in self._factors:
+            self._factors[key] = lateral_factors(self.dynamic_pressure, self.m, self.V, self.Ixx, self.Izz, wing_area,
+                                                 wing_span)
+        return self._factors[key]
+
+
+class StabilityDerivatives:
+    '''
+    This class holds the non-dimensional stability derivatives of one axis as floats
+    '''
+
+    __slots__ = ("axis", "values")
+
+    def __init__(self, axis, values):
+        '''
+        :param axis: "longitudinal" or "lateral"
+        :param values: dict name -> value, every derivative the matrix builders read has to be given
+        '''
+        missing = [name for name in REQUIRED_STABILITY_DERIVATIVES[axis] if name not in values]
+        if missing:
+            raise ValueError(f"Missing {axis} stability derivatives: {', '.join(missing)}")
+
+        self.axis = axis
+        self.values = {name: float(value) for name, value in values.items()}
+
+        not_finite = [name for name, value in self.values.items() if not math.isfinite(value)]
+        if not_finite:
+            raise ValueError(f"Stability derivatives are not finite numbers: {', '.join(not_finite)}")
+
+    @classmethod
+    def from_json(cls, axis, data):
+        return cls(axis, json_values(data))
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def __contains__(self, name):
+        return name in self.values
@@ -1,23 +1,56 @@
 import json
 import os
 
+from data.flight_condition import FlightCondition, StabilityDerivatives
+
+
+def read_flight_data(axis="longitudinal", user_file=None):
+    '''
+    Parse and validate the flight data of one axis, Airplane does it once and passes the result to its parents
+    :param user_file: [stability derivatives, flight conditions] as json strings or parsed dicts, the bundled files
+    when None, a combined analysis passes the FlightCondition it built once for both axes as a third item
+    :return: dict with the parsed json files (stability_der, cruise_conditions) and their typed and validated values
+    (flight_condition, stability)
+    '''
+    if user_file is None:
+        if axis == "longitudinal":
+            user_file = [os.path.abspath('calculation/flights/longitudinal/longitudinalSD.json'), os.path.abspath('calculation/flights/longitudinal/flightConditions.json')]
+        elif axis == "lateral":
+            user_file = [os.path.abspath('calculation/flights/lateral/lateralSD.json'), os.path.abspath('calculation/flights/lateral/flightConditions.json')]
+        stability_der = json.load(open(user_file[0], 'r'))
+        cruise_conditions = json.load(open(user_file[1], 'r'))
+
+    else:
+        # the files are given as json strings or as already parsed dicts
+        stability_der = user_file[0] if isinstance(user_file[0], dict) else json.loads(user_file[0])
+        cruise_conditions = user_file[1] if isinstance(user_file[1], dict) else json.loads(user_file[1])
+
+    if len(user_file) > 2:
+        flight_condition = user_file[2]
+    else:
+        # only the cruise conditions read by the matrices of this axis are required
+        flight_condition = FlightCondition.from_json(cruise_conditions, (axis,))
+
+    return {
+        "stability_der": stability_der,
+        "cruise_conditions": cruise_conditions,
+        "flight_condition": flight_condition,
+        "stability": StabilityDerivatives.from_json(axis, stability_der),
+    }
+
 
 class FlightData:
     '''
-    This class loads the flight data
+    This class holds the flight data
     '''
 
-    def __init__(self, axis="longitudinal", user_file=None):
-        # print(axis)
-        if user_file is None:
-            # print("No user file provided, using default files")
-            if axis == "longitudinal":
-                user_file = [os.path.abspath('calculation/flights/longitudinal/longitudinalSD.json'), os.path.abspath('calculation/flights/longitudinal/flightConditions.json')]
-            elif axis == "lateral":
-                user_file = [os.path.abspath('calculation/flights/lateral/lateralSD.json'), os.path.abspath('calculation/flights/lateral/flightConditions.json')]
-            self.stability_der = json.load(open(user_file[0], 'r'))
-            self.cruise_conditions = json.load(open(user_file[1], 'r'))
-
-        else:
-            self.stability_der = json.loads(user_file[0])
-            self.cruise_conditions = json.loads(user_file[1])
+    def __init__(self, flight_data):
+        '''
+        :param flight_data: parsed and validated flight data, see read_flight_data
+        '''
+        self.stability_der = flight_data["stability_der"]
+        self.cruise_conditions = flight_data["cruise_conditions"]
+        # typed and validated values used by the calculate_* methods
+        self.flight_condition = flight_data["flight_condition"]
+        self.stability = flight_data["stability"]
+        self.q_mean = self.flight_condition.dynamic_pressure
@@ -1,14 +1,16 @@
 import numpy as np
-import sympy
+from analysis.modal_analysis import classify_modes, mode_indices
+from analysis.sensitivity import eigenvalue_sensitivity, sensitivity_parameters
+from analysis.transfer_functions import transfer_functions, format_transfer_function
 from data.flight_data import FlightData
-from control import tf
+from lateral.lat_batch_matrix import lat_batch_matrices
 
 class LatAircraftMatrix(FlightData):
     '''
     This class calculates the aircraft matrix
     '''
 
-    def __init__(self, user_file=None):
+    def __init__(self, flight_data):
         '''
         :param cruise_condition: json file with the cruise condition
         :param stability_der: json file with the longitudinal stability derivatives
@@ -17,13 +19,16 @@ class LatAircraftMatrix(FlightData):
         :param M: rolling moment derivative vector (Mu, Mw, Mw_dot, Mq)
         '''
 
-        FlightData.__init__(self, "lateral", user_file)
+        FlightData.__init__(self, flight_data)
 
         self.tf = {}
+        self.tf_numeric = None
         self.damping_ratio = None
         self.natural_frequency = None
+        self.modes = None
         self.characteristic_equation = None
         self.eigenvectors = None
+        self.sensitivity = None
         self.eigenvalues = None
         self.aircraft_matrix = None
         self.Yv = 0
@@ -38,64 +43,49 @@ class LatAircraftMatrix(FlightData):
         self.Np = 0
         self.Nr = 0
 
-        if self.cruise_conditions["q_mean"]["value"] == -1111:
-            self.q_mean = (self.cruise_conditions["rho"]["value"] *
-                           self.cruise_conditions["V"]["value"] ** 2) / 2
-        else:
-            self.q_mean = self.cruise_conditions["q_mean"]["value"]
-
     def calculate_Yv(self, wing_area):
-        first_part = (self.q_mean * wing_area) / (
-                self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (self.stability_der["C_Y_beta"]["value"])
+        first_part = self.flight_condition.lateral_factors(wing_area)["qS_mV"]
+        second_part = self.stability["C_Y_beta"]
         self.Yv = first_part * second_part
 
     def calculate_Yp(self, wing_area, wing_span):
-        first_part = (self.q_mean * wing_area * wing_span) / (
-                2 * self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (self.stability_der["C_Y_p"]["value"])
+        first_part = self.flight_condition.lateral_factors(wing_area, wing_span)["qSb_2mV"]
+        second_part = self.stability["C_Y_p"]
         self.Yp = first_part * second_part
 
     def calculate_Yr(self, wing_area, wing_span):
-        first_part = (self.q_mean * wing_area * wing_span) / (
-                2 * self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (self.stability_der["C_Y_r"]["value"])
+        first_part = self.flight_condition.lateral_factors(wing_area, wing_span)["qSb_2mV"]
+        second_part = self.stability["C_Y_r"]
         self.Yr = first_part * second_part
 
     def calculate_Lv(self, wing_area, wing_span):
-        first_part = (self.q_mean * wing_area * wing_span) / (
-                self.cruise_conditions["Ixx"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (self.stability_der["C_L_beta"]["value"])
+        first_part = self.flight_condition.lateral_factors(wing_area, wing_span)["qSb_IxxV"]
+        second_part = self.stability["C_L_beta"]
         self.Lv = first_part * second_part
 
     def calculate_Lp(self, wing_area, wing_span):
-        first_part = (self.q_mean * wing_area * wing_span**2) / (
-                2 * self.cruise_conditions["Ixx"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (self.stability_der["C_L_p"]["value"])
+        first_part = self.flight_condition.lateral_factors(wing_area, wing_span)["qSb2_2IxxV"]
+        second_part = self.stability["C_L_p"]
         self.Lp = first_part * second_part
 
     def calculate_Lr(self, wing_area, wing_span):
-        first_part = (self.q_mean * wing_area * wing_span**2) / (
-                2 * self.cruise_conditions["Ixx"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (self.stability_der["C_L_r"]["value"])
+        first_part = self.flight_condition.lateral_factors(wing_area, wing_span)["qSb2_2IxxV"]
+        second_part = self.stability["C_L_r"]
         self.Lr = first_part * second_part
 
     def calculate_Nv(self, wing_area, wing_span):
-        first_part = (self.q_mean * wing_area * wing_span) / (
-                    self.cruise_conditions["Izz"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (self.stability_der["C_N_beta"]["value"])
+        first_part = self.flight_condition.lateral_factors(wing_area, wing_span)["qSb_IzzV"]
+        second_part = self.stability["C_N_beta"]
         self.Nv = first_part * second_part
 
     def calculate_Np(self, wing_area, wing_span):
-        first_part = (self.q_mean * wing_area * wing_span**2) / (
-                2 * self.cruise_conditions["Izz"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (self.stability_der["C_N_p"]["value"])
+        first_part = self.flight_condition.lateral_factors(wing_area, wing_span)["qSb2_2IzzV"]
+        second_part = self.stability["C_N_p"]
         self.Np = first_part * second_part
 
     def calculate_Nr(self, wing_area, wing_span):
-        first_part = (self.q_mean * wing_area * wing_span**2) / (
-                2 * self.cruise_conditions["Izz"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (self.stability_der["C_N_r"]["value"])
+        first_part = self.flight_condition.lateral_factors(wing_area, wing_span)["qSb2_2IzzV"]
+        second_part = self.stability["C_N_r"]
         self.Nr = first_part * second_part
 
 
@@ -109,7 +99,7 @@ class LatAircraftMatrix(FlightData):
         '''
         self.aircraft_matrix = np.array(
             [
-                [self.Yv, self.Yp, -(self.cruise_conditions["V"]["value"] - self.Yr),self.cruise_conditions["g"]["value"]*np.cos((np.pi * self.cruise_conditions["theta"]["value"] / 180))],
+                [self.Yv, self.Yp, -(self.flight_condition.V - self.Yr),self.flight_condition.g*np.cos((np.pi * self.flight_condition.theta / 180))],
                 [self.Lv, self.Lp, self.Lr, 0],
                 [self.Nv, self.Np, self.Nr, 0],
                 [0, 1, 0, 0]
@@ -120,86 +110,67 @@ class LatAircraftMatrix(FlightData):
         self.aircraft_matrix[self.aircraft_matrix == -0.0] = 0.0
         
     def set_lateral_eigenvalues(self):
-        self.eigenvalues = np.linalg.eigvals(self.aircraft_matrix)
+        # one decomposition gives both the eigenvalues and the eigenvectors
+        self.eigenvalues, self.eigenvectors = np.linalg.eig(self.aircraft_matrix)
+        # index of the eigenvalue of every mode, from the eigenvector content (not the order returned by eig)
+        labels, _ = classify_modes(self.eigenvalues, "lateral", self.eigenvectors)
+        self.modes = {mode: int(index)
+                      for mode, index in mode_indices(self.eigenvalues, labels, "lateral").items()}
         
     def set_lateral_eigenvectors(self):
-        self.eigenvectors = np.linalg.eig(self.aircraft_matrix)[1]
+        if self.eigenvectors is None:
+            self.set_lateral_eigenvalues()
         
     def set_lateral_characteristic_equation(self):
         self.characteristic_equation = np.polynomial.polynomial.polyfromroots(self.eigenvalues)
 
-    def set_natural_frequency(self):
-        # find natural frequency from eigenvalues there should be 2 frequency one for short period mode and one for phugoid
-        # mode
-        real_parts = np.real(self.eigenvalues)
-        imag_parts = np.imag(self.eigenvalues)
-
-        # Sort eigenvalues in ascending order of real parts
-        idx = real_parts.argsort()
-        real_parts = real_parts[idx]
-        imag_parts = imag_parts[idx]
-
-        # Calculate natural frequencies
-        omega_sp = np.sqrt(real_parts[0] ** 2 + imag_parts[0] ** 2)
-        omega_p = np.sqrt(real_parts[-1] ** 2 + imag_parts[-1] ** 2)
-
-        self.natural_frequency = np.array([omega_sp, omega_p])
-
-    def set_damping_ratio(self):
-        damping_ratio_sp = -np.real(self.eigenvalues[0]) / np.abs(self.eigenvalues[0])
-        damping_ratio_p = -np.real(self.eigenvalues[-1]) / np.abs(self.eigenvalues[-1])
-        self.damping_ratio = np.array([damping_ratio_sp, damping_ratio_p])
-
-    def set_lateral_transfer_functions(self):
-
-        s = sympy.symbols('s')
-
-        # (sI-A)^-1 * B
-        tfs = (s * sympy.eye(4) - self.aircraft_matrix).inv() * self.control_matrix
-
-        # Display transfer functions nicely.
-        tfs_simplified = sympy.Matrix(tfs).applyfunc(lambda x: sympy.simplify(x))
-
-        # Set display settings for powers
-        sympy.init_printing(use_unicode=True, pretty_print=True)
-
-        # separete aileron and rudder transfer functions (aileron is pair 0/2/4/6 and rudder is pair 1/3/5/7)
-        aileron_tfs = tfs_simplified[1::2]
-        rudder_tfs = tfs_simplified[::2]
-
-        rudder_formatted = []
-        aileron_formatted = []
-
-        for tf in rudder_tfs:
-            num, den = sympy.fraction(tf)
-            num = str(num).replace('**', '^')
-            den = str(den).replace('**', '^')
-            if num == '0':
-                tf_formatted = '0'
-            else:
-                tf_formatted = f"{num}\n" \
-                               f"{'-' * len(str(den))}\n" \
-                               f"{den}"
-            rudder_formatted.append(tf_formatted)
-
-        for tf in aileron_tfs:
-            num, den = sympy.fraction(tf)
-            # replace '**' with '^'
-            num = str(num).replace('**', '^')
-            den = str(den).replace('**', '^')
-            if num == '0':
-                tf_formatted = '0'
-            else:
-                tf_formatted = f"{num}\n" \
-                               f"{'-' * len(str(den))}\n" \
-                               f"{den}"
-            aileron_formatted.append(tf_formatted)
-
-        self.tf["rudder"] = rudder_formatted
-        self.tf["aileron"] = aileron_formatted
+    def set_lateral_natural_frequency(self):
+        # natural frequency of the rolling, spiral and Dutch roll modes
+        roots = self.eigenvalues[[self.modes["Rolling"], self.modes["Spiral"], self.modes["Dutch Roll"]]]
+        self.natural_frequency = np.abs(roots)
+
+    def set_lateral_damping_ratio(self):
+        roots = self.eigenvalues[[self.modes["Rolling"], self.modes["Spiral"], self.modes["Dutch Roll"]]]
+        self.damping_ratio = -np.real(roots) / np.abs(roots)
+
+    def set_lateral_transfer_functions(self, render=True):
+        '''
+        Numeric transfer functions (sI-A)^-1 * B for every state/control pair
+        :param render: also format them as text (rudder and aileron lists of strings)
+        :return: dict of formatted transfer functions, or the numeric ones when render is False
+        '''
+        self.tf_numeric = transfer_functions(self.aircraft_matrix, self.control_matrix)
+
+        if not render:
+            return self.tf_numeric
+
+        numerator = self.tf_numeric["numerator"]
+        denominator = self.tf_numeric["denominator"]
+
+        # rudder is the first column of the control matrix and aileron the second one
+        self.tf["rudder"] = [format_transfer_function(numerator[i, 0], denominator) for i in range(4)]
+        self.tf["aileron"] = [format_transfer_function(numerator[i, 1], denominator) for i in range(4)]
 
         return self.tf
 
+    def calculate_lateral_eigenvalue_sensitivity(self, wing_area, wing_span):
+        '''
+        Derivative of every eigenvalue (and its damping ratio/natural frequency) with respect to every
+        stability derivative and cruise condition, from the left/right eigenvectors in one pass
+        :return: dict mode (Rolling, Spiral, Dutch Roll) -> rows ranked by |p * dl/dp|
+        '''
+        cruise_conditions, stability_der = sensitivity_parameters(self.cruise_conditions, self.stability_der)
+
+        def build_matrix(cruise, der):
+            return lat_batch_matrices(cruise, der, wing_area, wing_span)[1]
+
+        self.sensitivity = eigenvalue_sensitivity(self.aircraft_matrix, build_matrix, cruise_conditions,
+                                                  stability_der, "lateral")
+        return self.sensitivity
+
+    def get_lateral_transfer_functions(self):
+        return self.tf_numeric
+
     def get_lat_aircraft_matrix(self):
         return self.aircraft_matrix
 
@@ -212,6 +183,12 @@ class LatAircraftMatrix(FlightData):
     def get_lateral_characteristic_equation(self):
         return self.characteristic_equation
 
+    def get_lateral_natural_frequency(self):
+        return self.natural_frequency
+
+    def get_lateral_damping_ratio(self):
+        return self.damping_ratio
+
     def get_param(self, name):
 
         if hasattr(self, name):
@@ -0,0 +1,113 @@
+import numpy as np
+from data.batch_flight_data import BatchFlightData
+from data.flight_condition import lateral_factors
+
+LAT_DERIVATIVES = ["Yv", "Yp", "Yr", "Lv", "Lp", "Lr", "Nv", "Np", "Nr"]
+LAT_CONTROL_DERIVATIVES = ["Y_delta_r", "L_delta_r", "N_delta_r", "Y_delta_a", "L_delta_a", "N_delta_a"]
+
+
+class LatBatchMatrix(BatchFlightData):
+    '''
+    This class calculates the lateral aircraft and control matrices for many flight conditions at once
+    It uses the same formulas as LatAircraftMatrix and LatControlMatrix on numpy columns
+    '''
+
+    def __init__(self, cruise_conditions, stability_der):
+        BatchFlightData.__init__(self, cruise_conditions, stability_der)
+
+        self.derivatives = {}
+        self.aircraft_matrix = None
+        self.control_matrix = None
+
+    def calculate_derivatives(self, wing_area, wing_span):
+        '''
+        :return: dict name -> array of the dimensional derivatives (Yv ... Nr, Y_delta_r ... N_delta_a)
+        '''
+        der = self.stability_der
+        factors = lateral_factors(self.q_mean, self.cruise_conditions["m"], self.cruise_conditions["V"],
+                                  self.cruise_conditions["Ixx"], self.cruise_conditions["Izz"], wing_area, wing_span)
+
+        # ----------------- aircraft matrix derivatives ----------------- #
+        self.derivatives["Yv"] = factors["qS_mV"] * der["C_Y_beta"]
+        self.derivatives["Yp"] = factors["qSb_2mV"] * der["C_Y_p"]
+        self.derivatives["Yr"] = factors["qSb_2mV"] * der["C_Y_r"]
+
+        self.derivatives["Lv"] = factors["qSb_IxxV"] * der["C_L_beta"]
+        self.derivatives["Lp"] = factors["qSb2_2IxxV"] * der["C_L_p"]
+        self.derivatives["Lr"] = factors["qSb2_2IxxV"] * der["C_L_r"]
+
+        self.derivatives["Nv"] = factors["qSb_IzzV"] * der["C_N_beta"]
+        self.derivatives["Np"] = factors["qSb2_2IzzV"] * der["C_N_p"]
+        self.derivatives["Nr"] = factors["qSb2_2IzzV"] * der["C_N_r"]
+
+        # ----------------- control matrix derivatives ----------------- #
+        self.derivatives["Y_delta_r"] = factors["qS_mV"] * der["C_Y_delta_r"]
+        self.derivatives["L_delta_r"] = factors["qSb_IxxV"] * der["C_L_delta_r"]
+        self.derivatives["N_delta_r"] = factors["qSb_IzzV"] * der["C_N_delta_r"]
+        self.derivatives["Y_delta_a"] = factors["qS_mV"] * der["C_Y_delta_a"]
+        self.derivatives["L_delta_a"] = factors["qSb_IxxV"] * der["C_L_delta_a"]
+        self.derivatives["N_delta_a"] = factors["qSb_IzzV"] * der["C_N_delta_a"]
+
+        return self.derivatives
+
+    def set_lat_stability_aircraft_matrix(self):
+        '''
+        :return: (N, 4, 4) array of aircraft matrices, rows/columns: v, p, r, phi
+        '''
+        d = self.derivatives
+        V = self.cruise_conditions["V"]
+        g = self.cruise_conditions["g"]
+        theta = self.cruise_conditions["theta"]
+
+        matrix = np.zeros((self.size, 4, 4), dtype=np.result_type(d["Yv"], V, g, theta))
+        matrix[:, 0, 0] = d["Yv"]
+        matrix[:, 0, 1] = d["Yp"]
+        matrix[:, 0, 2] = -(V - d["Yr"])
+        matrix[:, 0, 3] = g * np.cos((np.pi * theta / 180))
+        matrix[:, 1, 0] = d["Lv"]
+        matrix[:, 1, 1] = d["Lp"]
+        matrix[:, 1, 2] = d["Lr"]
+        matrix[:, 2, 0] = d["Nv"]
+        matrix[:, 2, 1] = d["Np"]
+        matrix[:, 2, 2] = d["Nr"]
+        matrix[:, 3, 1] = 1
+
+        matrix[matrix == -0.0] = 0.0
+        self.aircraft_matrix = matrix
+        return self.aircraft_matrix
+
+    def set_lat_stability_control_matrix(self):
+        '''
+        :return: (N, 4, 2) array of control matrices, columns: rudder, aileron
+        '''
+        d = self.derivatives
+
+        matrix = np.zeros((self.size, 4, 2), dtype=np.result_type(d["Y_delta_r"]))
+        matrix[:, 0, 0] = d["Y_delta_r"]
+        matrix[:, 0, 1] = d["Y_delta_a"]
+        matrix[:, 1, 0] = d["L_delta_r"]
+        matrix[:, 1, 1] = d["L_delta_a"]
+        matrix[:, 2, 0] = d["N_delta_r"]
+        matrix[:, 2, 1] = d["N_delta_a"]
+
+        self.control_matrix = matrix
+        return self.control_matrix
+
+    def get_lat_aircraft_matrices(self):
+        return self.aircraft_matrix
+
+    def get_lat_control_matrices(self):
+        return self.control_matrix
+
+    def get_derivatives(self):
+        return self.derivatives
+
+
+def lat_batch_matrices(cruise_conditions, stability_der, wing_area, wing_span):
+    '''
+    One vectorized pass: columns in, derivatives and stacked matrices out
+    :return: (derivatives, (N, 4, 4) aircraft matrices, (N, 4, 2) control matrices)
+    '''
+    batch = LatBatchMatrix(cruise_conditions, stability_der)
+    batch.calculate_derivatives(wing_area, wing_span)
+    return batch.derivatives, batch.set_lat_stability_aircraft_matrix(), batch.set_lat_stability_control_matrix()
@@ -1,9 +1,12 @@
 import sys
-import sympy
 
 sys.path.append("data/")
 import numpy as np
+from analysis.modal_analysis import classify_modes, mode_indices
+from analysis.sensitivity import eigenvalue_sensitivity, sensitivity_parameters
+from analysis.transfer_functions import transfer_functions, format_transfer_function
 from data.flight_data import FlightData
+from longitudinal.lon_batch_matrix import long_batch_matrices
 
 
 class LongAircraftMatrix(FlightData):
@@ -11,7 +14,7 @@ class LongAircraftMatrix(FlightData):
     This class calculates the aircraft matrix
     '''
 
-    def __init__(self, user_file=None):
+    def __init__(self, flight_data):
         '''
         :param cruise_condition: json file with the cruise condition
         :param stability_der: json file with the longitudinal stability derivatives
@@ -20,15 +23,18 @@ class LongAircraftMatrix(FlightData):
         :param M: rolling moment derivative vector (Mu, Mw, Mw_dot, Mq)
         '''
 
-        FlightData.__init__(self, "longitudinal", user_file=user_file)
+        FlightData.__init__(self, flight_data)
 
         self.tf = {}
+        self.tf_numeric = None
         self.aircraft_matrix = None
         self.damping_ratio = None
         self.natural_frequency = None
+        self.modes = None
         self.eigenvectors = None
         self.eigenvalues = None
         self.characteristic_equation = None
+        self.sensitivity = None
 
         self.Xu = 0
         self.Xw = 0
@@ -42,91 +48,71 @@ class LongAircraftMatrix(FlightData):
         self.Mq = 0
         self.Mw = 0
         self.Mw_dot = 0
-        
-        # check if q_mean is -1 (not defined) and calculate it
-        if self.cruise_conditions["q_mean"]["value"] == -1111:
-            self.q_mean = (self.cruise_conditions["rho"]["value"] * 
-                                                         self.cruise_conditions["V"]["value"]**2) / 2
-        else:
-            self.q_mean = self.cruise_conditions["q_mean"]["value"]
 
     def calculate_Xu(self, S):
-        first_part = (self.q_mean * S) / (
-                self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (2 * self.cruise_conditions["C_D_0"]["value"] + self.stability_der["C_D_u"]["value"])
+        first_part = self.flight_condition.longitudinal_factors(S)["qS_mV"]
+        second_part = (2 * self.flight_condition.C_D_0 + self.stability["C_D_u"])
         self.Xu = -first_part * second_part
 
     def calculate_Xw(self, aspect_ratio, oswald, S):
-        first_part = (self.q_mean * S) / (
-                self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (self.cruise_conditions["C_L_0"]["value"] * (
-                1 - (2 / (np.pi * aspect_ratio * oswald)) * self.stability_der["C_L_alpha"]["value"]))
+        first_part = self.flight_condition.longitudinal_factors(S)["qS_mV"]
+        second_part = (self.flight_condition.C_L_0 * (
+                1 - (2 / (np.pi * aspect_ratio * oswald)) * self.stability["C_L_alpha"]))
         self.Xw = first_part * second_part
 
     def calculate_Zu(self, S):
-        first_part = (self.q_mean * S) / (
-                self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (2 * self.cruise_conditions["C_L_0"]["value"] + self.stability_der["C_L_u"]["value"])
+        first_part = self.flight_condition.longitudinal_factors(S)["qS_mV"]
+        second_part = (2 * self.flight_condition.C_L_0 + self.stability["C_L_u"])
         self.Zu = -first_part * second_part
 
     def calculate_Zw(self, S):
-        first_part = (self.q_mean * S) / (
-                self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = (self.cruise_conditions["C_D_0"]["value"] + self.stability_der["C_L_alpha"]["value"])
+        first_part = self.flight_condition.longitudinal_factors(S)["qS_mV"]
+        second_part = (self.flight_condition.C_D_0 + self.stability["C_L_alpha"])
         self.Zw = - first_part * second_part
 
     def calculate_Zw_dot(self, wing_mean_chord, S):
-        first_part = (self.q_mean * S * wing_mean_chord) / \
-                     (2 * self.cruise_conditions["m"]["value"] * np.power(self.cruise_conditions["V"]["value"], 2))
-        second_part = (self.cruise_conditions["C_D_0"]["value"] * self.stability_der["C_L_alpha_dot"]["value"])
+        first_part = self.flight_condition.longitudinal_factors(S, wing_mean_chord)["qSc_2mV2"]
+        second_part = (self.flight_condition.C_D_0 * self.stability["C_L_alpha_dot"])
         self.Zw_dot = first_part * second_part
 
     def calculate_Zq(self, wing_mean_chord, S):
-        first_part = (self.q_mean * S * wing_mean_chord) / \
-                     (2 * self.cruise_conditions["m"]["value"] * np.power(self.cruise_conditions["V"]["value"], 2))
-        second_part = self.stability_der["C_L_q"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(S, wing_mean_chord)["qSc_2mV2"]
+        second_part = self.stability["C_L_q"]
         self.Zq = first_part * second_part
 
     def calculate_Mu(self, wing_mean_chord, S):
-        first_part = (self.q_mean * S * wing_mean_chord) / \
-                     (self.cruise_conditions["Iyy"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_m_u"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(S, wing_mean_chord)["qSc_IyyV"]
+        second_part = self.stability["C_m_u"]
         self.Mu = first_part * second_part
 
     def calculate_Mw(self, wing_mean_chord, S):
-        first_part = (self.q_mean * S * wing_mean_chord) / \
-                     (self.cruise_conditions["Iyy"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_m_alpha"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(S, wing_mean_chord)["qSc_IyyV"]
+        second_part = self.stability["C_m_alpha"]
         self.Mw = first_part * second_part
 
     def calculate_Mw_dot(self, wing_mean_chord, S):
-        first_part = (self.q_mean * S * np.power(wing_mean_chord, 2)) / \
-                     (2 * self.cruise_conditions["Iyy"]["value"] * np.power(self.cruise_conditions["V"]["value"], 2))
-        second_part = self.stability_der["C_m_alpha_dot"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(S, wing_mean_chord)["qSc2_2IyyV2"]
+        second_part = self.stability["C_m_alpha_dot"]
         self.Mw_dot = first_part * second_part
 
     def calculate_Mq(self, wing_mean_chord, S):
-        first_part = (self.q_mean * S * np.power(wing_mean_chord, 2)) / \
-                     (2 * self.cruise_conditions["Iyy"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_m_q"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(S, wing_mean_chord)["qSc2_2IyyV"]
+        second_part = self.stability["C_m_q"]
         self.Mq = first_part * second_part
 
     def calculate_X_delta_e(self, S):
-        first_part = (self.q_mean * S) / \
-                     (self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_D_d_E"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(S)["qS_mV"]
+        second_part = self.stability["C_D_d_E"]
         self.X_gamma_e = first_part * second_part
 
     def calculate_Z_delta_e(self, S):
-        first_part = (self.q_mean * S) / \
-                     (self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_L_d_E"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(S)["qS_mV"]
+        second_part = self.stability["C_L_d_E"]
         self.Z_gamma_e = first_part * second_part
 
     def calculate_M_delta_e(self, wing_mean_chord, S):
-        first_part = (self.q_mean * S * wing_mean_chord) / \
-                     (self.cruise_conditions["Iyy"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_m_d_E"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(S, wing_mean_chord)["qSc_IyyV"]
+        second_part = self.stability["C_m_d_E"]
         self.M_gamma_e = first_part * second_part
 
     def set_long_stability_aircraft_matrix(self):
@@ -139,11 +125,11 @@ class LongAircraftMatrix(FlightData):
         self.aircraft_matrix = np.array(
             [
                 [self.Xu, self.Xw, 0,
-                 -self.cruise_conditions["g"]["value"] * np.cos((np.pi * self.cruise_conditions["theta"]["value"] / 180))],
-                [self.Zu, self.Zw, self.cruise_conditions["V"]["value"],
-                 -self.cruise_conditions["g"]["value"] * np.sin((np.pi * self.cruise_conditions["theta"]["value"] / 180))],
+                 -self.flight_condition.g * np.cos((np.pi * self.flight_condition.theta / 180))],
+                [self.Zu, self.Zw, self.flight_condition.V,
+                 -self.flight_condition.g * np.sin((np.pi * self.flight_condition.theta / 180))],
                 [self.Mu + self.Zu * self.Mw_dot, self.Mw + self.Zw * self.Mw_dot,
-                 self.Mq + self.cruise_conditions["V"]["value"] * self.Mw_dot, 0],
+                 self.Mq + self.flight_condition.V * self.Mw_dot, 0],
                 [0, 0, 1, 0]
             ])
 
@@ -152,93 +138,66 @@ class LongAircraftMatrix(FlightData):
         self.aircraft_matrix[self.aircraft_matrix == -0.0] = 0.0
 
     def set_eigenvalues(self):
-        self.eigenvalues = np.linalg.eigvals(self.aircraft_matrix)
+        # one decomposition gives both the eigenvalues and the eigenvectors
+        self.eigenvalues, self.eigenvectors = np.linalg.eig(self.aircraft_matrix)
+        # index of the eigenvalue of every mode, from the eigenvector content (not the order returned by eig)
+        labels, _ = classify_modes(self.eigenvalues, "longitudinal", self.eigenvectors)
+        self.modes = {mode: int(index)
+                      for mode, index in mode_indices(self.eigenvalues, labels, "longitudinal").items()}
 
     def set_eigenvectors(self):
-        self.eigenvectors = np.linalg.eig(self.aircraft_matrix)[1]
+        if self.eigenvectors is None:
+            self.set_eigenvalues()
 
     def set_characteristic_equation(self):
         self.characteristic_equation = np.polynomial.polynomial.polyfromroots(self.eigenvalues)
 
     def set_natural_frequency(self):
-        # find natural frequency from eigenvalues there should be 2 frequency one for short period mode and one for phugoid
-        # mode
-        real_parts = np.real(self.eigenvalues)
-        imag_parts = np.imag(self.eigenvalues)
-
-        # Sort eigenvalues in ascending order of real parts
-        idx = real_parts.argsort()
-        real_parts = real_parts[idx]
-        imag_parts = imag_parts[idx]
-
-        # Calculate natural frequencies
-        omega_sp = np.sqrt(real_parts[0] ** 2 + imag_parts[0] ** 2)
-        omega_p = np.sqrt(real_parts[-1] ** 2 + imag_parts[-1] ** 2)
-
-        self.natural_frequency = np.array([omega_sp, omega_p])
+        # natural frequency of the short period and of the phugoid mode
+        roots = self.eigenvalues[[self.modes["short_period"], self.modes["phugoid"]]]
+        self.natural_frequency = np.abs(roots)
 
     def set_damping_ratio(self):
-        damping_ratio_sp = -np.real(self.eigenvalues[0]) / np.abs(self.eigenvalues[0])
-        damping_ratio_p = -np.real(self.eigenvalues[-1]) / np.abs(self.eigenvalues[-1])
-        self.damping_ratio = np.array([damping_ratio_sp, damping_ratio_p])
-
-    def set_long_transfer_functions(self):
-
-        s = sympy.symbols('s')
-        # # (sI-A)^-1 * B
-        tfs = (s * sympy.eye(4) - self.aircraft_matrix).inv() @ self.control_matrix
-
-        # Display transfer functions nicely.
-        tfs_simplified = sympy.Matrix(tfs).applyfunc(lambda x: sympy.simplify(x))
-
-        # Set display settings for powers
-        sympy.init_printing(use_unicode=True, pretty_print=True)
-
-        # separete throttle and elevator transfer functions (elevator is pair 0/2/4/6 and throttle is pair 1/3/5/7)
-        throttle_tfs = tfs_simplified[1::2]
-        elevator_tfs = tfs_simplified[::2]
-
-
-        elevator_formatted = []
-        throttle_formatted = []
-
-        for tf in elevator_tfs:
-            num, den = sympy.fraction(tf)
-            num = str(num).replace('**', '^')
-            den = str(den).replace('**', '^')
-            if num == '0':
-                tf_formatted = '0'
-            else:
-                tf_formatted = f"{num}\n" \
-                               f"{'-' * len(str(den))}\n" \
-                                f"{den}"
-            elevator_formatted.append(tf_formatted)
-
-
-
-        for tf in throttle_tfs:
-            num, den = sympy.fraction(tf)
-            # replace '**' with '^'
-            num = str(num).replace('**', '^')
-            den = str(den).replace('**', '^')
-            if num == '0':
-                tf_formatted = '0'
-            else:
-                tf_formatted = f"{num}\n" \
-                                f"{'-' * len(str(den))}\n" \
-                                f"{den}"
-            throttle_formatted.append(tf_formatted)
+        roots = self.eigenvalues[[self.modes["short_period"], self.modes["phugoid"]]]
+        self.damping_ratio = -np.real(roots) / np.abs(roots)
 
+    def set_long_transfer_functions(self, render=True):
+        '''
+        Numeric transfer functions (sI-A)^-1 * B for every state/control pair
+        :param render: also format them as text (elevator and throttle lists of strings)
+        :return: dict of formatted transfer functions, or the numeric ones when render is False
+        '''
+        self.tf_numeric = transfer_functions(self.aircraft_matrix, self.control_matrix)
 
-        self.tf["elevator"] = elevator_formatted
-        self.tf["throttle"] = throttle_formatted
+        if not render:
+            return self.tf_numeric
 
+        numerator = self.tf_numeric["numerator"]
+        denominator = self.tf_numeric["denominator"]
 
+        # elevator is the first column of the control matrix and throttle the second one
+        self.tf["elevator"] = [format_transfer_function(numerator[i, 0], denominator) for i in range(4)]
+        self.tf["throttle"] = [format_transfer_function(numerator[i, 1], denominator) for i in range(4)]
 
         return self.tf
 
+    def calculate_long_eigenvalue_sensitivity(self, wing_area, aspect_ratio, oswald, wing_mean_chord):
+        '''
+        Derivative of every eigenvalue (and its damping ratio/natural frequency) with respect to every
+        stability derivative and cruise condition, from the left/right eigenvectors in one pass
+        :return: dict mode (phugoid, short_period) -> rows ranked by |p * dl/dp|
+        '''
+        cruise_conditions, stability_der = sensitivity_parameters(self.cruise_conditions, self.stability_der)
+
+        def build_matrix(cruise, der):
+            return long_batch_matrices(cruise, der, wing_area, aspect_ratio, oswald, wing_mean_chord)[1]
 
+        self.sensitivity = eigenvalue_sensitivity(self.aircraft_matrix, build_matrix, cruise_conditions,
+                                                  stability_der, "longitudinal")
+        return self.sensitivity
 
+    def get_long_transfer_functions(self):
+        return self.tf_numeric
 
     def get_long_aircraft_matrix(self):
         return self.aircraft_matrix
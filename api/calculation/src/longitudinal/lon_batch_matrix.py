@@ -0,0 +1,124 @@
+import numpy as np
+from data.batch_flight_data import BatchFlightData
+from data.flight_condition import longitudinal_factors
+
+LONG_DERIVATIVES = ["Xu", "Xw", "Zu", "Zw", "Zw_dot", "Zq", "Mu", "Mw", "Mw_dot", "Mq"]
+LONG_CONTROL_DERIVATIVES = ["X_delta_e", "Z_delta_e", "M_delta_e", "X_delta_T", "Z_delta_T", "M_delta_T"]
+
+
+class LongBatchMatrix(BatchFlightData):
+    '''
+    This class calculates the longitudinal aircraft and control matrices for many flight conditions at once
+    It uses the same formulas as LongAircraftMatrix and LongControlMatrix on numpy columns
+    '''
+
+    def __init__(self, cruise_conditions, stability_der):
+        BatchFlightData.__init__(self, cruise_conditions, stability_der)
+
+        self.derivatives = {}
+        self.aircraft_matrix = None
+        self.control_matrix = None
+
+    def calculate_derivatives(self, wing_area, aspect_ratio, oswald, wing_mean_chord):
+        '''
+        :return: dict name -> array of the dimensional derivatives (Xu ... Mq, X_delta_e ... M_delta_T)
+        '''
+        V = self.cruise_conditions["V"]
+        C_L_0 = self.cruise_conditions["C_L_0"]
+        C_D_0 = self.cruise_conditions["C_D_0"]
+        der = self.stability_der
+        factors = longitudinal_factors(self.q_mean, self.cruise_conditions["m"], V, self.cruise_conditions["Iyy"],
+                                       wing_area, wing_mean_chord)
+
+        # ----------------- aircraft matrix derivatives ----------------- #
+        first_part = factors["qS_mV"]
+        self.derivatives["Xu"] = -first_part * (2 * C_D_0 + der["C_D_u"])
+        self.derivatives["Xw"] = first_part * (C_L_0 * (1 - (2 / (np.pi * aspect_ratio * oswald)) * der["C_L_alpha"]))
+        self.derivatives["Zu"] = -first_part * (2 * C_L_0 + der["C_L_u"])
+        self.derivatives["Zw"] = - first_part * (C_D_0 + der["C_L_alpha"])
+
+        first_part = factors["qSc_2mV2"]
+        self.derivatives["Zw_dot"] = first_part * (C_D_0 * der["C_L_alpha_dot"])
+        self.derivatives["Zq"] = first_part * der["C_L_q"]
+
+        first_part = factors["qSc_IyyV"]
+        self.derivatives["Mu"] = first_part * der["C_m_u"]
+        self.derivatives["Mw"] = first_part * der["C_m_alpha"]
+
+        self.derivatives["Mw_dot"] = factors["qSc2_2IyyV2"] * der["C_m_alpha_dot"]
+        self.derivatives["Mq"] = factors["qSc2_2IyyV"] * der["C_m_q"]
+
+        # ----------------- control matrix derivatives ----------------- #
+        first_part = factors["qS_mV"]
+        self.derivatives["X_delta_e"] = first_part * der["C_D_d_E"]
+        self.derivatives["Z_delta_e"] = first_part * der["C_L_d_E"]
+        self.derivatives["X_delta_T"] = first_part * der["C_D_d_T"]
+        self.derivatives["Z_delta_T"] = first_part * der["C_L_d_T"]
+
+        first_part = factors["qSc_IyyV"]
+        self.derivatives["M_delta_e"] = first_part * der["C_M_d_E"]
+        self.derivatives["M_delta_T"] = first_part * der["C_M_d_T"]
+
+        return self.derivatives
+
+    def set_long_stability_aircraft_matrix(self):
+        '''
+        :return: (N, 4, 4) array of aircraft matrices, rows/columns: u, w, q, theta
+        '''
+        d = self.derivatives
+        V = self.cruise_conditions["V"]
+        g = self.cruise_conditions["g"]
+        theta = self.cruise_conditions["theta"]
+
+        matrix = np.zeros((self.size, 4, 4), dtype=np.result_type(d["Xu"], V, g, theta))
+        matrix[:, 0, 0] = d["Xu"]
+        matrix[:, 0, 1] = d["Xw"]
+        matrix[:, 0, 3] = -g * np.cos((np.pi * theta / 180))
+        matrix[:, 1, 0] = d["Zu"]
+        matrix[:, 1, 1] = d["Zw"]
+        matrix[:, 1, 2] = V
+        matrix[:, 1, 3] = -g * np.sin((np.pi * theta / 180))
+        matrix[:, 2, 0] = d["Mu"] + d["Zu"] * d["Mw_dot"]
+        matrix[:, 2, 1] = d["Mw"] + d["Zw"] * d["Mw_dot"]
+        matrix[:, 2, 2] = d["Mq"] + V * d["Mw_dot"]
+        matrix[:, 3, 2] = 1
+
+        matrix[matrix == -0.0] = 0.0
+        self.aircraft_matrix = matrix
+        return self.aircraft_matrix
+
+    def set_long_stability_control_matrix(self):
+        '''
+        :return: (N, 4, 2) array of control matrices, columns: elevator, throttle
+        '''
+        d = self.derivatives
+
+        matrix = np.zeros((self.size, 4, 2), dtype=np.result_type(d["X_delta_e"], d["Mw_dot"]))
+        matrix[:, 0, 0] = d["X_delta_e"]
+        matrix[:, 0, 1] = d["X_delta_T"]
+        matrix[:, 1, 0] = d["Z_delta_e"]
+        matrix[:, 1, 1] = d["Z_delta_T"]
+        matrix[:, 2, 0] = d["M_delta_e"] + d["Z_delta_e"] * d["Mw_dot"]
+        matrix[:, 2, 1] = d["M_delta_T"] + d["Z_delta_T"] * d["Mw_dot"]
+
+        self.control_matrix = matrix
+        return self.control_matrix
+
+    def get_long_aircraft_matrices(self):
+        return self.aircraft_matrix
+
+    def get_long_control_matrices(self):
+        return self.control_matrix
+
+    def get_derivatives(self):
+        return self.derivatives
+
+
+def long_batch_matrices(cruise_conditions, stability_der, wing_area, aspect_ratio, oswald, wing_mean_chord):
+    '''
+    One vectorized pass: columns in, derivatives and stacked matrices out
+    :return: (derivatives, (N, 4, 4) aircraft matrices, (N, 4, 2) control matrices)
+    '''
+    batch = LongBatchMatrix(cruise_conditions, stability_der)
+    batch.calculate_derivatives(wing_area, aspect_ratio, oswald, wing_mean_chord)
+    return batch.derivatives, batch.set_long_stability_aircraft_matrix(), batch.set_long_stability_control_matrix()
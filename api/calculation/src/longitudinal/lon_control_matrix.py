@@ -9,9 +9,9 @@ class LongControlMatrix(FlightData):
     This class calculates the control matrix for the elevator and throttle control
     '''
 
-    def __init__(self, user_file=None):
+    def __init__(self, flight_data):
         # get the flight data
-        FlightData.__init__(self, "longitudinal", user_file=user_file)
+        FlightData.__init__(self, flight_data)
         self.X_delta_e = 0
         self.Z_delta_e = 0
         self.M_delta_e = 0
@@ -20,49 +20,37 @@ class LongControlMatrix(FlightData):
         self.M_delta_T = 0
 
         self.control_matrix = None
-        # check if q_mean is -1 (not defined) and calculate it
-        if self.cruise_conditions["q_mean"]["value"] == -1111:
-            self.q_mean = (self.cruise_conditions["rho"]["value"] *
-                           self.cruise_conditions["V"]["value"] ** 2) / 2
-        else:
-            self.q_mean = self.cruise_conditions["q_mean"]["value"]
 
     def calculate_X_delta_e(self, wing_area):
 
-        first_part = self.q_mean * wing_area / \
-                     (self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_D_d_E"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(wing_area)["qS_mV"]
+        second_part = self.stability["C_D_d_E"]
         self.X_delta_e = first_part * second_part
 
     def calculate_Z_delta_e(self, wing_area):
-        first_part = self.q_mean * wing_area / \
-                     (self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_L_d_E"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(wing_area)["qS_mV"]
+        second_part = self.stability["C_L_d_E"]
         self.Z_delta_e = first_part * second_part
 
     def calculate_M_delta_e(self, wing_area, wing_mean_chord):
-        first_part = self.q_mean * wing_area * wing_mean_chord / \
-                     (self.cruise_conditions["Iyy"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_M_d_E"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(wing_area, wing_mean_chord)["qSc_IyyV"]
+        second_part = self.stability["C_M_d_E"]
         self.M_delta_e = first_part * second_part
 
 
     def calculate_X_delta_T(self, wing_area):
-        first_part = self.q_mean * wing_area / \
-                     (self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_D_d_T"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(wing_area)["qS_mV"]
+        second_part = self.stability["C_D_d_T"]
         self.X_delta_T = first_part * second_part
 
     def calculate_Z_delta_T(self, wing_area):
-        first_part = self.q_mean * wing_area / \
-                     (self.cruise_conditions["m"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_L_d_T"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(wing_area)["qS_mV"]
+        second_part = self.stability["C_L_d_T"]
         self.Z_delta_T = first_part * second_part
 
     def calculate_M_delta_T(self, wing_area, wing_mean_chord):
-        first_part = self.q_mean * wing_area * wing_mean_chord / \
-                     (self.cruise_conditions["Iyy"]["value"] * self.cruise_conditions["V"]["value"])
-        second_part = self.stability_der["C_M_d_T"]["value"]
+        first_part = self.flight_condition.longitudinal_factors(wing_area, wing_mean_chord)["qSc_IyyV"]
+        second_part = self.stability["C_M_d_T"]
         self.M_delta_T = first_part * second_part
 
     def set_long_stability_control_matrix(self, Mw_dot):
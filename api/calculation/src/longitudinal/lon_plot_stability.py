@@ -1,77 +1,102 @@
 import numpy as np
-from matplotlib import pyplot as plt
+from matplotlib.figure import Figure
 import io
 import base64
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 
+from analysis.time_response import mode_response
+
+# plotted responses of each mode
+SERIES = {
+    "phugoid": ["axial velocity", "angle of attack"],
+    "short_period": ["pitch rate", "pitch angle"],
+}
+# simulated time of each mode (s)
+DURATIONS = {
+    "phugoid": 600,
+    "short_period": 4,
+}
+# state of the initial disturbance of each mode: axial velocity for the phugoid, pitch angle for the short period
+DISTURBED_STATE = {
+    "phugoid": 0,
+    "short_period": 3,
+}
+
 
 class PlotLongitudinalModes:
 
-    def __init__(self, natural_frequency, damping_ratio):
-        self.natural_frequency = natural_frequency
-        self.damping_ratio = damping_ratio
+    def __init__(self, aircraft_matrix, control_matrix, eigenvalues, eigenvectors, modes, speed):
+        '''
+        :param modes: dict mode -> index of its eigenvalue (and eigenvector column), see classify_modes
+        :param speed: cruise speed V, the angle of attack is w / V
+        '''
+        self.aircraft_matrix = aircraft_matrix
+        self.control_matrix = control_matrix
+        self.eigenvalues = eigenvalues
+        self.eigenvectors = eigenvectors
+        self.modes = modes
+        self.speed = speed
+
+    def compute_response(self, mode):
+        '''
+        Free response of the 4-state model (u, w, q, theta) started on the eigenvector of the mode
+        :return: time vector, natural frequency, damping ratio and the two plotted responses of the mode
+        (axial velocity and angle of attack for the phugoid, pitch rate and pitch angle for the short period)
+        '''
+        if mode not in SERIES:
+            raise ValueError(f"Unknown longitudinal mode {mode}")
+
+        k = self.modes[mode]
+        eigenvalue = self.eigenvalues[k]
+        omega_n = np.abs(eigenvalue)
+        zeta = -eigenvalue.real / omega_n
+        t, states = mode_response(self.aircraft_matrix, self.control_matrix, self.eigenvectors[:, k],
+                                  DURATIONS[mode], reference=DISTURBED_STATE[mode])
 
-    def plot_modes(self, mode):
-        omega_n = 0
-        zeta = 0
-        t = 0
-        if mode == "short_period":
-            omega_n = self.natural_frequency[0]
-            zeta = self.damping_ratio[0]
-            t = np.linspace(0, 4, 1000)
-        elif mode == "phugoid":
-            omega_n = self.natural_frequency[1]
-            zeta = self.damping_ratio[1]
-            t = np.linspace(0, 600, 1000)
-            plt.yticks(np.arange(-1, 2, 0.5))
-        else:
-            print("Mode does not exist")
-
-        wn_zeta = omega_n * zeta
-        A1 = 1  # initial disturbance in pitch angle
-        A2 = -A1 * wn_zeta / omega_n
-        u = 0  # initial axial velocity
-        theta = 0  # initial angle of attack
-        p = 0  # initial pitch rate
-        q = 0  # initial pitch angle
-
-        # calculate pitch rate for phugoid mode
         if mode == "phugoid":
-            # compute axial velocity
-            u = np.exp(-wn_zeta * t) * (
-                    A1 * np.cos(omega_n * np.sqrt(1 - zeta ** 2) * t) + A2 * np.sin(omega_n * np.sqrt(1 - zeta ** 2) * t))
-            # compute angle of attack
-            theta = np.exp(-wn_zeta * t) * (
-                    A1 * np.sin(omega_n * np.sqrt(1 - zeta ** 2) * t) / np.sqrt(1 - zeta ** 2) - A2 * np.cos(
-                omega_n * np.sqrt(1 - zeta ** 2) * t) / np.sqrt(1 - zeta ** 2))
-        else:
-            # compute pitch rate
-            p = A1 * np.exp(-wn_zeta * t) * (np.cos(omega_n * np.sqrt(1 - zeta ** 2) * t) + zeta * np.sin(
-                omega_n * np.sqrt(1 - zeta ** 2) * t) / np.sqrt(1 - zeta ** 2))
-            # compute pitch angle
-            q = A1 * (1 - np.exp(-wn_zeta * t)) * (np.cos(omega_n * np.sqrt(1 - zeta ** 2) * t) + zeta * np.sin(
-                omega_n * np.sqrt(1 - zeta ** 2) * t) / np.sqrt(1 - zeta ** 2))
-
-
-        fig = plt.figure()
+            return t, omega_n, zeta, states[:, 0], states[:, 1] / self.speed
+        return t, omega_n, zeta, states[:, 2], states[:, 3]
+
+    def mode_data(self, mode, decimate=1, dtype=np.float32):
+        '''
+        Data-only output of a mode: compact typed arrays instead of a rendered figure
+        :param decimate: keep one sample out of decimate
+        :return: dict with the time vector, the state histories and the mode metadata
+        '''
+        t, omega_n, zeta, first, second = self.compute_response(mode)
+
+        return {
+            "mode": mode,
+            "natural_frequency": float(omega_n),
+            "damping_ratio": float(zeta),
+            "time_unit": "s",
+            "t": np.asarray(t[::decimate], dtype=dtype),
+            "series": {
+                name: np.asarray(values[::decimate], dtype=dtype)
+                for name, values in zip(SERIES[mode], (first, second))
+            },
+        }
+
+    def plot_modes(self, mode):
+        '''
+        Render the mode response with the object oriented Figure API (no pyplot state), so that several
+        modes can be rendered at the same time in threads or processes
+        :return: base64 png image
+        '''
+        t, omega_n, zeta, first, second = self.compute_response(mode)
+
+        fig = Figure()
         ax = fig.add_subplot(111)
 
-        # plot pitch rate for phugoid mode or pitch angle for short period mode
-        if mode == "phugoid":
-            plt.plot(t, u, 'r')
-            plt.plot(t, theta, 'b')
-            # add legend
-            plt.legend(['axial velocity', 'angle of attack'], loc='upper right')
-        else:
-            plt.plot(t, p, 'r')
-            plt.plot(t, q, 'b')
-            # add legend
-            plt.legend(['pitch rate', 'pitch angle'], loc='upper right')
+        # plot axial velocity and angle of attack for phugoid mode, pitch rate and pitch angle for short period mode
+        ax.plot(t, first, 'r')
+        ax.plot(t, second, 'b')
+        # add legend
+        ax.legend(SERIES[mode], loc='upper right')
 
         # Plot response
-        # plt.plot(t, u)
-        plt.xlabel('Time (s)')
-        plt.title(f'{mode} Mode Response')
+        ax.set_xlabel('Time (s)')
+        ax.set_title(f'{mode} Mode Response')
 
         # # Move left y-axis and bottom x-axis to left, passing through (0,0)
         ax.spines['left'].set_position('zero')
@@ -83,9 +108,7 @@ class PlotLongitudinalModes:
         ax.xaxis.set_ticks_position('bottom')
         ax.yaxis.set_ticks_position('left')
 
-
-        plt.grid(True)
-        # plt.show()
+        ax.grid(True)
 
         # Render the plot as a bitmap or vector graphics format
         canvas = FigureCanvas(fig)
@@ -93,6 +116,4 @@ class PlotLongitudinalModes:
         canvas.print_png(buf)  # Or use print_svg or print_pdf for other formats
 
         # Convert the rendered plot to a binary data payload
-        data = base64.b64encode(buf.getvalue()).decode('utf-8')
-
-        return data
+        return base64.b64encode(buf.getvalue()).decode('utf-8')
@@ -0,0 +1,331 @@
+import contextvars
+import json
+import queue
+import threading
+
+from calculation.src.airplane import Airplane
+
+from service.instrumentation import span
+from service.rendering import render_modes, start_renderer
+from service.result_cache import default_cache
+
+LONGITUDINAL_MODES = ["phugoid", "short_period"]
+LATERAL_MODES = ["Rolling", "Spiral", "Dutch Roll"]
+AXES = ["longitudinal", "lateral"]
+
+
+def load_geometry(path="calculation/flights/geometricData/geometric.json"):
+    # open geometricData/geometric.json
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def geometry_arguments(geometric_content):
+    '''
+    :return: name, wing area, aspect ratio, taper ratio, wingspan, mean chord and Oswald factor of the Airplane
+    '''
+    S = geometric_content["S"]["value"]  # Wing area
+    A = geometric_content["AR"]["value"]  # Aspect ratio
+    lambda_ = 0.5  # Taper ratio
+    b = geometric_content["b"]["value"]  # Wingspan
+    c_mean = geometric_content["c"]["value"]  # Mean chord
+    e = geometric_content["e"]["value"]  # Oswald factor
+
+    return "Business JET", S, A, lambda_, b, c_mean, e
+
+
+def build_airplane(axis, user_file, geometric_content):
+    '''
+    :param axis: "longitudinal" or "lateral"
+    :param user_file: [stability derivatives, flight conditions] as json strings or parsed dicts
+    :param geometric_content: parsed geometric.json
+    '''
+    return Airplane(*geometry_arguments(geometric_content), axis, user_file)
+
+
+def build_combined(user_file, geometric_content):
+    '''
+    :param user_file: [longitudinal stability derivatives, lateral stability derivatives, flight conditions]
+    :return: dict axis -> Airplane, both built from the same parsed flight conditions
+    '''
+    return Airplane.combined(*geometry_arguments(geometric_content), user_file)
+
+
+def plot_stages(airplane, plotter, modes, plots="png", decimate=1):
+    '''
+    Render the plots of every mode at the same time (see service/rendering.py) and report them in the order
+    of modes, each "plot" span is the time spent waiting for that plot
+    '''
+    results = render_modes(plotter, modes, plots, decimate)
+    for mode in modes:
+        with span("plot", mode=mode, output=plots):
+            _, airplane.plots[mode] = next(results)
+        yield "plot", mode, airplane
+
+
+def longitudinal_stages(user_file, geometric_content, plots="png", decimate=1, airplane=None):
+    '''
+    Run the longitudinal stages one after another, the results are kept on the Airplane
+    :param plots: "png" (base64 images), "data" (typed arrays of the responses) or "none"
+    :param decimate: keep one sample out of decimate in "data" plots
+    :param airplane: Airplane already built from user_file (combined analysis)
+    :return: generator of (stage, mode, airplane) after each finished stage, mode is only set for plots
+    '''
+    if airplane is None:
+        with span("flight_data"):
+            airplane = build_airplane("longitudinal", user_file, geometric_content)
+
+    with span("matrices"):
+        airplane.get_longitudinal_aicraft_matrix()
+        airplane.get_longitudinal_control_matrix()
+    yield "matrices", None, airplane
+
+    with span("eigen_analysis"):
+        airplane.set_eigenvalues()
+        airplane.set_eigenvectors()
+        airplane.set_characteristic_equation()
+        airplane.set_natural_frequency()
+        airplane.set_damping_ratio()
+    yield "eigen_analysis", None, airplane
+
+    with span("transfer_functions"):
+        airplane.set_long_transfer_functions()
+    yield "transfer_functions", None, airplane
+
+    with span("frequency_response"):
+        airplane.set_frequency_response()
+    yield "frequency_response", None, airplane
+
+    if plots != "none":
+        yield from plot_stages(airplane, airplane.lon_mode_plotter(), LONGITUDINAL_MODES, plots, decimate)
+
+
+def lateral_stages(user_file, geometric_content, plots="png", decimate=1, airplane=None):
+    '''
+    Run the lateral stages one after another, the results are kept on the Airplane
+    :param plots: "png" (base64 images), "data" (typed arrays of the responses) or "none"
+    :param decimate: keep one sample out of decimate in "data" plots
+    :param airplane: Airplane already built from user_file (combined analysis)
+    :return: generator of (stage, mode, airplane) after each finished stage, mode is only set for plots
+    '''
+    if airplane is None:
+        with span("flight_data"):
+            airplane = build_airplane("lateral", user_file, geometric_content)
+
+    with span("matrices"):
+        airplane.get_lateral_aircraft_matrix()
+        airplane.get_lateral_control_matrix()
+    yield "matrices", None, airplane
+
+    with span("eigen_analysis"):
+        airplane.set_lateral_eigenvalues()
+        airplane.set_lateral_eigenvectors()
+        airplane.set_lateral_characteristic_equation()
+        airplane.set_lateral_natural_frequency()
+        airplane.set_lateral_damping_ratio()
+    yield "eigen_analysis", None, airplane
+
+    with span("transfer_functions"):
+        airplane.set_lateral_transfer_functions()
+    yield "transfer_functions", None, airplane
+
+    with span("frequency_response"):
+        airplane.set_frequency_response()
+    yield "frequency_response", None, airplane
+
+    if plots != "none":
+        yield from plot_stages(airplane, airplane.lat_mode_plotter(), LATERAL_MODES, plots, decimate)
+
+
+STAGES = {
+    "longitudinal": longitudinal_stages,
+    "lateral": lateral_stages,
+}
+
+
+def completed_stages(airplane):
+    '''
+    :return: the (stage, mode, airplane) sequence of an analysis that already ran (a cached one)
+    '''
+    for stage in ["matrices", "eigen_analysis", "transfer_functions", "frequency_response"]:
+        yield stage, None, airplane
+    for mode in airplane.plots:
+        yield "plot", mode, airplane
+
+
+def run_stages(stages):
+    airplane = None
+    for _, _, airplane in stages:
+        pass
+    return airplane
+
+
+def run_combined_stages(stages):
+    '''
+    :return: dict axis -> Airplane of the stages of a combined analysis
+    '''
+    airplanes = {}
+    for _, _, airplane in stages:
+        airplanes[airplane.axis] = airplane
+    return airplanes
+
+
+def analyse_longitudinal(user_file, geometric_content, plots="png", decimate=1):
+    '''
+    Run every longitudinal stage and keep the results on the returned Airplane
+    '''
+    return run_stages(longitudinal_stages(user_file, geometric_content, plots, decimate))
+
+
+def analyse_lateral(user_file, geometric_content, plots="png", decimate=1):
+    '''
+    Run every lateral stage and keep the results on the returned Airplane
+    '''
+    return run_stages(lateral_stages(user_file, geometric_content, plots, decimate))
+
+
+def analyse_combined(user_file, geometric_content, plots="png", decimate=1):
+    '''
+    Run every stage of both axes and return the Airplane of each axis
+    '''
+    return run_combined_stages(combined_stages(user_file, geometric_content, plots, decimate, cache=False))
+
+
+ANALYSES = {
+    "longitudinal": analyse_longitudinal,
+    "lateral": analyse_lateral,
+    "combined": analyse_combined,
+}
+
+
+def combined_stages(user_file, geometric_content, plots="png", decimate=1, cache=None, status=None):
+    '''
+    Longitudinal and lateral analyses of one aircraft from one parsed input set
+    The two axes run at the same time in their own thread (their plots share the render pool of
+    service/rendering.py) and each one is answered from the result cache on its own
+    :param user_file: [longitudinal stability derivatives, lateral stability derivatives, flight conditions]
+    as json strings or parsed dicts
+    :param status: optional dict, status[axis] is the status of each axis and "cached" is set before every
+    stage to whether the axis of that stage comes from the cache
+    :return: generator of (stage, mode, airplane) of both axes in the order they finish, airplane.axis tells
+    the axis of each stage
+    '''
+    status = {} if status is None else status
+    status["cached"] = False
+
+    with span("parse_inputs"):
+        inputs = [item if isinstance(item, dict) else json.loads(item) for item in user_file]
+    with span("flight_data"):
+        airplanes = build_combined(inputs, geometric_content)
+
+    results = queue.Queue()
+
+    def run_axis(axis, axis_file):
+        outcome = None
+        try:
+            with span(axis):
+                for item in analyse_stages(axis, axis_file, geometric_content, plots, decimate, cache, status[axis],
+                                           airplanes[axis]):
+                    results.put((axis, item))
+        except Exception as error:
+            outcome = error
+        # None once every stage of the axis is done, the exception when it failed
+        results.put((axis, outcome))
+
+    if plots == "png":
+        # a render process pool is forked before the threads of the two axes start
+        start_renderer()
+
+    for axis, stability_der in zip(AXES, inputs):
+        status[axis] = {}
+        # each thread records its spans in the instrumentation of the caller
+        thread = threading.Thread(target=contextvars.copy_context().run, daemon=True,
+                                  args=(run_axis, axis, [stability_der, inputs[2]]))
+        thread.start()
+
+    running = len(AXES)
+    while running:
+        axis, item = results.get()
+        if item is None:
+            running -= 1
+        elif isinstance(item, Exception):
+            raise item
+        else:
+            status["cached"] = status[axis]["cached"]
+            yield item
+
+
+def analyse_stages(axis, user_file, geometric_content, plots="png", decimate=1, cache=None, status=None,
+                   airplane=None):
+    '''
+    Full analysis of one axis stage by stage, answered from the result cache when the same inputs were
+    already analysed (every stage is then reported at once)
+    :param axis: "longitudinal", "lateral" or "combined" (see combined_stages)
+    :param user_file: [stability derivatives, flight conditions] as json strings or parsed dicts
+    :param plots: "png" (base64 images), "data" (typed arrays of the responses) or "none"
+    :param decimate: keep one sample out of decimate in "data" plots
+    :param cache: ResultCache to use, the process wide one by default (False to disable caching)
+    :param status: optional dict, "cached" is set to whether the analysis comes from the cache
+    :param airplane: Airplane already built from user_file, used when the analysis is not cached
+    :return: generator of (stage, mode, airplane) after each finished stage
+    '''
+    if axis == "combined":
+        yield from combined_stages(user_file, geometric_content, plots, decimate, cache, status)
+        return
+
+    status = {} if status is None else status
+    status["cached"] = False
+
+    with span("parse_inputs"):
+        inputs = [item if isinstance(item, dict) else json.loads(item) for item in user_file]
+
+    if cache is False:
+        yield from STAGES[axis](inputs, geometric_content, plots, decimate, airplane)
+        return
+
+    cache = cache or default_cache()
+    with span("cache_lookup") as lookup:
+        key = cache.key(axis, inputs, geometric_content, {"plots": plots, "decimate": decimate})
+        cached = cache.get(key)
+        if lookup is not None:
+            lookup["hit"] = cached is not None
+
+    if cached is not None:
+        status["cached"] = True
+        yield from completed_stages(cached)
+        return
+
+    for stage, mode, airplane in STAGES[axis](inputs, geometric_content, plots, decimate, airplane):
+        yield stage, mode, airplane
+
+    with span("cache_store"):
+        cache.put(key, airplane)
+
+
+def analyse(axis, user_file, geometric_content, plots="png", decimate=1, cache=None):
+    '''
+    Full analysis of one axis, answered from the result cache when the same inputs were already analysed
+    :param user_file: [stability derivatives, flight conditions] as json strings or parsed dicts
+    :param plots: "png" (base64 images), "data" (typed arrays of the responses) or "none"
+    :param decimate: keep one sample out of decimate in "data" plots
+    :param cache: ResultCache to use, the process wide one by default (False to disable caching)
+    :return: Airplane holding matrices, eigenvalues, transfer functions and plots, for the "combined" axis
+    a dict axis -> Airplane
+    '''
+    with span("analysis", axis=axis):
+        stages = analyse_stages(axis, user_file, geometric_content, plots, decimate, cache)
+        if axis == "combined":
+            return run_combined_stages(stages)
+        return run_stages(stages)
+
+
+def build_matrices(axis, user_file, geometric_content):
+    '''
+    Airplane with only its aircraft and control matrices, for the tools that do not need the rest of the analysis
+    (nothing is read from or written to the result cache)
+    :param axis: "longitudinal" or "lateral"
+    :param user_file: [stability derivatives, flight conditions] as json strings or parsed dicts
+    '''
+    with span("analysis", axis=axis):
+        _, _, airplane = next(STAGES[axis](user_file, geometric_content, plots="none"))
+    return airplane
@@ -0,0 +1,39 @@
+import base64
+
+import numpy as np
+
+
+def encode_array(array):
+    '''
+    Compact json form of a numpy array: dtype, shape and the raw little-endian bytes in base64
+    '''
+    array = np.ascontiguousarray(array)
+    if array.dtype.byteorder == ">":
+        array = array.astype(array.dtype.newbyteorder("<"))
+    return {
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "data": base64.b64encode(array.tobytes()).decode("ascii"),
+    }
+
+
+def decode_array(encoded):
+    data = base64.b64decode(encoded["data"])
+    return np.frombuffer(data, dtype=np.dtype(encoded["dtype"])).reshape(encoded["shape"])
+
+
+def encode_arrays(value):
+    '''
+    :return: value with every numpy array (in nested dicts and lists) replaced by its encode_array form
+    '''
+    if isinstance(value, np.ndarray):
+        return encode_array(value)
+    if isinstance(value, dict):
+        return {key: encode_arrays(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_arrays(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, complex):
+        return [value.real, value.imag]
+    return value
@@ -0,0 +1,36 @@
+import json
+import os
+import tempfile
+import uuid
+
+
+def matrix_bundle(airplane):
+    '''
+    :return: json friendly aircraft and control matrices of an analysed Airplane
+    '''
+    return {
+        "aircraft_matrix": airplane.aircraft_matrix.tolist(),
+        "control_matrix": airplane.control_matrix.tolist(),
+    }
+
+
+def export_json(content, directory, prefix):
+    '''
+    Write content to a new file <directory>/<prefix>-<unique id>.json
+    The file is written under a temporary name first and renamed, so that readers never see a partial file
+    and concurrent requests never write to the same path
+    :return: path of the written file
+    '''
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{prefix}-{uuid.uuid4().hex}.json")
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(content, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
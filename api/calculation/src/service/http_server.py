@@ -0,0 +1,313 @@
+'''
+Asyncio HTTP front of the stability pipeline (standard library only).
+
+    POST /longitudinal  {"stability_derivatives": {...}, "flight_conditions": {...}, "plots": "png", "decimate": 1}
+    POST /lateral       the same fields, with the lateral stability derivatives
+    POST /combined      {"longitudinal_derivatives": {...}, "lateral_derivatives": {...}, "flight_conditions": {...}}
+    GET  /health        analyses in progress and request counters
+
+The json files are sent as json objects (json strings are accepted too), nothing is rewritten by regular
+expressions. "plots" ("png", "data" or "none"), "decimate" and "export" (write the matrices to a unique file)
+are optional. The answer holds the records of the streaming protocol (service/protocol.py) and the matrices:
+    {"success": true, "axis": "longitudinal", "records": [{"type": "start", ...}, ...], "matrices": {...}}
+
+The analyses run in an executor, the event loop only parses requests and writes answers. Concurrent requests for
+the same analysis share one computation, and at most max_pending different analyses are queued or running: beyond
+that the server answers 503 with a Retry-After header instead of queueing without bound.
+'''
+import asyncio
+import functools
+import http
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from calculation.src.pipeline import AXES
+from service.export import export_json, matrix_bundle
+from service.protocol import stream_analysis
+from service.rendering import start_renderer, use_renderer
+from service.result_cache import ResultCache, default_cache
+
+# json fields of the files of each analysis, in the order of the user_file of the pipeline
+AXIS_FIELDS = {
+    "longitudinal": ("stability_derivatives", "flight_conditions"),
+    "lateral": ("stability_derivatives", "flight_conditions"),
+    "combined": ("longitudinal_derivatives", "lateral_derivatives", "flight_conditions"),
+}
+EXPORT_PREFIX = {
+    "longitudinal": "longMatrix",
+    "lateral": "latMatrix",
+    "combined": "combinedMatrix",
+}
+PLOTS = ("png", "data", "none")
+
+MAX_BODY = 16 * 1024 * 1024
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def parse_analysis(axis, body):
+    '''
+    :param body: raw request body
+    :return: (user_file as parsed dicts, options dict with plots, decimate and export)
+    '''
+    try:
+        request = json.loads(body)
+    except ValueError:
+        raise HTTPError(400, "The request body is not valid json")
+    if not isinstance(request, dict):
+        raise HTTPError(400, "The request body has to be a json object")
+
+    user_file = []
+    for field in AXIS_FIELDS[axis]:
+        if field not in request:
+            raise HTTPError(400, f"Missing {field}, the {axis} analysis needs {', '.join(AXIS_FIELDS[axis])}")
+        item = request[field]
+        if isinstance(item, str):
+            try:
+                item = json.loads(item)
+            except ValueError:
+                raise HTTPError(400, f"{field} is not valid json")
+        if not isinstance(item, dict):
+            raise HTTPError(400, f"{field} has to be a json object")
+        user_file.append(item)
+
+    plots = request.get("plots", "png")
+    if plots not in PLOTS:
+        raise HTTPError(400, f"plots has to be one of {', '.join(PLOTS)}")
+    try:
+        decimate = int(request.get("decimate", 1))
+    except (TypeError, ValueError):
+        decimate = 0
+    if decimate < 1:
+        raise HTTPError(400, "decimate has to be a positive integer")
+
+    return user_file, {"plots": plots, "decimate": decimate, "export": bool(request.get("export"))}
+
+
+def run_analysis(axis, user_file, geometric_content, plots="png", decimate=1, export=None):
+    '''
+    Full analysis of one request, runs in the executor
+    :param export: folder to also write the matrices to, None to keep them in the answer only
+    :return: the encoded json answer (bytes), shared as is by every coalesced request
+    '''
+    records = []
+    airplanes = stream_analysis(axis, user_file, geometric_content, records.append, plots, decimate)
+
+    answer = {"success": airplanes is not None, "axis": axis, "records": records}
+    if airplanes is not None:
+        if axis == "combined":
+            matrices = {name: matrix_bundle(airplanes[name]) for name in AXES}
+        else:
+            matrices = matrix_bundle(airplanes)
+        answer["matrices"] = matrices
+        if export:
+            answer["export"] = export_json(matrices, export, EXPORT_PREFIX[axis])
+    return json.dumps(answer, separators=(",", ":")).encode("utf-8")
+
+
+def http_response(status, body, headers=None, keep_alive=True):
+    '''
+    :return: bytes of a complete HTTP/1.1 response with a json body
+    '''
+    lines = [
+        f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def json_body(content):
+    return json.dumps(content, separators=(",", ":")).encode("utf-8")
+
+
+async def read_request(reader):
+    '''
+    :return: (method, path, version, headers with lower case names, body), None when the client closed the connection
+    '''
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if "transfer-encoding" in headers:
+        raise HTTPError(501, "Chunked request bodies are not supported, send a Content-Length")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, f"The request body is larger than {MAX_BODY} bytes")
+
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path.split("?", 1)[0], version, headers, body
+
+
+class StabilityServer:
+    '''
+    This class answers the HTTP requests of one listening socket, see the module docstring
+    '''
+
+    def __init__(self, geometric_content, executor=None, max_pending=8, export_directory=None):
+        '''
+        :param executor: concurrent.futures executor running the analyses
+        :param max_pending: different analyses queued or running at once, more are answered with 503
+        :param export_directory: folder of the matrices of the requests with "export": true
+        '''
+        self.geometric_content = geometric_content
+        self.executor = executor
+        self.max_pending = max_pending
+        self.export_directory = export_directory
+        # cache key of the analysis -> future of its encoded answer
+        self.inflight = {}
+        self.counters = {"requests": 0, "computed": 0, "coalesced": 0, "rejected": 0}
+
+    async def analyse(self, axis, body):
+        '''
+        :return: encoded json answer of the analysis, computed once for identical concurrent requests
+        '''
+        user_file, options = parse_analysis(axis, body)
+        key = ResultCache.key(axis, user_file, self.geometric_content, options)
+
+        future = self.inflight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        if len(self.inflight) >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise HTTPError(503, "Too many analyses in progress, retry later", {"Retry-After": "1"})
+
+        self.counters["computed"] += 1
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(run_analysis, axis, user_file, self.geometric_content,
+                                             options["plots"], options["decimate"],
+                                             self.export_directory if options["export"] else None))
+        self.inflight[key] = future
+        future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # a client that disconnects does not cancel the computation the other clients wait for
+        return await asyncio.shield(future)
+
+    def health(self):
+        return json_body({
+            "status": "ok",
+            "pending": len(self.inflight),
+            "max_pending": self.max_pending,
+            "counters": self.counters,
+            "cache": default_cache().stats(),
+        })
+
+    async def dispatch(self, method, path, body):
+        '''
+        :return: (status, body, extra headers)
+        '''
+        axis = path.strip("/")
+        if axis in AXIS_FIELDS:
+            if method != "POST":
+                raise HTTPError(405, f"Use POST on {path}", {"Allow": "POST"})
+            return 200, await self.analyse(axis, body), {}
+        if axis == "health":
+            if method != "GET":
+                raise HTTPError(405, f"Use GET on {path}", {"Allow": "GET"})
+            return 200, self.health(), {}
+        raise HTTPError(404, f"Unknown path {path}, use /longitudinal, /lateral, /combined or /health")
+
+    async def handle_connection(self, reader, writer):
+        '''
+        Answer the requests of one connection one after another (HTTP/1.1 keep-alive)
+        '''
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, path, version, headers, body = request
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+
+                    self.counters["requests"] += 1
+                    status, content, extra = await self.dispatch(method, path, body)
+                except HTTPError as error:
+                    status, content, extra = error.status, json_body({"success": False, "error": str(error)}), \
+                        error.headers
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception:
+                    traceback.print_exc(file=sys.stderr)
+                    status, content, extra = 500, json_body({"success": False, "error": "An error occurred."}), {}
+
+                writer.write(http_response(status, content, extra, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def make_executor(kind="thread", workers=None):
+    '''
+    :param kind: "thread" (the analyses share the result cache of the server) or "process" (one result cache
+    per worker process, no shared interpreter lock)
+    '''
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+
+
+def start_processes(executor):
+    '''
+    Start the worker processes of a process pool before accepting connections: a process forked while a connection
+    is open keeps a copy of its socket, and the client would never see the connection close
+    '''
+    if isinstance(executor, ProcessPoolExecutor):
+        executor.submit(os.getpid).result()
+
+
+async def serve(geometric_content, host="127.0.0.1", port=8000, executor="thread", workers=None, max_pending=None,
+                export_directory=None, ready=None):
+    '''
+    Serve the pipeline until cancelled
+    :param workers: analyses running at once, max_pending defaults to twice as many
+    :param ready: callback receiving the listening (host, port)
+    '''
+    workers = workers or os.cpu_count() or 1
+    with make_executor(executor, workers) as pool:
+        # the analyses run beside each other, the plots of one analysis are drawn in threads (serially in the
+        # worker processes) instead of by one more pool of processes per analysis worker
+        use_renderer("serial" if executor == "process" else "thread")
+        start_processes(pool)
+        if executor == "thread":
+            # a render process pool chosen with AS_PLOT_RENDERER is started before the analysis threads
+            start_renderer()
+        server = StabilityServer(geometric_content, pool, max_pending or 2 * workers, export_directory)
+        listener = await asyncio.start_server(server.handle_connection, host, port)
+        async with listener:
+            if ready is not None:
+                ready(listener.sockets[0].getsockname()[:2])
+            await listener.serve_forever()
@@ -0,0 +1,185 @@
+import contextlib
+import contextvars
+import cProfile
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+# instrumentation of the running analysis, None when instrumentation is off (the default)
+_current = contextvars.ContextVar("instrumentation", default=None)
+
+
+class Instrumentation:
+    '''
+    This class records structured spans (wall time, cpu time and peak memory) of the analysis stages
+    Peak memory is measured with tracemalloc and only when memory is True (it slows the analysis down)
+    The tracemalloc peak is process wide, so it is only measured for the spans of the main thread: the spans of
+    other threads (the two axes of a combined analysis, the requests of the server) report a peak_memory of None
+    '''
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.spans = []
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+        self.started_tracemalloc = False
+
+    @property
+    def stack(self):
+        # spans are nested per thread, the stages of a combined analysis run in several threads
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+    def stop(self):
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        entry = {
+            "name": name,
+            "parent": self.stack[-1]["name"] if self.stack else None,
+            "start": time.perf_counter() - self.origin,
+        }
+        entry.update(attributes)
+
+        # a span of another thread would reset the peak of the spans running in the main thread
+        tracing = self.memory and tracemalloc.is_tracing() and threading.current_thread() is threading.main_thread()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # keep the peak reached so far by the enclosing span before resetting it for this one
+            if self.stack:
+                self.stack[-1]["_peak"] = max(self.stack[-1]["_peak"], peak)
+            tracemalloc.reset_peak()
+            entry["_base"] = current
+            entry["_peak"] = current
+
+        self.stack.append(entry)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield entry
+        finally:
+            entry["wall"] = time.perf_counter() - wall
+            entry["cpu"] = time.process_time() - cpu
+            self.stack.pop()
+
+            if tracing:
+                entry["_peak"] = max(entry["_peak"], tracemalloc.get_traced_memory()[1])
+                entry["peak_memory"] = entry["_peak"] - entry["_base"]
+                if self.stack:
+                    self.stack[-1]["_peak"] = max(self.stack[-1]["_peak"], entry["_peak"])
+                del entry["_base"], entry["_peak"]
+            else:
+                entry["peak_memory"] = None
+
+            self.spans.append(entry)
+
+    def record(self, name, wall, cpu=None, **attributes):
+        '''
+        Add a span measured elsewhere (the imports of a command line run for example)
+        '''
+        entry = {"name": name, "parent": None, "start": None, "wall": wall, "cpu": cpu, "peak_memory": None}
+        entry.update(attributes)
+        self.spans.append(entry)
+
+    def timings(self):
+        '''
+        :return: json friendly timings, the spans in the order they started
+        '''
+        spans = sorted(self.spans, key=lambda entry: -1 if entry["start"] is None else entry["start"])
+        return {
+            "total": time.perf_counter() - self.origin,
+            "spans": spans,
+        }
+
+
+@contextlib.contextmanager
+def instrument(memory=False):
+    '''
+    Turn the instrumentation on for the code run in this block
+        with instrument() as instrumentation:
+            run(...)
+        instrumentation.timings()
+    '''
+    instrumentation = Instrumentation(memory)
+    token = _current.set(instrumentation)
+    instrumentation.start()
+    try:
+        yield instrumentation
+    finally:
+        instrumentation.stop()
+        _current.reset(token)
+
+
+def span(name, **attributes):
+    '''
+    Span of a stage, does nothing when the instrumentation is off
+    '''
+    instrumentation = _current.get()
+    if instrumentation is None:
+        return contextlib.nullcontext()
+    return instrumentation.span(name, **attributes)
+
+
+@contextlib.contextmanager
+def profile(kind, path):
+    '''
+    Profile a single run and dump the result to path
+    :param kind: "cprofile" (pstats file, open it with python -m pstats or snakeviz)
+    or "tracemalloc" (snapshot file, load it with tracemalloc.Snapshot.load)
+    '''
+    if kind == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+    elif kind == "tracemalloc":
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(25)
+        try:
+            yield None
+        finally:
+            tracemalloc.take_snapshot().dump(path)
+            if started:
+                tracemalloc.stop()
+    else:
+        raise ValueError(f"Unknown profiler {kind}")
+
+
+@contextlib.contextmanager
+def command_line_instrumentation(timings=False, memory=False, profile_spec=None, imports=None):
+    '''
+    --timings, --memory and --profile options of the command line entry points
+    The timings are printed on stderr as {"timings": {...}} so that stdout keeps its format
+    :param profile_spec: "cprofile:PATH" or "tracemalloc:PATH"
+    :param imports: (wall, cpu) seconds spent importing the entry point, reported as the "imports" span
+    '''
+    with contextlib.ExitStack() as stack:
+        if profile_spec:
+            kind, _, path = profile_spec.partition(":")
+            stack.enter_context(profile(kind, path or f"{kind}.out"))
+
+        instrumentation = None
+        if timings or memory:
+            instrumentation = stack.enter_context(instrument(memory))
+            if imports is not None:
+                instrumentation.record("imports", *imports)
+
+        yield instrumentation
+
+    if instrumentation is not None:
+        print(json.dumps({"timings": instrumentation.timings()}), file=sys.stderr)
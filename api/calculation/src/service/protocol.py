@@ -0,0 +1,139 @@
+'''
+Streaming result protocol: one json record per line (NDJSON), written as soon as each stage finishes.
+
+    {"type": "start", "axis": "longitudinal", "plots": "png"}
+    {"type": "stage", "stage": "matrices", "cached": false, "data": {"aircraft_matrix": <array>, ...}}
+    {"type": "stage", "stage": "eigen_analysis", ...}
+    {"type": "stage", "stage": "transfer_functions", ...}
+    {"type": "stage", "stage": "frequency_response", ...}
+    {"type": "stage", "stage": "plot", "mode": "phugoid", "data": {"format": "png", "image": "<base64>"}}
+    {"type": "end", "success": true}
+
+A combined analysis ("axis": "combined") streams the stages of both axes in the order they finish, each stage
+record then also has "axis": "longitudinal" or "lateral".
+
+Numeric arrays are sent in the compact form of service.encoding: {"dtype": "<f8", "shape": [4, 4], "data": "<base64>"}
+(little-endian raw bytes, "<c16" for complex arrays). A failure ends the stream with
+{"type": "end", "success": false, "error": "..."}, the message of invalid inputs (ValueError) is sent as is, any
+other failure is only described on stderr.
+'''
+import json
+import sys
+import traceback
+
+import numpy as np
+
+from analysis.modal_analysis import label_modes
+from analysis.root_locus import CONTROLS, STATES
+from calculation.src.pipeline import analyse_stages
+from service.encoding import encode_arrays
+
+
+def stage_data(axis, stage, mode, airplane):
+    '''
+    :return: the results of one finished stage, numpy arrays are encoded by the caller
+    '''
+    if stage == "matrices":
+        return {
+            "states": STATES[axis],
+            "controls": CONTROLS[axis],
+            "aircraft_matrix": airplane.aircraft_matrix,
+            "control_matrix": airplane.control_matrix,
+        }
+
+    if stage == "eigen_analysis":
+        if axis == "longitudinal":
+            eigenvalues, eigenvectors = airplane.get_eigenvalues(), airplane.get_eigenvectors()
+            characteristic_equation = airplane.get_characteristic_equation()
+        else:
+            eigenvalues, eigenvectors = airplane.get_lateral_eigenvalues(), airplane.get_lateral_eigenvectors()
+            characteristic_equation = airplane.get_lateral_characteristic_equation()
+        modes = {
+            name: {
+                "eigenvalue": [float(parameters["eigenvalue"].real), float(parameters["eigenvalue"].imag)],
+                "natural_frequency": float(parameters["natural_frequency"]),
+                "damping_ratio": float(parameters["damping_ratio"]),
+                "unstable": bool(parameters["unstable"]),
+            }
+            for name, parameters in label_modes(eigenvalues, axis, eigenvectors).items()
+        }
+        return {
+            "eigenvalues": eigenvalues,
+            "eigenvectors": eigenvectors,
+            "characteristic_equation": np.asarray(characteristic_equation),
+            "modes": modes,
+        }
+
+    if stage == "transfer_functions":
+        tf = airplane.tf_numeric
+        return {
+            "numerator": tf["numerator"],
+            "denominator": tf["denominator"],
+            "poles": tf["poles"],
+            "zeros": tf["zeros"],
+            "gain": tf["gain"],
+        }
+
+    if stage == "frequency_response":
+        response = airplane.get_frequency_response()
+        return {
+            "omega": response["omega"],
+            "magnitude_db": response["magnitude_db"].astype(np.float32),
+            "phase": response["phase"].astype(np.float32),
+        }
+
+    if stage == "plot":
+        plot = airplane.plots[mode]
+        if isinstance(plot, dict):
+            return dict(plot, format="data")
+        return {"format": "png", "image": plot}
+
+    raise ValueError(f"Unknown stage {stage}")
+
+
+def stream_analysis(axis, user_file, geometric_content, write, plots="png", decimate=1, cache=None):
+    '''
+    Run the analysis and write one record per finished stage
+    :param axis: "longitudinal", "lateral" or "combined"
+    :param user_file: [stability derivatives, flight conditions] as json strings or parsed dicts, for a combined
+    analysis [longitudinal stability derivatives, lateral stability derivatives, flight conditions]
+    :param write: function receiving each record (a json friendly dict)
+    :return: the Airplane (dict axis -> Airplane for a combined analysis), None when the analysis failed
+    '''
+    write({"type": "start", "axis": axis, "plots": plots})
+    airplanes = {}
+    status = {}
+    try:
+        for stage, mode, airplane in analyse_stages(axis, user_file, geometric_content, plots, decimate, cache,
+                                                    status):
+            airplanes[airplane.axis] = airplane
+            record = {"type": "stage", "stage": stage, "cached": status["cached"],
+                      "data": encode_arrays(stage_data(airplane.axis, stage, mode, airplane))}
+            if axis == "combined":
+                record["axis"] = airplane.axis
+            if mode is not None:
+                record["mode"] = mode
+            write(record)
+    except ValueError as error:
+        write({"type": "end", "success": False, "error": str(error)})
+        return None
+    except Exception:
+        traceback.print_exc(file=sys.stderr)
+        write({"type": "end", "success": False, "error": "An error occurred."})
+        return None
+
+    write({"type": "end", "success": True})
+    if axis == "combined":
+        return airplanes
+    return airplanes.get(axis)
+
+
+def ndjson_writer(stream):
+    '''
+    :return: write function printing one compact json record per line and flushing it right away
+    '''
+    def write(record):
+        stream.write(json.dumps(record, separators=(",", ":")) + "\n")
+        stream.flush()
+
+    return write
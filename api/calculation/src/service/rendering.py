@@ -0,0 +1,119 @@
+'''
+Rendering of the mode plots.
+
+Every mode figure is independent work, so the requested modes are rendered at the same time and collected
+in order: a multi-plot request takes about the time of its slowest plot. The renderer is chosen with
+AS_PLOT_RENDERER: "process" (a pool of processes, the default with several cpus), "thread" (the figures are
+drawn with the object oriented matplotlib API, there is no shared pyplot state) or "serial" (one plot after
+another, the default with a single cpu).
+
+Long-lived processes that run beside others (the API workers, the HTTP server) choose their default with
+use_renderer(): a render process pool in each of them would multiply the processes. A process pool is always started
+with start_renderer() before the threads of the process, forking a process that runs threads can deadlock.
+'''
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+RENDERERS = ["serial", "thread", "process"]
+
+# at most three modes are plotted per axis
+PLOT_WORKERS = 3
+
+# executors shared by every request of the process, created on first use
+_executors = {}
+_executors_lock = threading.Lock()
+
+# default renderer of the process set by use_renderer, AS_PLOT_RENDERER still takes precedence
+_process_renderer = None
+
+
+def render_mode(plotter, mode, output="png", decimate=1):
+    '''
+    :param plotter: PlotLongitudinalModes or PlotLateralModes
+    :param output: "png" for a base64 png image, "data" for the time vector and state histories as typed arrays
+    :param decimate: keep one sample out of decimate in "data" output
+    :return: the plot of the mode
+    '''
+    if output == "data":
+        return plotter.mode_data(mode, decimate)
+    return plotter.plot_modes(mode)
+
+
+def default_renderer():
+    renderer = os.environ.get("AS_PLOT_RENDERER")
+    if renderer:
+        if renderer not in RENDERERS:
+            raise ValueError(f"Unknown plot renderer {renderer}, expected one of {RENDERERS}")
+        return renderer
+    if _process_renderer is not None:
+        return _process_renderer
+    return "process" if (os.cpu_count() or 1) > 1 else "serial"
+
+
+def use_renderer(renderer):
+    '''
+    Set the default renderer of this process (and of the processes it forks) when AS_PLOT_RENDERER is not set
+    '''
+    global _process_renderer
+    if renderer not in RENDERERS:
+        raise ValueError(f"Unknown plot renderer {renderer}, expected one of {RENDERERS}")
+    _process_renderer = renderer
+
+
+def start_renderer(renderer=None):
+    '''
+    Create the executor of the renderer now, a process pool also starts its worker processes: call it before
+    starting threads (or accepting connections), the processes are forked without them
+    '''
+    executor = plot_executor(renderer or default_renderer())
+    if isinstance(executor, ProcessPoolExecutor):
+        executor.submit(os.getpid).result()
+    return executor
+
+
+def plot_executor(renderer):
+    '''
+    :return: the shared executor of the renderer, None for serial rendering
+    '''
+    if renderer == "serial":
+        return None
+    with _executors_lock:
+        if renderer not in _executors:
+            # the two axes of a combined analysis plot at the same time
+            workers = min(2 * PLOT_WORKERS, os.cpu_count() or 1)
+            executor_class = ProcessPoolExecutor if renderer == "process" else ThreadPoolExecutor
+            _executors[renderer] = executor_class(max_workers=workers)
+        return _executors[renderer]
+
+
+def render_modes(plotter, modes, output="png", decimate=1, renderer=None):
+    '''
+    Render several modes at the same time
+    Data-only output is a few numpy operations and is always computed in place
+    :param renderer: "serial", "thread" or "process", default_renderer() by default
+    :return: generator of (mode, plot) in the order of modes
+    '''
+    renderer = renderer or default_renderer()
+    executor = plot_executor(renderer) if len(modes) > 1 and output != "data" else None
+
+    if executor is None:
+        for mode in modes:
+            yield mode, render_mode(plotter, mode, output, decimate)
+        return
+
+    futures = [executor.submit(render_mode, plotter, mode, output, decimate) for mode in modes]
+    try:
+        for mode, future in zip(modes, futures):
+            yield mode, future.result()
+    except BrokenProcessPool:
+        # a crashed pool is replaced by a new one on the next request
+        with _executors_lock:
+            if _executors.get(renderer) is executor:
+                del _executors[renderer]
+        raise
+    finally:
+        # plots nobody waits for anymore (failed or abandoned request)
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,237 @@
+import copy
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+# every python file of the calculation code, a change in any of them invalidates the cache
+SOURCE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# prefix of the version folders of the on-disk tier, only these folders are ever removed from the cache directory
+VERSION_PREFIX = "as-cache-"
+
+_code_version = None
+_default_cache = None
+
+
+def code_version():
+    '''
+    :return: hash of the calculation source code, computed once per process
+    '''
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        for root, dirs, files in sorted(os.walk(SOURCE_DIRECTORY)):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    path = os.path.join(root, name)
+                    digest.update(os.path.relpath(path, SOURCE_DIRECTORY).encode("utf-8"))
+                    with open(path, "rb") as f:
+                        digest.update(f.read())
+        _code_version = digest.hexdigest()[:16]
+    return _code_version
+
+
+class ResultCache:
+    '''
+    This class caches full analyses (the Airplane result bundle) by a hash of their inputs
+    It has an in-memory LRU tier and an optional on-disk tier bounded in size
+    The cache keeps its own copy of every result and get() returns a copy, a caller can modify what it receives
+    '''
+
+    def __init__(self, directory=None, memory_items=32, disk_bytes=256 * 1024 * 1024):
+        '''
+        :param directory: folder of the on-disk tier, None to keep results in memory only
+        :param memory_items: number of results kept in memory
+        :param disk_bytes: size of the on-disk tier, the least recently used files are removed beyond it
+        '''
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+
+        self.directory = None
+        # size of the on-disk tier, updated by every write and measured again by every eviction (the workers
+        # sharing the folder only see each other's files then)
+        self.disk_size = 0
+        if directory:
+            self.directory = os.path.join(directory, VERSION_PREFIX + code_version())
+            os.makedirs(self.directory, exist_ok=True)
+            self._remove_old_versions(directory)
+            self.disk_size = self._disk_usage()[0]
+
+    @staticmethod
+    def _remove_old_versions(directory):
+        '''
+        Remove the folders of the other code versions, the other entries of the directory are not the cache's
+        '''
+        for name in os.listdir(directory):
+            if name.startswith(VERSION_PREFIX) and name != VERSION_PREFIX + code_version():
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    @staticmethod
+    def key(axis, inputs, geometric_content, options=None):
+        '''
+        :param inputs: parsed [stability derivatives, flight conditions]
+        :param options: any other setting that changes the result (plot output, ...)
+        :return: canonical hash of everything the analysis depends on
+        '''
+        canonical = json.dumps({
+            "axis": axis,
+            "inputs": inputs,
+            "geometry": geometric_content,
+            "options": options,
+            "code": code_version(),
+        }, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                result = self.memory[key]
+            else:
+                result = None
+        if result is not None:
+            return copy.deepcopy(result)
+
+        result = self._disk_get(key)
+        with self.lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        # the unpickled result is new, the memory tier keeps it and the caller gets a copy
+        self._memory_put(key, result)
+        return copy.deepcopy(result)
+
+    def put(self, key, result):
+        self._memory_put(key, copy.deepcopy(result))
+        self._disk_put(key, result)
+
+    def get_or_compute(self, key, compute):
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "memory_items": len(self.memory),
+            "disk_bytes": self.disk_size,
+        }
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, name))
+            with self.lock:
+                self.disk_size = 0
+
+    # ----------------- memory tier ----------------- #
+    def _memory_put(self, key, result):
+        with self.lock:
+            self.memory[key] = result
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_items:
+                self.memory.popitem(last=False)
+
+    # ----------------- disk tier ----------------- #
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def _disk_get(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                result = pickle.load(f)
+            # the modification time is the last use for the eviction
+            os.utime(self._path(key))
+            return result
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+    def _disk_put(self, key, result):
+        if not self.directory:
+            return
+        # write to a temporary file first so that concurrent workers never read a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(tmp_path)
+            try:
+                replaced = os.path.getsize(self._path(key))
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self.lock:
+            self.disk_size += size - replaced
+            full = self.disk_size > self.disk_bytes
+        if full:
+            self._evict()
+
+    def _disk_usage(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pkl"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, name))
+        return sum(size for _, size, _ in files), files
+
+    def _evict(self):
+        total, files = self._disk_usage()
+        for _, size, name in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+        with self.lock:
+            self.disk_size = total
+
+
+def default_cache():
+    '''
+    Process wide cache, configured with the environment:
+    AS_CACHE_DIR (on-disk tier folder, empty to disable it), AS_CACHE_ITEMS, AS_CACHE_SIZE_MB
+    '''
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache(
+            directory=os.environ.get("AS_CACHE_DIR", "calculation/.cache"),
+            memory_items=int(os.environ.get("AS_CACHE_ITEMS", 32)),
+            disk_bytes=int(os.environ.get("AS_CACHE_SIZE_MB", 256)) * 1024 * 1024,
+        )
+    return _default_cache
@@ -0,0 +1,466 @@
+'''
+What-if edits of one analysed Airplane.
+
+The model knows which dimensional derivatives every input feeds (through the dynamic pressure factors of
+data/flight_condition.py) and which matrix entries every derivative and cruise condition feeds. Changing one value
+recomputes those derivatives with the calculate_* methods of the Airplane, rewrites the entries whose value changed
+and marks the downstream products stale:
+
+    input -> derivatives -> aircraft / control matrix entries -> eigen analysis -> mode plots
+                                                              -> transfer functions (only the changed control
+                                                                 columns when the aircraft matrix is unchanged)
+                                                              -> frequency response
+
+The products are recomputed when they are read (modes(), transfer_functions(), frequency_response(), plot()), so
+a series of edits costs one eigen analysis, and a plot is only rendered again when its mode moved.
+'''
+import copy
+import math
+
+import numpy as np
+
+from calculation.src.pipeline import build_airplane
+
+from analysis.root_locus import CONTROLS
+from analysis.transfer_functions import format_transfer_function, transfer_functions
+from data.flight_condition import CRUISE_CONDITIONS, DEPENDENT_CONDITIONS, FlightCondition, StabilityDerivatives, recompute_dependents
+from lateral.lat_aircraft_matrix import LatAircraftMatrix
+from lateral.lat_control_matrix import LatControlMatrix
+from longitudinal.lon_aircraft_matrix import LongAircraftMatrix
+from longitudinal.lon_control_matrix import LongControlMatrix
+from service.rendering import render_mode
+
+# dynamic pressure factor -> cruise conditions it is computed from (longitudinal_factors, lateral_factors)
+FACTOR_INPUTS = {
+    "qS_mV": ("dynamic_pressure", "m", "V"),
+    "qSc_2mV2": ("dynamic_pressure", "m", "V"),
+    "qSc_IyyV": ("dynamic_pressure", "Iyy", "V"),
+    "qSc2_2IyyV2": ("dynamic_pressure", "Iyy", "V"),
+    "qSc2_2IyyV": ("dynamic_pressure", "Iyy", "V"),
+    "qSb_2mV": ("dynamic_pressure", "m", "V"),
+    "qSb_IxxV": ("dynamic_pressure", "Ixx", "V"),
+    "qSb2_2IxxV": ("dynamic_pressure", "Ixx", "V"),
+    "qSb_IzzV": ("dynamic_pressure", "Izz", "V"),
+    "qSb2_2IzzV": ("dynamic_pressure", "Izz", "V"),
+}
+
+# dimensional derivative -> (calculate_* method, Airplane geometry attributes it takes, dynamic pressure factor,
+# other inputs it reads)
+DERIVATIVES = {
+    "longitudinal": {
+        "Xu": (LongAircraftMatrix.calculate_Xu, ("wing_area",), "qS_mV", ("C_D_0", "C_D_u")),
+        "Xw": (LongAircraftMatrix.calculate_Xw, ("aspect_ratio", "wing_oswald", "wing_area"), "qS_mV",
+               ("C_L_0", "C_L_alpha")),
+        "Zu": (LongAircraftMatrix.calculate_Zu, ("wing_area",), "qS_mV", ("C_L_0", "C_L_u")),
+        "Zw": (LongAircraftMatrix.calculate_Zw, ("wing_area",), "qS_mV", ("C_D_0", "C_L_alpha")),
+        "Zw_dot": (LongAircraftMatrix.calculate_Zw_dot, ("wing_mean_chord", "wing_area"), "qSc_2mV2",
+                   ("C_D_0", "C_L_alpha_dot")),
+        "Zq": (LongAircraftMatrix.calculate_Zq, ("wing_mean_chord", "wing_area"), "qSc_2mV2", ("C_L_q",)),
+        "Mu": (LongAircraftMatrix.calculate_Mu, ("wing_mean_chord", "wing_area"), "qSc_IyyV", ("C_m_u",)),
+        "Mw": (LongAircraftMatrix.calculate_Mw, ("wing_mean_chord", "wing_area"), "qSc_IyyV", ("C_m_alpha",)),
+        "Mw_dot": (LongAircraftMatrix.calculate_Mw_dot, ("wing_mean_chord", "wing_area"), "qSc2_2IyyV2",
+                   ("C_m_alpha_dot",)),
+        "Mq": (LongAircraftMatrix.calculate_Mq, ("wing_mean_chord", "wing_area"), "qSc2_2IyyV", ("C_m_q",)),
+        "X_delta_e": (LongControlMatrix.calculate_X_delta_e, ("wing_area",), "qS_mV", ("C_D_d_E",)),
+        "Z_delta_e": (LongControlMatrix.calculate_Z_delta_e, ("wing_area",), "qS_mV", ("C_L_d_E",)),
+        "M_delta_e": (LongControlMatrix.calculate_M_delta_e, ("wing_area", "wing_mean_chord"), "qSc_IyyV",
+                      ("C_M_d_E",)),
+        "X_delta_T": (LongControlMatrix.calculate_X_delta_T, ("wing_area",), "qS_mV", ("C_D_d_T",)),
+        "Z_delta_T": (LongControlMatrix.calculate_Z_delta_T, ("wing_area",), "qS_mV", ("C_L_d_T",)),
+        "M_delta_T": (LongControlMatrix.calculate_M_delta_T, ("wing_area", "wing_mean_chord"), "qSc_IyyV",
+                      ("C_M_d_T",)),
+    },
+    "lateral": {
+        "Yv": (LatAircraftMatrix.calculate_Yv, ("wing_area",), "qS_mV", ("C_Y_beta",)),
+        "Yp": (LatAircraftMatrix.calculate_Yp, ("wing_area", "wingspan"), "qSb_2mV", ("C_Y_p",)),
+        "Yr": (LatAircraftMatrix.calculate_Yr, ("wing_area", "wingspan"), "qSb_2mV", ("C_Y_r",)),
+        "Lv": (LatAircraftMatrix.calculate_Lv, ("wing_area", "wingspan"), "qSb_IxxV", ("C_L_beta",)),
+        "Lp": (LatAircraftMatrix.calculate_Lp, ("wing_area", "wingspan"), "qSb2_2IxxV", ("C_L_p",)),
+        "Lr": (LatAircraftMatrix.calculate_Lr, ("wing_area", "wingspan"), "qSb2_2IxxV", ("C_L_r",)),
+        "Nv": (LatAircraftMatrix.calculate_Nv, ("wing_area", "wingspan"), "qSb_IzzV", ("C_N_beta",)),
+        "Np": (LatAircraftMatrix.calculate_Np, ("wing_area", "wingspan"), "qSb2_2IzzV", ("C_N_p",)),
+        "Nr": (LatAircraftMatrix.calculate_Nr, ("wing_area", "wingspan"), "qSb2_2IzzV", ("C_N_r",)),
+        "Y_delta_r": (LatControlMatrix.calculate_Y_delta_r, ("wing_area",), "qS_mV", ("C_Y_delta_r",)),
+        "L_delta_r": (LatControlMatrix.calculate_L_delta_r, ("wing_area", "wingspan"), "qSb_IxxV",
+                      ("C_L_delta_r",)),
+        "N_delta_r": (LatControlMatrix.calculate_N_delta_r, ("wing_area", "wingspan"), "qSb_IzzV",
+                      ("C_N_delta_r",)),
+        "Y_delta_a": (LatControlMatrix.calculate_Y_delta_a, ("wing_area",), "qS_mV", ("C_Y_delta_a",)),
+        "L_delta_a": (LatControlMatrix.calculate_L_delta_a, ("wing_area", "wingspan"), "qSb_IxxV",
+                      ("C_L_delta_a",)),
+        "N_delta_a": (LatControlMatrix.calculate_N_delta_a, ("wing_area", "wingspan"), "qSb_IzzV",
+                      ("C_N_delta_a",)),
+    },
+}
+
+# matrix entry -> (derivatives and cruise conditions it reads, function(airplane, flight_condition) -> value)
+# the same expressions as set_long_stability_aircraft_matrix and the other matrix builders, the entries missing
+# here are constants
+AIRCRAFT_ENTRIES = {
+    "longitudinal": {
+        (0, 0): (("Xu",), lambda a, fc: a.Xu),
+        (0, 1): (("Xw",), lambda a, fc: a.Xw),
+        (0, 3): (("g", "theta"), lambda a, fc: -fc.g * np.cos((np.pi * fc.theta / 180))),
+        (1, 0): (("Zu",), lambda a, fc: a.Zu),
+        (1, 1): (("Zw",), lambda a, fc: a.Zw),
+        (1, 2): (("V",), lambda a, fc: fc.V),
+        (1, 3): (("g", "theta"), lambda a, fc: -fc.g * np.sin((np.pi * fc.theta / 180))),
+        (2, 0): (("Mu", "Zu", "Mw_dot"), lambda a, fc: a.Mu + a.Zu * a.Mw_dot),
+        (2, 1): (("Mw", "Zw", "Mw_dot"), lambda a, fc: a.Mw + a.Zw * a.Mw_dot),
+        (2, 2): (("Mq", "V", "Mw_dot"), lambda a, fc: a.Mq + fc.V * a.Mw_dot),
+    },
+    "lateral": {
+        (0, 0): (("Yv",), lambda a, fc: a.Yv),
+        (0, 1): (("Yp",), lambda a, fc: a.Yp),
+        (0, 2): (("V", "Yr"), lambda a, fc: -(fc.V - a.Yr)),
+        (0, 3): (("g", "theta"), lambda a, fc: fc.g * np.cos((np.pi * fc.theta / 180))),
+        (1, 0): (("Lv",), lambda a, fc: a.Lv),
+        (1, 1): (("Lp",), lambda a, fc: a.Lp),
+        (1, 2): (("Lr",), lambda a, fc: a.Lr),
+        (2, 0): (("Nv",), lambda a, fc: a.Nv),
+        (2, 1): (("Np",), lambda a, fc: a.Np),
+        (2, 2): (("Nr",), lambda a, fc: a.Nr),
+    },
+}
+CONTROL_ENTRIES = {
+    "longitudinal": {
+        (0, 0): (("X_delta_e",), lambda a, fc: a.X_delta_e),
+        (0, 1): (("X_delta_T",), lambda a, fc: a.X_delta_T),
+        (1, 0): (("Z_delta_e",), lambda a, fc: a.Z_delta_e),
+        (1, 1): (("Z_delta_T",), lambda a, fc: a.Z_delta_T),
+        (2, 0): (("M_delta_e", "Z_delta_e", "Mw_dot"), lambda a, fc: a.M_delta_e + a.Z_delta_e * a.Mw_dot),
+        (2, 1): (("M_delta_T", "Z_delta_T", "Mw_dot"), lambda a, fc: a.M_delta_T + a.Z_delta_T * a.Mw_dot),
+    },
+    "lateral": {
+        (0, 0): (("Y_delta_r",), lambda a, fc: a.Y_delta_r),
+        (0, 1): (("Y_delta_a",), lambda a, fc: a.Y_delta_a),
+        (1, 0): (("L_delta_r",), lambda a, fc: a.L_delta_r),
+        (1, 1): (("L_delta_a",), lambda a, fc: a.L_delta_a),
+        (2, 0): (("N_delta_r",), lambda a, fc: a.N_delta_r),
+        (2, 1): (("N_delta_a",), lambda a, fc: a.N_delta_a),
+    },
+}
+
+MATRICES = ("aircraft_matrix", "control_matrix")
+
+
+def dependency_graph(axis):
+    '''
+    :return: dict input (cruise condition or stability derivative) -> derivatives it feeds, and dict derivative or
+    cruise condition -> list of (matrix, entry) it feeds
+    '''
+    derivatives = {}
+    for derivative, (_, _, factor, inputs) in DERIVATIVES[axis].items():
+        for name in FACTOR_INPUTS[factor] + inputs:
+            derivatives.setdefault(name, []).append(derivative)
+
+    entries = {}
+    for matrix, table in zip(MATRICES, (AIRCRAFT_ENTRIES[axis], CONTROL_ENTRIES[axis])):
+        for entry, (inputs, _) in table.items():
+            for name in inputs:
+                entries.setdefault(name, []).append((matrix, entry))
+    return derivatives, entries
+
+
+class WhatIfModel:
+    '''
+    This class keeps an analysed Airplane up to date when its cruise conditions or stability derivatives are
+    edited one at a time, see the module docstring
+    The Airplane is copied: the one given (e.g. from the result cache) is never modified
+    '''
+
+    def __init__(self, airplane):
+        self.axis = airplane.axis
+        self.airplane = copy.copy(airplane)
+        airplane = self.airplane
+
+        # the values the edits change are copied (the matrices are written in place, see update)
+        airplane.cruise_conditions = {name: dict(item) if isinstance(item, dict) else item
+                                      for name, item in airplane.cruise_conditions.items()}
+        airplane.stability_der = {name: dict(item) if isinstance(item, dict) else item
+                                  for name, item in airplane.stability_der.items()}
+        airplane.stability = StabilityDerivatives(self.axis, dict(airplane.stability.values))
+        airplane.plots = dict(airplane.plots)
+        airplane.tf = dict(airplane.tf)
+
+        if airplane.aircraft_matrix is None:
+            if self.axis == "longitudinal":
+                airplane.get_longitudinal_aicraft_matrix()
+                airplane.get_longitudinal_control_matrix()
+            else:
+                airplane.get_lateral_aircraft_matrix()
+                airplane.get_lateral_control_matrix()
+        airplane.aircraft_matrix = np.array(airplane.aircraft_matrix, dtype=float)
+        airplane.control_matrix = np.array(airplane.control_matrix, dtype=float)
+
+        self.derivatives, self.entries = dependency_graph(self.axis)
+        self.order = {derivative: index for index, derivative in enumerate(DERIVATIVES[self.axis])}
+        self.tables = {"aircraft_matrix": AIRCRAFT_ENTRIES[self.axis], "control_matrix": CONTROL_ENTRIES[self.axis]}
+
+        # stale products: eigen analysis, control columns of the transfer functions, frequency response
+        self.stale_eigen = airplane.eigenvalues is None
+        self.stale_columns = set(range(airplane.control_matrix.shape[1])) if airplane.tf_numeric is None else set()
+        self.stale_response = airplane.frequency_response is None
+        # (mode, output, decimate) -> (mode signature, plot)
+        self.plot_cache = {}
+
+    @classmethod
+    def build(cls, axis, user_file, geometric_content):
+        '''
+        :param user_file: [stability derivatives, flight conditions] as json strings or parsed dicts
+        '''
+        return cls(build_airplane(axis, user_file, geometric_content))
+
+    # ----------------- inputs ----------------- #
+    @property
+    def inputs(self):
+        '''
+        :return: dict name -> current value of every editable cruise condition and stability derivative
+        '''
+        flight_condition = self.airplane.flight_condition
+        values = {name: getattr(flight_condition, name) for name in CRUISE_CONDITIONS
+                  if getattr(flight_condition, name) is not None}
+        values.update(self.airplane.stability.values)
+        return values
+
+    def dependencies(self, name):
+        '''
+        :return: dict with the derivatives and the (matrix, entry) pairs the input feeds, the cruise conditions
+        derived from it (e.g. h -> rho, a, Mach, q_mean) feed theirs too
+        '''
+        if name not in CRUISE_CONDITIONS and name not in self.airplane.stability:
+            raise ValueError(f"Unknown input {name}, expected a cruise condition or a {self.axis} stability "
+                             f"derivative")
+        names = [name] + list(DEPENDENT_CONDITIONS.get(name, ()))
+        if set(names) & {"h", "V", "rho", "q_mean"}:
+            names.append("dynamic_pressure")
+
+        derivatives = sorted({derivative for item in names for derivative in self.derivatives.get(item, ())},
+                             key=self.order.__getitem__)
+        entries = {entry for item in names + derivatives for entry in self.entries.get(item, [])}
+        return {"derivatives": derivatives, "entries": sorted(entries)}
+
+    def set(self, name, value):
+        '''
+        :return: see update
+        '''
+        return self.update({name: value})
+
+    def update(self, values):
+        '''
+        Change some inputs and recompute the derivatives and matrix entries they feed
+        Editing h or V recomputes the cruise conditions derived from them (rho, a, Mach, q_mean) like the sweeps do
+        :param values: dict cruise condition or stability derivative -> new value
+        :return: dict with the recomputed derivatives, the changed (matrix, entry) pairs and the stale products
+        '''
+        airplane = self.airplane
+        unknown = [name for name in values if name not in CRUISE_CONDITIONS and name not in airplane.stability]
+        if unknown:
+            raise ValueError(f"Unknown inputs {', '.join(unknown)}, expected cruise conditions or {self.axis} "
+                             f"stability derivatives")
+
+        changed = set()
+        stability = {name: value for name, value in values.items() if name not in CRUISE_CONDITIONS}
+        if stability:
+            stability = {name: float(value) for name, value in stability.items()}
+            not_finite = [name for name, value in stability.items() if not math.isfinite(value)]
+            if not_finite:
+                raise ValueError(f"Stability derivatives are not finite numbers: {', '.join(not_finite)}")
+            for name, value in stability.items():
+                airplane.stability.values[name] = value
+                airplane.stability_der[name] = {**airplane.stability_der.get(name, {}), "value": value}
+            changed.update(stability)
+
+        cruise = {name: value for name, value in values.items() if name in CRUISE_CONDITIONS}
+        if cruise:
+            changed.update(self.update_cruise_conditions(cruise))
+
+        derivatives = sorted({derivative for name in changed for derivative in self.derivatives.get(name, ())},
+                             key=self.order.__getitem__)
+        for derivative in derivatives:
+            method, geometry, _, _ = DERIVATIVES[self.axis][derivative]
+            previous = getattr(airplane, derivative)
+            method(airplane, *[getattr(airplane, attribute) for attribute in geometry])
+            if getattr(airplane, derivative) != previous:
+                changed.add(derivative)
+
+        entries = []
+        for matrix, entry in sorted({item for name in changed for item in self.entries.get(name, ())}):
+            value = self.tables[matrix][entry][1](airplane, airplane.flight_condition)
+            # the matrix builders replace -0.0 by 0.0
+            value = 0.0 if value == 0 else value
+            target = getattr(airplane, matrix)
+            if target[entry] != value:
+                target[entry] = value
+                entries.append((matrix, entry))
+
+        return {"derivatives": derivatives, "entries": entries, "stale": self.invalidate(entries)}
+
+    def update_cruise_conditions(self, values):
+        '''
+        :return: names of the cruise conditions (and "dynamic_pressure") whose value changed
+        '''
+        airplane = self.airplane
+        cruise_conditions = {name: dict(item) if isinstance(item, dict) else item
+                             for name, item in airplane.cruise_conditions.items()}
+        for name, value in recompute_dependents({name: item.get("value") for name, item in
+                                                 cruise_conditions.items() if isinstance(item, dict)},
+                                                list(values)).items():
+            if name in cruise_conditions:
+                cruise_conditions[name]["value"] = value
+        for name, value in values.items():
+            cruise_conditions[name] = {**cruise_conditions.get(name, {}), "value": float(value)}
+
+        # validated like the json file, nothing is changed when a value is wrong
+        previous = airplane.flight_condition
+        flight_condition = FlightCondition.from_json(cruise_conditions, (self.axis,))
+        airplane.cruise_conditions = cruise_conditions
+        airplane.flight_condition = flight_condition
+        airplane.q_mean = flight_condition.dynamic_pressure
+
+        return {name for name in CRUISE_CONDITIONS + ("dynamic_pressure",)
+                if getattr(flight_condition, name) != getattr(previous, name)}
+
+    def invalidate(self, entries):
+        '''
+        Mark the products of the changed entries stale
+        :return: names of the stale products (pipeline stage names)
+        '''
+        if not entries:
+            return []
+        airplane = self.airplane
+        if any(matrix == "aircraft_matrix" for matrix, _ in entries):
+            self.stale_eigen = True
+            self.stale_columns = set(range(airplane.control_matrix.shape[1]))
+            airplane.sensitivity = None
+        else:
+            self.stale_columns.update(entry[1] for _, entry in entries)
+        self.stale_response = True
+
+        stale = ["transfer_functions", "frequency_response"]
+        if self.stale_eigen:
+            stale = ["eigen_analysis"] + stale + ["plots"]
+        return stale
+
+    # ----------------- products ----------------- #
+    def eigen_analysis(self):
+        '''
+        Eigenvalues, eigenvectors and mode indices of the Airplane, recomputed when the aircraft matrix changed
+        '''
+        if not self.stale_eigen:
+            return
+        airplane = self.airplane
+        if self.axis == "longitudinal":
+            airplane.set_eigenvalues()
+            airplane.set_natural_frequency()
+            airplane.set_damping_ratio()
+        else:
+            airplane.set_lateral_eigenvalues()
+            airplane.set_lateral_natural_frequency()
+            airplane.set_lateral_damping_ratio()
+        # the characteristic equation (polyfromroots) costs more than the eig call, get_airplane() sets it
+        airplane.characteristic_equation = None
+        self.stale_eigen = False
+
+    def modes(self):
+        '''
+        :return: dict mode -> eigenvalue, natural frequency, damping ratio and unstable flag
+        '''
+        self.eigen_analysis()
+        eigenvalues = self.airplane.eigenvalues
+        parameters = {}
+        for mode, index in self.airplane.modes.items():
+            eigenvalue = complex(eigenvalues[index])
+            natural_frequency = abs(eigenvalue)
+            parameters[mode] = {
+                "eigenvalue": eigenvalue,
+                "natural_frequency": natural_frequency,
+                "damping_ratio": -eigenvalue.real / natural_frequency if natural_frequency else float("nan"),
+                "unstable": eigenvalue.real > 0,
+            }
+        return parameters
+
+    def transfer_functions(self, render=False):
+        '''
+        Numeric transfer functions of the Airplane, only the stale control columns are recomputed when the aircraft
+        matrix did not change (the denominator and the poles only depend on it)
+        :param render: return the formatted ones (dict control -> list of strings)
+        '''
+        airplane = self.airplane
+        columns = sorted(self.stale_columns)
+        if columns:
+            if self.stale_eigen or airplane.tf_numeric is None or len(columns) == airplane.control_matrix.shape[1]:
+                tf = transfer_functions(airplane.aircraft_matrix, airplane.control_matrix)
+            else:
+                partial = transfer_functions(airplane.aircraft_matrix, airplane.control_matrix[:, columns])
+                tf = dict(airplane.tf_numeric)
+                for name in ("numerator", "zeros", "gain"):
+                    tf[name] = tf[name].copy()
+                    tf[name][:, columns] = partial[name]
+            airplane.tf_numeric = tf
+            for column in columns:
+                airplane.tf.pop(CONTROLS[self.axis][column], None)
+            self.stale_columns = set()
+
+        if not render:
+            return airplane.tf_numeric
+
+        numerator, denominator = airplane.tf_numeric["numerator"], airplane.tf_numeric["denominator"]
+        for column, control in enumerate(CONTROLS[self.axis]):
+            if control not in airplane.tf:
+                airplane.tf[control] = [format_transfer_function(numerator[i, column], denominator)
+                                        for i in range(len(numerator))]
+        return airplane.tf
+
+    def frequency_response(self):
+        '''
+        Bode data of the Airplane on the default frequency grid (see Airplane.set_frequency_response)
+        '''
+        if self.stale_response:
+            self.airplane.set_frequency_response()
+            self.stale_response = False
+        return self.airplane.frequency_response
+
+    def signature(self, mode):
+        '''
+        :return: the values the plot of the mode is drawn from, the plot is kept while they do not change
+        '''
+        airplane = self.airplane
+        index = airplane.modes[mode]
+        # the response starts on the eigenvector of the mode, the longitudinal angle of attack is w / V
+        signature = airplane.eigenvalues[index].tobytes() + airplane.eigenvectors[:, index].tobytes()
+        if self.axis == "longitudinal":
+            signature += np.float64(airplane.flight_condition.V).tobytes()
+        return signature
+
+    def plot(self, mode, output="png", decimate=1):
+        '''
+        Plot of one mode, rendered again only when the eigenvalue (and eigenvectors) of the mode changed
+        :param output: "png" for a base64 png image, "data" for the time vector and state histories as typed arrays
+        '''
+        self.eigen_analysis()
+        airplane = self.airplane
+        key = (mode, output, decimate)
+        signature = self.signature(mode)
+        cached = self.plot_cache.get(key)
+        if cached is None or cached[0] != signature:
+            plotter = airplane.lon_mode_plotter() if self.axis == "longitudinal" else airplane.lat_mode_plotter()
+            cached = (signature, render_mode(plotter, mode, output, decimate))
+            self.plot_cache[key] = cached
+        airplane.plots[mode] = cached[1]
+        return cached[1]
+
+    def get_airplane(self):
+        '''
+        :return: the Airplane with every product up to date
+        '''
+        airplane = self.airplane
+        self.eigen_analysis()
+        if airplane.characteristic_equation is None:
+            if self.axis == "longitudinal":
+                airplane.set_characteristic_equation()
+            else:
+                airplane.set_lateral_characteristic_equation()
+        self.transfer_functions(render=True)
+        self.frequency_response()
+        return airplane
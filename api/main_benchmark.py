@@ -0,0 +1,62 @@
+'''
+Benchmark suite of the stability pipeline.
+
+Run it from the api/ folder:
+    py -m main_benchmark                                  # every benchmark, json results on stdout
+    py -m main_benchmark --save baseline.json             # keep the results as a baseline
+    py -m main_benchmark --compare baseline.json          # exit code 1 when a median is slower than the baseline
+    py -m main_benchmark --select plot --no-processes     # only the plots, without the full command line runs
+Every stage (json load, derivatives, matrix assembly, eigen analysis, transfer functions, frequency response,
+each mode plot) is timed on the bundled flight data, the batch builders on synthetic inputs, and
+main_lon/main_lat are timed in fresh interpreters (cold import and full runs).
+'''
+import argparse
+import json
+import sys
+
+from calculation.src.pipeline import load_geometry  # noqa: F401 (puts calculation/src on the import path)
+from benchmark.suite import compare, run_suite
+
+
+def print_progress(name, result):
+    print(f"{name:<55} {result['median'] * 1e3:12.4f} ms", file=sys.stderr)
+
+
+def print_comparison(rows):
+    for row in rows:
+        print(f"{row['name']:<55} {row['baseline'] * 1e3:12.4f} ms -> {row['median'] * 1e3:12.4f} ms"
+              f"  x{row['ratio']:.2f}  {row['status']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of every stage of the stability pipeline")
+    parser.add_argument("--axis", choices=["longitudinal", "lateral"], action="append",
+                        help="axis to benchmark (both by default)")
+    parser.add_argument("--select", action="append", help="only run the benchmarks whose name contains this text")
+    parser.add_argument("--batch-size", type=int, default=10000, help="flight conditions of the batch benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum duration of one repetition (s)")
+    parser.add_argument("--no-processes", action="store_true", help="skip the cold import and full run benchmarks")
+    parser.add_argument("--save", help="write the results to this json file")
+    parser.add_argument("--compare", help="baseline json file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slow down counted as a regression")
+    args = parser.parse_args()
+
+    results = run_suite(tuple(args.axis or ["longitudinal", "lateral"]), args.batch_size, args.repeat,
+                        args.min_time, not args.no_processes, args.select, print_progress)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        results["comparison"] = compare(results, baseline, args.threshold)
+        print_comparison(results["comparison"])
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+    if args.compare and any(row["status"] == "slower" for row in results["comparison"]):
+        sys.exit(1)
@@ -0,0 +1,104 @@
+import time
+
+# the imports are reported as a span with --timings
+IMPORT_START = (time.perf_counter(), time.process_time())
+
+import argparse
+import os
+import sys
+
+import main_lat
+import main_lon
+from calculation.src.pipeline import AXES, analyse, load_geometry
+from service.export import export_json, matrix_bundle
+from service.instrumentation import command_line_instrumentation, span
+from service.protocol import ndjson_writer, stream_analysis
+
+IMPORT_TIME = (time.perf_counter() - IMPORT_START[0], time.process_time() - IMPORT_START[1])
+
+
+def process_data(airplanes, export=None):
+    '''
+    :param airplanes: dict axis -> analysed Airplane
+    :param export: folder to also write the matrices to, as a combinedMatrix-<unique id>.json file per request
+    :return: response with the aircraft and control matrices of both axes
+    '''
+
+    try:
+        matrix_content = {axis: matrix_bundle(airplanes[axis]) for axis in AXES}
+
+        filename = "combinedMatrix.json"
+        response = {"success": True, "data": matrix_content}
+        if export:
+            response["path"] = export_json(matrix_content, export, "combinedMatrix")
+            filename = os.path.basename(response["path"])
+
+        # Return the matrices in the response
+        response["headers"] = {
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Type": "application/json"
+        }
+        return response
+
+    except Exception as e:
+        print("Error:", e)
+        return {
+            "success":
+            False,
+            "error":
+            "Vérifier que les fichiers sont bien au bon format et dans le bon ordre. Voir README.md",
+        }
+
+
+def run(data_str1, data_str2, data_str3, geometric_content, plots="png", decimate=1, write=None, export=None):
+    '''
+    Run the longitudinal and the lateral analysis of the aircraft and print both results
+    The flight conditions are parsed once and the two axes are analysed at the same time
+    :param data_str1: content of flightConditions.json as sent by the API
+    :param data_str2: content of longitudinalSD.json as sent by the API
+    :param data_str3: content of lateralSD.json as sent by the API
+    :param geometric_content: parsed geometric.json
+    :param plots: "png" (base64 images), "data" (typed arrays of the responses) or "none"
+    :param decimate: keep one sample out of decimate in "data" plots
+    :param write: function receiving the NDJSON records of the streaming protocol (service/protocol.py)
+    as each stage finishes, instead of printing the text report at the end
+    :param export: folder to also write the matrices to (one unique file per run)
+    :return: the process_data response with the matrices of both axes
+    '''
+
+    data = [main_lon.clean_input(data_str2), main_lat.clean_input(data_str3), main_lon.clean_input(data_str1)]
+
+    if write is not None:
+        airplanes = stream_analysis("combined", data, geometric_content, write, plots, decimate)
+        return None if airplanes is None else process_data(airplanes, export)
+
+    # the analysis of each axis is answered from the result cache when the same files were already analysed
+    airplanes = analyse("combined", data, geometric_content, plots, decimate)
+
+    with span("report"):
+        main_lon.report(airplanes["longitudinal"])
+        main_lat.report(airplanes["lateral"])
+
+    return process_data(airplanes, export)
+
+
+if __name__ == "__main__":
+    # collect sys arg as a string
+    parser = argparse.ArgumentParser(description="Longitudinal and lateral stability analysis")
+    parser.add_argument("file1", help="flightConditions.json content")
+    parser.add_argument("file2", help="longitudinalSD.json content")
+    parser.add_argument("file3", help="lateralSD.json content")
+    parser.add_argument("--plots", choices=["png", "data", "none"], default="png",
+                        help="png images, data-only responses (float32 arrays) or no plots")
+    parser.add_argument("--decimate", type=int, default=1, help="keep one sample out of N in data-only plots")
+    parser.add_argument("--format", choices=["text", "ndjson"], default="text",
+                        help="text report, or one json record per finished stage (streaming protocol)")
+    parser.add_argument("--export", help="folder to also write the matrices to, as a unique json file per run")
+    parser.add_argument("--timings", action="store_true", help="print the wall/cpu time of every stage on stderr")
+    parser.add_argument("--memory", action="store_true", help="also measure the peak memory of every stage")
+    parser.add_argument("--profile", help="cprofile:PATH or tracemalloc:PATH, dump a profile of the run")
+    args = parser.parse_args()
+
+    with command_line_instrumentation(args.timings, args.memory, args.profile, IMPORT_TIME):
+        run(args.file1, args.file2, args.file3, load_geometry(), args.plots, args.decimate,
+            ndjson_writer(sys.stdout) if args.format == "ndjson" else None, args.export)
@@ -0,0 +1,61 @@
+'''
+Gain-scheduling table.
+
+Run it from the api/ folder, every axis is a "start:stop:num" range or a "v1,v2,..." list:
+    py -m main_gain_schedule --h 0:12000:13 --V 80:250:18 --m 4000:6000:5 --output schedule.npz
+    py -m main_gain_schedule --load schedule.npz --query 6096,137.2,4990
+The aircraft and control matrices of both axes are precomputed at every altitude/speed/mass combination and stored
+in one contiguous table; --query prints the matrices interpolated at h,V,m. In code:
+    schedule = GainSchedule.load("schedule.npz")
+    models = schedule.lookup(h, V, m)  # arrays of query points, models[("lateral", "aircraft_matrix")]
+'''
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from calculation.src.pipeline import load_geometry
+from batch.envelope_sweep import DEFAULT_FILES, load_nominal, parse_range
+from batch.gain_schedule import GainSchedule, build_schedule
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aircraft and control matrices over an altitude/speed/mass grid")
+    parser.add_argument("--h", default="0:12000:13", help="altitudes (m), start:stop:num or v1,v2,...")
+    parser.add_argument("--V", default="80:250:18", help="true airspeeds (m/s), start:stop:num or v1,v2,...")
+    parser.add_argument("--m", default="4000:6000:5", help="masses (kg), start:stop:num or v1,v2,...")
+    parser.add_argument("--longitudinal-derivatives", help="longitudinal stability derivatives json")
+    parser.add_argument("--lateral-derivatives", help="lateral stability derivatives json")
+    parser.add_argument("--flight-conditions", help="flightConditions.json of the nominal point")
+    parser.add_argument("--output", help="npz file receiving the schedule")
+    parser.add_argument("--load", help="npz schedule to load instead of building one")
+    parser.add_argument("--query", action="append", default=[], help="h,V,m point to interpolate (repeat)")
+    args = parser.parse_args()
+
+    if args.load:
+        schedule = GainSchedule.load(args.load)
+        summary = {"shape": list(schedule.shape)}
+    else:
+        derivatives = {"longitudinal": args.longitudinal_derivatives, "lateral": args.lateral_derivatives}
+        nominal = {
+            axis: load_nominal(axis, [derivatives[axis] or DEFAULT_FILES[axis][0],
+                                      args.flight_conditions or DEFAULT_FILES[axis][1]])
+            for axis in derivatives
+        }
+        grid = {"h": parse_range(args.h), "V": parse_range(args.V), "m": parse_range(args.m)}
+        schedule, summary = build_schedule(grid, load_geometry(), nominal)
+
+    if args.output:
+        schedule.save(args.output)
+
+    if args.query:
+        points = np.array([[float(value) for value in item.split(",")] for item in args.query])
+        models = schedule.lookup(points[:, 0], points[:, 1], points[:, 2])
+        summary["queries"] = [
+            {"h": h, "V": V, "m": m,
+             "models": {f"{axis}.{name}": matrices[index].tolist() for (axis, name), matrices in models.items()}}
+            for index, (h, V, m) in enumerate(points.tolist())
+        ]
+
+    json.dump(summary, sys.stdout, indent=2)
+    print()
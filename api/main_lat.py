@@ -1,169 +1,225 @@
+import time
+
+# the imports are reported as a span with --timings
+IMPORT_START = (time.perf_counter(), time.process_time())
+
+import argparse
 import os
 import re
 import sys
-sys.path.append("api/calculation/src/")
-from calculation.src.airplane import Airplane
+import numpy as np
+from calculation.src.pipeline import analyse, load_geometry
+from service.encoding import encode_arrays
+from service.export import export_json, matrix_bundle
+from service.instrumentation import command_line_instrumentation, span
+from service.protocol import ndjson_writer, stream_analysis
 import json
 
-def process_data():
+IMPORT_TIME = (time.perf_counter() - IMPORT_START[0], time.process_time() - IMPORT_START[1])
 
-    try:
-        # Read the contents of the latMatrix.json file
-        with open("latMatrix.json", "r") as f:
-            matrix_content = json.load(f)
 
-        # Return the file in the response
-        return {
-            "success": True,
-            "data": matrix_content,
-            "headers": {
-                "Content-Disposition": f"attachment; filename={os.path.basename('latMatrix.json')}",
-                "Content-Type": "application/json"
-            }
+def process_data(airplane, export=None):
+    '''
+    :param airplane: analysed Airplane
+    :param export: folder to also write the matrices to, as a latMatrix-<unique id>.json file per request
+    :return: response with the aircraft and control matrices (kept in memory, no file is read back)
+    '''
+
+    try:
+        matrix_content = matrix_bundle(airplane)
+
+        filename = "latMatrix.json"
+        response = {"success": True, "data": matrix_content}
+        if export:
+            response["path"] = export_json(matrix_content, export, "latMatrix")
+            filename = os.path.basename(response["path"])
+
+        # Return the matrices in the response
+        response["headers"] = {
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Type": "application/json"
         }
+        return response
+
     except Exception as e:
         print("Error:", e)
-        return {"success": False, "error": "Vérifier que les fichiers sont bien au bon format et dans le bon ordre. Voir README.md"}
-
-
-# create function that put aircraft matrix and control matrix in a txt file
-
-def write_matrix(aircraft_matrix, control_matrix):
-    # Write both matrices to a JSON file
-    with open("latMatrix.json", "w") as f:
-        matrix = {
-            "aircraft_matrix": aircraft_matrix.tolist(),
-            "control_matrix": control_matrix.tolist()
+        return {
+            "success":
+            False,
+            "error":
+            "Vérifier que les fichiers sont bien au bon format et dans le bon ordre. Voir README.md",
         }
 
-        json.dump(matrix, f)
 
 def replacer(data_file):
     data_file = re.sub(r'\s+', '', data_file)
     return data_file
 
 
-# collect sys arg as a string
-data_str1 = sys.argv[1] # latgitudinalSD.json
-data_str2 = sys.argv[2] # flightConditions.json
-
-
-data_str1 = data_str1.replace('\\r', '').replace('\\n', ''). replace(' ', '').replace('\\', '')
-data_str2 = data_str2.replace('\\r', '').replace('\\n', ''). replace(' ', '').replace('\\', '')
+def clean_input(data_str):
+    # the API passes the files as JSON-escaped strings
+    data_str = data_str.replace('\\r', '').replace('\\n', ''). replace(' ', '').replace('\\', '')
 
-# remove any extra spaces
-data_str1 = replacer(data_str1)
-data_str2 = replacer(data_str2)
+    # remove any extra spaces
+    data_str = replacer(data_str)
 
-# match exactly if there is a ',n'
-data_str1 = re.sub(r',n', ',', data_str1)
-data_str2 = re.sub(r',n', ',', data_str2)
+    # match exactly if there is a ',n'
+    data_str = re.sub(r',n', ',', data_str)
 
-# match exactly if there is a 'r,'
-data_str1 = re.sub(r',r', ',', data_str1)
-data_str2 = re.sub(r',r', ',', data_str2)
+    # match exactly if there is a 'r,'
+    data_str = re.sub(r',r', ',', data_str)
 
+    return data_str
 
-# do something with file1 and file2
-print(f"Contents of file1: {data_str1}")
-print(f"Contents of file2: {data_str2}")
 
+def print_mode_parameters(airplane, mode):
+    eigenvalues = airplane.get_lateral_eigenvalues()
 
-data = [data_str2, data_str1]
+    if mode == 'Rolling':
+        print("\nRolling mode parameter:")
+        print("Lambda_roll", eigenvalues[airplane.modes['Rolling']])
 
-# open geometricData/geometric.json
-with open("calculation/flights/geometricData/geometric.json", "r") as f:
-    geometric_content = json.load(f)
+    elif mode == 'Spiral':
+        print("\nSpiral mode parameter:")
+        print("Lambda_spiral", eigenvalues[airplane.modes['Spiral']])
 
-S = geometric_content["S"]["value"]  # Wing area
-A = geometric_content["AR"]["value"]  # Aspect ratio
-lambda_ = 0.5  # Taper ratio
-b = geometric_content["b"]["value"]  # Wingspan
-c_mean = geometric_content["c"]["value"] # Mean chord
-e = geometric_content["e"]["value"]  # Oswald factor
+    elif mode == 'Dutch Roll':
+        lambda_dutch = eigenvalues[airplane.modes['Dutch Roll']]
+        wn_dutch_roll = np.sqrt(lambda_dutch.real ** 2 + lambda_dutch.imag ** 2)
+        zeta_dutch_roll = - lambda_dutch.real / wn_dutch_roll
 
-# CAUTION
-# IF YOU WANT TO USE THE DEFAULT FILES, JUST PUT "None" FOR THE LAST ARGUMENT
-airplane = Airplane("Business JET", S, A, lambda_, b, c_mean, e, "lateral", data)
+        print("\nDutch roll mode parameters:")
+        print("(Natural frequency) wn_dutch_roll = ", wn_dutch_roll)
+        print("(Damping factor) zeta_dutch_roll = ", zeta_dutch_roll)
 
 
-print("================================")
+def format_plot(name, plot):
+    # png plots are sent as ImageData<name><base64>name, data-only plots as ModeData<name><json>name
+    if isinstance(plot, dict):
+        return f"ModeData{name}<{json.dumps(encode_arrays(plot))}>{name}"
+    return f"ImageData{name}<{plot}>{name}"
 
-print("Aircraft matrix for longitudinal stability:\n")
-airplane.get_lateral_aircraft_matrix()
-print(airplane.aircraft_matrix)
 
-print("================================")
+def report(airplane):
+    '''
+    Print the results of a lateral analysis
+    '''
 
-print("Control matrix (Rudder/Throttle) for lateral stability")
-airplane.get_lateral_control_matrix()
-print(airplane.control_matrix)
+    # without scientific notation (also when the analysis comes from the cache)
+    np.set_printoptions(suppress=True)
 
-print("================================")
+    print("================================")
 
-print("Eigen values:")
-airplane.set_lateral_eigenvalues()
-airplane.set_lateral_eigenvectors()
-airplane.set_lateral_characteristic_equation()
-print(airplane.get_lateral_eigenvalues())
-poly = airplane.get_lateral_characteristic_equation()
-print("\nLateral Characteristic equation:")
-for i in range(len(poly) - 1):
-    print(abs(poly[-1 - i]), "* s^", len(poly) - i - 1, " + ", end="")
-print(abs(poly[0]))
-print("================================")
+    print("Aircraft matrix for longitudinal stability:\n")
+    print(airplane.aircraft_matrix)
 
+    print("================================")
 
-# print("--------------------------------")
-#
-# print("Exemple to get a cruise condition")
-# print("U0 = ", airplane.get_cruise_condition("V"))
-#
-# print("--------------------------------")
+    print("Control matrix (Rudder/Throttle) for lateral stability")
+    print(airplane.control_matrix)
 
+    print("================================")
 
-# print("Parameters")
-# params = ["Xu", "Xw", "Zu", "Zw", "Zw_dot", "Zq", "Mu", "Mw", "Mw_dot", "Mq"]
-# for param in params:
-#     print(param, " = ", getattr(airplane, param))
-# print("--------------------------------")
+    print("Eigen values:")
+    print(airplane.get_lateral_eigenvalues())
+    poly = airplane.get_lateral_characteristic_equation()
+    print("\nLateral Characteristic equation:")
+    for i in range(len(poly) - 1):
+        print(abs(poly[-1 - i]), "* s^", len(poly) - i - 1, " + ", end="")
+    print(abs(poly[0]))
+    print("================================")
 
 
-TFs = airplane.set_lateral_transfer_functions()
+    # print("--------------------------------")
+    #
+    # print("Exemple to get a cruise condition")
+    # print("U0 = ", airplane.get_cruise_condition("V"))
+    #
+    # print("--------------------------------")
 
-print(f"Transfer functions for Aileron:\n")
-fct_name = ["u(s)/delta_a(s)", "w(s)/delta_a(s)", "q(s)/delta_a(s)", "theta(s)/delta_a(s)"]
-for i, tf in enumerate(TFs["aileron"]):
-    print(f"{i}->{fct_name[i]}:\n {tf}")
-    print("\n")
 
-print(f"Transfer functions for Rudder:\n")
-fct_name = ["u(s)/delta_r(s)", "w(s)/delta_r(s)", "q(s)/delta_r(s)", "theta(s)/delta_r(s)"]
-for i, tf in enumerate(TFs["rudder"]):
-    print(f"{i}->{fct_name[i]}:\n {tf}")
-    print("\n")
-print("================================")
+    # print("Parameters")
+    # params = ["Xu", "Xw", "Zu", "Zw", "Zw_dot", "Zq", "Mu", "Mw", "Mw_dot", "Mq"]
+    # for param in params:
+    #     print(param, " = ", getattr(airplane, param))
+    # print("--------------------------------")
 
-# airplane.lat_plot_stability("Rolling")
-# airplane.lat_plot_stability("Spiral")
-# airplane.lat_plot_stability("Dutch Roll")
 
-# #
-data = airplane.lat_plot_stability("Rolling")
-print(f"ImageDataRolling<{data}>Rolling")
-data2 = airplane.lat_plot_stability("Spiral")
-print(f"ImageDataSpiral<{data2}>Spiral")
-data3 = airplane.lat_plot_stability("Dutch Roll")
-print(f"ImageDataDutchRoll<{data3}>DutchRoll")
+    TFs = airplane.tf
 
+    print(f"Transfer functions for Aileron:\n")
+    fct_name = ["u(s)/delta_a(s)", "w(s)/delta_a(s)", "q(s)/delta_a(s)", "theta(s)/delta_a(s)"]
+    for i, tf in enumerate(TFs["aileron"]):
+        print(f"{i}->{fct_name[i]}:\n {tf}")
+        print("\n")
 
+    print(f"Transfer functions for Rudder:\n")
+    fct_name = ["u(s)/delta_r(s)", "w(s)/delta_r(s)", "q(s)/delta_r(s)", "theta(s)/delta_r(s)"]
+    for i, tf in enumerate(TFs["rudder"]):
+        print(f"{i}->{fct_name[i]}:\n {tf}")
+        print("\n")
+    print("================================")
 
-# write_matrix(airplane.aircraft_matrix, airplane.control_matrix)
+    for mode, name in [("Rolling", "Rolling"), ("Spiral", "Spiral"), ("Dutch Roll", "DutchRoll")]:
+        print_mode_parameters(airplane, mode)
+        if mode in airplane.plots:
+            print(format_plot(name, airplane.plots[mode]))
 
-# process_data()
 
+def run(data_str1, data_str2, geometric_content, plots="png", decimate=1, write=None, export=None):
+    '''
+    Run the lateral analysis and print the results, the matrices are returned in memory and nothing is written to
+    the working directory
+    :param data_str1: content of lateralSD.json as sent by the API
+    :param data_str2: content of flightConditions.json as sent by the API
+    :param geometric_content: parsed geometric.json
+    :param plots: "png" (base64 images), "data" (typed arrays of the responses) or "none"
+    :param decimate: keep one sample out of decimate in "data" plots
+    :param write: function receiving the NDJSON records of the streaming protocol (service/protocol.py)
+    as each stage finishes, instead of printing the text report at the end
+    :param export: folder to also write the matrices to (one unique file per run)
+    :return: the process_data response with the matrices
+    '''
 
+    data_str1 = clean_input(data_str1)
+    data_str2 = clean_input(data_str2)
+
+    if write is not None:
+        airplane = stream_analysis("lateral", [data_str2, data_str1], geometric_content, write, plots, decimate)
+        return None if airplane is None else process_data(airplane, export)
 
+    # do something with file1 and file2
+    print(f"Contents of file1: {data_str1}")
+    print(f"Contents of file2: {data_str2}")
 
 
+    data = [data_str2, data_str1]
+
+    # the analysis is answered from the result cache when the same files were already analysed
+    airplane = analyse("lateral", data, geometric_content, plots, decimate)
 
+    with span("report"):
+        report(airplane)
+
+    return process_data(airplane, export)
+
+
+if __name__ == "__main__":
+    # collect sys arg as a string
+    parser = argparse.ArgumentParser(description="Lateral stability analysis")
+    parser.add_argument("file1", help="lateralSD.json content")
+    parser.add_argument("file2", help="flightConditions.json content")
+    parser.add_argument("--plots", choices=["png", "data", "none"], default="png",
+                        help="png images, data-only responses (float32 arrays) or no plots")
+    parser.add_argument("--decimate", type=int, default=1, help="keep one sample out of N in data-only plots")
+    parser.add_argument("--format", choices=["text", "ndjson"], default="text",
+                        help="text report, or one json record per finished stage (streaming protocol)")
+    parser.add_argument("--export", help="folder to also write the matrices to, as a unique json file per run")
+    parser.add_argument("--timings", action="store_true", help="print the wall/cpu time of every stage on stderr")
+    parser.add_argument("--memory", action="store_true", help="also measure the peak memory of every stage")
+    parser.add_argument("--profile", help="cprofile:PATH or tracemalloc:PATH, dump a profile of the run")
+    args = parser.parse_args()
+
+    with command_line_instrumentation(args.timings, args.memory, args.profile, IMPORT_TIME):
+        run(args.file1, args.file2, load_geometry(), args.plots, args.decimate,
+            ndjson_writer(sys.stdout) if args.format == "ndjson" else None, args.export)
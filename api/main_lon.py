@@ -1,34 +1,47 @@
+import time
+
+# the imports are reported as a span with --timings
+IMPORT_START = (time.perf_counter(), time.process_time())
+
+import argparse
 import json
 import os
 import re
 import sys
 
-import sympy
-from control.matlab import bode
-from matplotlib import pyplot as plt
+import numpy as np
 
-from calculation.src.airplane import Airplane
+from calculation.src.pipeline import analyse, load_geometry
+from service.encoding import encode_arrays
+from service.export import export_json, matrix_bundle
+from service.instrumentation import command_line_instrumentation, span
+from service.protocol import ndjson_writer, stream_analysis
 
-sys.path.append("api/calculation/src/")
+IMPORT_TIME = (time.perf_counter() - IMPORT_START[0], time.process_time() - IMPORT_START[1])
 
 
-def process_data():
+def process_data(airplane, export=None):
+    '''
+    :param airplane: analysed Airplane
+    :param export: folder to also write the matrices to, as a longMatrix-<unique id>.json file per request
+    :return: response with the aircraft and control matrices (kept in memory, no file is read back)
+    '''
 
     try:
-        # Read the contents of the longMatrix.json file
-        with open("longMatrix.json", "r") as f:
-            matrix_content = json.load(f)
-
-        # Return the file in the response
-        return {
-            "success": True,
-            "data": matrix_content,
-            "headers": {
-
-                "Content-Disposition": f"attachment; filename={os.path.basename('longMatrix.json')}",
-                "Content-Type": "application/json"
-            }
+        matrix_content = matrix_bundle(airplane)
+
+        filename = "longMatrix.json"
+        response = {"success": True, "data": matrix_content}
+        if export:
+            response["path"] = export_json(matrix_content, export, "longMatrix")
+            filename = os.path.basename(response["path"])
+
+        # Return the matrices in the response
+        response["headers"] = {
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Type": "application/json"
         }
+        return response
 
     except Exception as e:
         print("Error:", e)
@@ -40,153 +53,156 @@ def process_data():
         }
 
 
-
-def write_matrix(aircraft_matrix, control_matrix):
-    # Write both matrices to a JSON file
-    with open("longMatrix.json", "w") as f:
-        matrix = {
-            "aircraft_matrix": aircraft_matrix.tolist(),
-            "control_matrix": control_matrix.tolist(),
-        }
-
-        json.dump(matrix, f)
-
-
 def replacer(data_file):
     data_file = re.sub(r"\s+", "", data_file)
     return data_file
 
 
+def clean_input(data_str):
+    # the API passes the files as JSON-escaped strings
+    data_str = data_str.replace('\\r', '').replace('\\n', ''). replace(' ', '').replace('\\', '')
 
-# collect sys arg as a string
-data_str1 = sys.argv[1] # longitudinalSD.json
-data_str2 = sys.argv[2] # flightConditions.json
-
-
-#
-#
-data_str1 = data_str1.replace('\\r', '').replace('\\n', ''). replace(' ', '').replace('\\', '')
-data_str2 = data_str2.replace('\\r', '').replace('\\n', ''). replace(' ', '').replace('\\', '')
-
-# remove any extra spaces
-data_str1 = replacer(data_str1)
-data_str2 = replacer(data_str2)
-
-# match exactly if there is a ',n'
-data_str1 = re.sub(r',n', ',', data_str1)
-data_str2 = re.sub(r',n', ',', data_str2)
-
-# match exactly if there is a 'r,'
-data_str1 = re.sub(r',r', ',', data_str1)
-data_str2 = re.sub(r',r', ',', data_str2)
+    # remove any extra spaces
+    data_str = replacer(data_str)
 
+    # match exactly if there is a ',n'
+    data_str = re.sub(r',n', ',', data_str)
 
-# do something with file1 and file2
-# print(f"Contents of file1: {data_str1}")
-# print(f"Contents of file2: {data_str2}")
+    # match exactly if there is a 'r,'
+    data_str = re.sub(r',r', ',', data_str)
 
+    return data_str
 
-data = [data_str2, data_str1]
 
+def format_plot(name, plot):
+    # png plots are sent as ImageData<name><base64>name, data-only plots as ModeData<name><json>name
+    if isinstance(plot, dict):
+        return f"ModeData{name}<{json.dumps(encode_arrays(plot))}>{name}"
+    return f"ImageData{name}<{plot}>{name}"
 
-# Example to use the class
-# (the values are from a Business JET aircraft)
 
-# open geometricData/geometric.json
-with open("calculation/flights/geometricData/geometric.json", "r") as f:
-    geometric_content = json.load(f)
+def report(airplane_long):
+    '''
+    Print the results of a longitudinal analysis
+    '''
 
-S = geometric_content["S"]["value"]  # Wing area
-A = geometric_content["AR"]["value"]  # Aspect ratio
-lambda_ = 0.5  # Taper ratio
-b = geometric_content["b"]["value"]  # Wingspan
-c_mean = geometric_content["c"]["value"] # Mean chord
-e = geometric_content["e"]["value"]  # Oswald factor
+    # without scientific notation (also when the analysis comes from the cache)
+    np.set_printoptions(suppress=True)
 
-# CAUTION
-# IF YOU WANT TO USE THE DEFAULT FILES, JUST PUT "None" FOR THE LAST ARGUMENT
-airplane_long = Airplane("Business JET", S, A, lambda_, b, c_mean, e, "longitudinal", data)
+    print("================================")
 
-print("================================")
+    print("Aircraft matrix for longitudinal stability:\n")
+    print(airplane_long.aircraft_matrix)
 
-print("Aircraft matrix for longitudinal stability:\n")
-airplane_long.get_longitudinal_aicraft_matrix()
-print(airplane_long.aircraft_matrix)
+    print("================================")
 
-print("================================")
+    # print("Parameters")
+    # params = ["Xu", "Xw", "Zu", "Zw", "Zw_dot", "Zq", "Mu", "Mw", "Mw_dot", "Mq"]
+    # for param in params:
+    #     print(param, " = ", getattr(airplane_long, param))
+    # print("--------------------------------")
 
-# print("Parameters")
-# params = ["Xu", "Xw", "Zu", "Zw", "Zw_dot", "Zq", "Mu", "Mw", "Mw_dot", "Mq"]
-# for param in params:
-#     print(param, " = ", getattr(airplane_long, param))
-# print("--------------------------------")
+    print("Control matrix (Elevator/Throttle) for longitudinal stability")
+    print(airplane_long.get_long_stability_control_matrix())
 
-airplane_long.get_longitudinal_control_matrix()
-print("Control matrix (Elevator/Throttle) for longitudinal stability")
-print(airplane_long.get_long_stability_control_matrix())
+    print("================================")
 
-print("================================")
+    print("Eigen values:")
+    eigenvalues = airplane_long.get_eigenvalues()
+    print(f"Eigenvalues = {eigenvalues}")
+    poly = airplane_long.get_characteristic_equation()
+    print("\nCharacteristic equation:")
+    for i in range(len(poly) - 1):
+        print(abs(poly[-1 - i]), "* s^", len(poly) - i - 1, " + ", end="")
+    print(abs(poly[0]))
 
-print("Eigen values:")
-airplane_long.set_eigenvalues()
-airplane_long.set_eigenvectors()
-airplane_long.set_characteristic_equation()
-eigenvalues = airplane_long.get_eigenvalues()
-eigenvectors = airplane_long.get_eigenvectors()
-print(f"Eigenvalues = {eigenvalues}")
-poly = airplane_long.get_characteristic_equation()
-print("\nCharacteristic equation:")
-for i in range(len(poly) - 1):
-    print(abs(poly[-1 - i]), "* s^", len(poly) - i - 1, " + ", end="")
-print(abs(poly[0]))
+    print("================================")
 
-print("================================")
+    print("Natural frequencies:")
+    print(airplane_long.get_natural_frequency())
 
-airplane_long.set_natural_frequency()
-airplane_long.set_damping_ratio()
+    print("Damping ratios:")
+    print(airplane_long.get_damping_ratio())
 
-print("Natural frequencies:")
-print(airplane_long.get_natural_frequency())
+    print("================================")
 
-print("Damping ratios:")
-print(airplane_long.get_damping_ratio())
+    print("Exemple to get a cruise condition")
+    print("U0 = ", airplane_long.get_cruise_condition("V"))
 
-print("================================")
 
-print("Exemple to get a cruise condition")
-print("U0 = ", airplane_long.get_cruise_condition("V"))
+    print("================================")
+    TFs = airplane_long.tf
 
+    print(f"Transfer functions for Throttle:\n")
+    fct_name = ["u(s)/delta_t(s)", "w(s)/delta_t(s)", "q(s)/delta_t(s)", "theta(s)/delta_t(s)"]
+    for i, tf in enumerate(TFs["throttle"]):
+        print(f"{i}-> {fct_name[i]}:\n {tf}")
+        print("\n")
 
-print("================================")
-TFs = airplane_long.set_long_transfer_functions()
+    print(f"Transfer functions for Elevator:\n")
+    fct_name = ["u(s)/delta_e(s)", "w(s)/delta_e(s)", "q(s)/delta_e(s)", "theta(s)/delta_e(s)"]
+    for i, tf in enumerate(TFs["elevator"]):
+        print(f"{i}-> {fct_name[i]}:\n {tf}")
+        print("\n")
 
-print(f"Transfer functions for Throttle:\n")
-fct_name = ["u(s)/delta_t(s)", "w(s)/delta_t(s)", "q(s)/delta_t(s)", "theta(s)/delta_t(s)"]
-for i, tf in enumerate(TFs["throttle"]):
-    print(f"{i}-> {fct_name[i]}:\n {tf}")
-    print("\n")
 
-print(f"Transfer functions for Elevator:\n")
-fct_name = ["u(s)/delta_e(s)", "w(s)/delta_e(s)", "q(s)/delta_e(s)", "theta(s)/delta_e(s)"]
-for i, tf in enumerate(TFs["elevator"]):
-    print(f"{i}-> {fct_name[i]}:\n {tf}")
-    print("\n")
+    print("================================")
 
+    # # short_period or phugoid
 
-print("================================")
+    if "phugoid" in airplane_long.plots:
+        print(format_plot("Phugoid", airplane_long.plots["phugoid"]))
+    if "short_period" in airplane_long.plots:
+        print(format_plot("Short", airplane_long.plots["short_period"]))
 
-# # short_period or phugoid
 
-data = airplane_long.lon_plot_stability("phugoid")
-print(f"ImageDataPhugoid<{data}>Phugoid")
-data2 = airplane_long.lon_plot_stability("short_period")
-print(f"ImageDataShort<{data2}>Short")
+def run(data_str1, data_str2, geometric_content, plots="png", decimate=1, write=None, export=None):
+    '''
+    Run the longitudinal analysis and print the results, the matrices are returned in memory and nothing is written to
+    the working directory
+    :param data_str1: content of longitudinalSD.json as sent by the API
+    :param data_str2: content of flightConditions.json as sent by the API
+    :param geometric_content: parsed geometric.json
+    :param plots: "png" (base64 images), "data" (typed arrays of the responses) or "none"
+    :param decimate: keep one sample out of decimate in "data" plots
+    :param write: function receiving the NDJSON records of the streaming protocol (service/protocol.py)
+    as each stage finishes, instead of printing the text report at the end
+    :param export: folder to also write the matrices to (one unique file per run)
+    :return: the process_data response with the matrices
+    '''
 
+    data = [clean_input(data_str2), clean_input(data_str1)]
 
+    if write is not None:
+        airplane_long = stream_analysis("longitudinal", data, geometric_content, write, plots, decimate)
+        return None if airplane_long is None else process_data(airplane_long, export)
 
+    # (the values are from a Business JET aircraft)
+    # the analysis is answered from the result cache when the same files were already analysed
+    airplane_long = analyse("longitudinal", data, geometric_content, plots, decimate)
 
+    with span("report"):
+        report(airplane_long)
 
-write_matrix(airplane_long.aircraft_matrix, airplane_long.control_matrix)
+    return process_data(airplane_long, export)
 
 
-process_data()
+if __name__ == "__main__":
+    # collect sys arg as a string
+    parser = argparse.ArgumentParser(description="Longitudinal stability analysis")
+    parser.add_argument("file1", help="longitudinalSD.json content")
+    parser.add_argument("file2", help="flightConditions.json content")
+    parser.add_argument("--plots", choices=["png", "data", "none"], default="png",
+                        help="png images, data-only responses (float32 arrays) or no plots")
+    parser.add_argument("--decimate", type=int, default=1, help="keep one sample out of N in data-only plots")
+    parser.add_argument("--format", choices=["text", "ndjson"], default="text",
+                        help="text report, or one json record per finished stage (streaming protocol)")
+    parser.add_argument("--export", help="folder to also write the matrices to, as a unique json file per run")
+    parser.add_argument("--timings", action="store_true", help="print the wall/cpu time of every stage on stderr")
+    parser.add_argument("--memory", action="store_true", help="also measure the peak memory of every stage")
+    parser.add_argument("--profile", help="cprofile:PATH or tracemalloc:PATH, dump a profile of the run")
+    args = parser.parse_args()
+
+    with command_line_instrumentation(args.timings, args.memory, args.profile, IMPORT_TIME):
+        run(args.file1, args.file2, load_geometry(), args.plots, args.decimate,
+            ndjson_writer(sys.stdout) if args.format == "ndjson" else None, args.export)
@@ -0,0 +1,83 @@
+'''
+Monte Carlo uncertainty propagation of the stability derivatives.
+
+Run it from the api/ folder, every uncertain coefficient is given with its standard deviation
+(around the nominal value of the json files) or with an explicit distribution:
+    py -m main_monte_carlo longitudinal --normal C_m_alpha=0.05 --normal C_m_q=1.5 --samples 1000000
+    py -m main_monte_carlo lateral --uniform C_N_beta=0.06:0.1 --distributions distributions.json
+distributions.json maps a name to {"distribution": "normal", "sigma": s} or
+{"distribution": "uniform", "low": l, "high": h}.
+The distributions of the damping ratio and natural frequency of every mode and the probability
+of instability are printed as json.
+'''
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from calculation.src.pipeline import load_geometry
+from batch.envelope_sweep import DEFAULT_FILES, load_nominal, report_progress
+from batch.monte_carlo import monte_carlo
+from batch.result_store import ResultStore
+
+
+def parse_distributions(normal, uniform):
+    distributions = {}
+    for item in normal:
+        name, _, values = item.partition("=")
+        if ":" in values:
+            mean, sigma = values.split(":")
+            distributions[name] = {"distribution": "normal", "mean": float(mean), "sigma": float(sigma)}
+        else:
+            distributions[name] = {"distribution": "normal", "sigma": float(values)}
+    for item in uniform:
+        name, _, values = item.partition("=")
+        low, high = values.split(":")
+        distributions[name] = {"distribution": "uniform", "low": float(low), "high": float(high)}
+    return distributions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo propagation of stability derivative uncertainty")
+    parser.add_argument("axis", choices=["longitudinal", "lateral"])
+    parser.add_argument("--normal", action="append", default=[],
+                        help="name=sigma (around the nominal value) or name=mean:sigma")
+    parser.add_argument("--uniform", action="append", default=[], help="name=low:high")
+    parser.add_argument("--distributions", help="json file of distributions")
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--flight-conditions", help="flightConditions.json of the nominal point")
+    parser.add_argument("--stability-derivatives", help="stability derivatives json of the nominal point")
+    parser.add_argument("--workers", type=int, help="number of processes, one per core by default")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="samples per chunk")
+    parser.add_argument("--output", help="npz file receiving the samples and the per sample mode parameters")
+    parser.add_argument("--store", help="result store directory receiving the samples, matrices and modal results of "
+                                        "every chunk as it completes (see batch/result_store.py)")
+    args = parser.parse_args()
+
+    distributions = {}
+    if args.distributions:
+        with open(args.distributions, "r") as f:
+            distributions = json.load(f)
+    distributions.update(parse_distributions(args.normal, args.uniform))
+    if not distributions:
+        parser.error("give at least one --normal, --uniform or a --distributions file")
+
+    files = [args.stability_derivatives or DEFAULT_FILES[args.axis][0],
+             args.flight_conditions or DEFAULT_FILES[args.axis][1]]
+
+    store = None
+    if args.store:
+        store = ResultStore.create(args.store, args.axis, metadata={"distributions": distributions})
+
+    report, samples, modes = monte_carlo(args.axis, distributions, load_geometry(), args.samples, args.seed,
+                                         load_nominal(args.axis, files), args.workers, args.chunk_size,
+                                         report_progress, store)
+
+    if args.output:
+        np.savez(args.output, **samples, **{f"{mode}.{name}": values for mode, parameters in modes.items()
+                                            for name, values in parameters.items()})
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
@@ -0,0 +1,63 @@
+'''
+Root locus of one feedback path.
+
+Run it from the api/ folder, the gains are a "start:stop:num" range or a "v1,v2,..." list:
+    py -m main_root_locus longitudinal --path q:elevator --gains=-5:5:1000
+    py -m main_root_locus lateral --path r:rudder --gains=-10:0:500 --output yaw_damper.npz
+The feedback is control = -k * state. The closed-loop eigenvalues of every gain are computed in one batch, the
+gain steps where a branch moves fast are refined and the eigenvalues are reordered into continuous branches.
+'''
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from calculation.src.pipeline import build_matrices, load_geometry
+from batch.envelope_sweep import DEFAULT_FILES, parse_range
+
+
+def complex_list(values):
+    return [[float(value.real), float(value.imag)] for value in values]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Closed-loop eigenvalues of a feedback path over a gain range")
+    parser.add_argument("axis", choices=["longitudinal", "lateral"])
+    parser.add_argument("--path", help="state:control fed back, q:elevator (longitudinal) or r:rudder (lateral) "
+                                       "by default")
+    parser.add_argument("--gains", default="-5:5:1000", help="gains, start:stop:num or v1,v2,...")
+    parser.add_argument("--resolution", type=float, default=0.01,
+                        help="largest branch move between two gains, relative to the size of the locus")
+    parser.add_argument("--stability-derivatives", help="stability derivatives json")
+    parser.add_argument("--flight-conditions", help="flightConditions.json")
+    parser.add_argument("--output", help="npz file receiving the gains and the branches")
+    args = parser.parse_args()
+
+    path = args.path or ("q:elevator" if args.axis == "longitudinal" else "r:rudder")
+    files = [args.stability_derivatives or DEFAULT_FILES[args.axis][0],
+             args.flight_conditions or DEFAULT_FILES[args.axis][1]]
+    user_file = []
+    for name in files:
+        with open(name, "r") as f:
+            user_file.append(json.load(f))
+
+    # the root locus only needs the aircraft and control matrices
+    airplane = build_matrices(args.axis, user_file, load_geometry())
+    locus = airplane.set_root_locus(path, parse_range(args.gains), args.resolution)
+
+    if args.output:
+        np.savez(args.output, gains=locus["gains"], branches=locus["branches"], open_loop=locus["open_loop"])
+
+    json.dump({
+        "axis": args.axis,
+        "path": path,
+        "points": len(locus["gains"]),
+        "gains": [float(locus["gains"][0]), float(locus["gains"][-1])],
+        "open_loop": complex_list(locus["open_loop"]),
+        "branches": [{"start": complex_list(locus["branches"][0])[branch],
+                      "end": complex_list(locus["branches"][-1])[branch]}
+                     for branch in range(locus["branches"].shape[1])],
+        "crossings": locus["crossings"],
+    }, sys.stdout, indent=2)
+    print()
@@ -0,0 +1,43 @@
+'''
+HTTP server of the stability pipeline.
+
+Start it from the api/ folder:
+    py -m main_server --port 8000
+    curl -X POST localhost:8000/longitudinal -d '{"stability_derivatives": {...}, "flight_conditions": {...}}'
+See calculation/src/service/http_server.py for the endpoints and the answer format.
+'''
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+from calculation.src.pipeline import load_geometry
+from service.http_server import serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aircraft stability HTTP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread",
+                        help="run the analyses in threads (shared result cache) or in processes")
+    parser.add_argument("--workers", type=int, help="analyses running at once, one per cpu by default")
+    parser.add_argument("--max-pending", type=int,
+                        help="different analyses queued or running before answering 503, twice the workers by default")
+    parser.add_argument("--geometry", default="calculation/flights/geometricData/geometric.json",
+                        help="geometric data of the aircraft")
+    args = parser.parse_args()
+
+    def ready(address):
+        print(f"listening on http://{address[0]}:{address[1]}", file=sys.stderr, flush=True)
+
+    try:
+        asyncio.run(serve(load_geometry(args.geometry), args.host, args.port, args.executor, args.workers,
+                          args.max_pending, os.environ.get("AS_EXPORT_DIR") or tempfile.gettempdir(), ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+'''
+Flight-envelope sweep.
+
+Run it from the api/ folder, every swept field is a "start:stop:num" range or a "v1,v2,..." list:
+    py -m main_sweep longitudinal --range h=0:12000:25 --range V=100:250:31 --range m=4000:6000:5
+    py -m main_sweep lateral --points points.json --output sweep.npz
+The grid is every combination of the ranges (or the points of the json list), the other cruise conditions
+and stability derivatives come from the bundled files (or --flight-conditions/--stability-derivatives).
+Chunks of the grid are spread over one process per core, progress and throughput are reported on stderr.
+Every eigenvalue is labelled with its mode (analysis/modal_analysis.py), the labels stay consistent between
+neighbouring grid points and the summary gives the ranges of every mode.
+With --store DIR every chunk is written to a memory-mapped result store as it completes, read it back with
+    store = ResultStore.open(DIR)
+    rows = store.select(["eigenvalues", "Dutch Roll.damping_ratio"], h=(0, 3000), V=(100, 150))
+'''
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from calculation.src.pipeline import load_geometry
+from analysis.modal_analysis import grid_neighbours, mode_parameters, track_modes
+from batch.envelope_sweep import DEFAULT_FILES, build_grid, load_nominal, load_points, parse_range, run_sweep
+from batch.result_store import ResultStore, mode_columns
+
+
+def parse_ranges(ranges):
+    axes = {}
+    for item in ranges:
+        name, _, values = item.partition("=")
+        if not values:
+            raise argparse.ArgumentTypeError(f"expected name=start:stop:num or name=v1,v2,... got {item}")
+        axes[name] = parse_range(values)
+    return axes
+
+
+def summary(axis, inputs, results):
+    '''
+    :return: json friendly extent of the sweep, stable/unstable counts and modal ranges, overall and per mode
+    '''
+    unstable = np.any(results["eigenvalues"].real > 0, axis=-1)
+    modes = mode_parameters(results["eigenvalues"], results["mode_labels"], axis)
+    return {
+        "points": int(len(unstable)),
+        "inputs": {name: [float(column.min()), float(column.max())] for name, column in inputs.items()},
+        "unstable_points": int(unstable.sum()),
+        "natural_frequency": [float(np.nanmin(results["natural_frequency"])),
+                              float(np.nanmax(results["natural_frequency"]))],
+        "damping_ratio": [float(np.nanmin(results["damping_ratio"])), float(np.nanmax(results["damping_ratio"]))],
+        "modes": {
+            mode: {
+                "natural_frequency": [float(np.nanmin(values["natural_frequency"])),
+                                      float(np.nanmax(values["natural_frequency"]))],
+                "damping_ratio": [float(np.nanmin(values["damping_ratio"])),
+                                  float(np.nanmax(values["damping_ratio"]))],
+                "unstable_points": int(values["unstable"].sum()),
+            }
+            for mode, values in modes.items()
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stability analysis over a grid of flight conditions")
+    parser.add_argument("axis", choices=["longitudinal", "lateral"])
+    parser.add_argument("--range", action="append", default=[], dest="ranges",
+                        help="swept field, name=start:stop:num or name=v1,v2,... (repeat for every field)")
+    parser.add_argument("--points", help="json list of points instead of a grid, e.g. [{\"h\": 0, \"V\": 120}]")
+    parser.add_argument("--flight-conditions", help="flightConditions.json of the nominal point")
+    parser.add_argument("--stability-derivatives", help="stability derivatives json of the nominal point")
+    parser.add_argument("--workers", type=int, help="number of processes, one per core by default")
+    parser.add_argument("--chunk-size", type=int, help="points per chunk")
+    parser.add_argument("--output", help="npz file receiving the inputs, matrices and modal results of every point")
+    parser.add_argument("--store", help="result store directory receiving every chunk as it completes, the matrices "
+                                        "are then not kept in memory (see batch/result_store.py)")
+    args = parser.parse_args()
+
+    if args.points:
+        grid = load_points(args.points)
+        # the points are tracked in the order of the file
+        neighbours = None
+    elif args.ranges:
+        axes = parse_ranges(args.ranges)
+        grid = build_grid(axes)
+        neighbours = grid_neighbours([len(values) for values in axes.values()])
+    else:
+        parser.error("give at least one --range or a --points file")
+
+    files = [args.stability_derivatives or DEFAULT_FILES[args.axis][0],
+             args.flight_conditions or DEFAULT_FILES[args.axis][1]]
+
+    store = None
+    keep = None
+    if args.store:
+        store = ResultStore.create(args.store, args.axis, metadata={"sweep": sorted(grid)})
+        keep = ("eigenvalues", "natural_frequency", "damping_ratio", "mode_labels", "mode_margin")
+
+    inputs, results = run_sweep(args.axis, grid, load_geometry(), load_nominal(args.axis, files),
+                                workers=args.workers, chunk_size=args.chunk_size,
+                                on_chunk=store.append if store else None, keep=keep)
+    # the points whose modes are ambiguous take the labels of their neighbour in the grid
+    labels = track_modes(results["eigenvalues"], results["mode_labels"], results["mode_margin"], neighbours)
+    if store:
+        changed = np.flatnonzero(np.any(labels != results["mode_labels"], axis=-1))
+        if len(changed):
+            store.update(changed, {"mode_labels": labels[changed],
+                                   **mode_columns(args.axis, {"eigenvalues": results["eigenvalues"][changed],
+                                                              "mode_labels": labels[changed]})})
+    results["mode_labels"] = labels
+
+    if args.output:
+        np.savez(args.output, **inputs, **results)
+
+    json.dump(summary(args.axis, inputs, results), sys.stdout, indent=2)
+    print()
@@ -0,0 +1,178 @@
+'''
+Long-lived compute worker for the API.
+
+Start it from the api/ folder with `py -m main_worker` (requests on stdin, answers on stdout)
+or `py -m main_worker --socket /tmp/as-worker.sock` (requests on a local unix socket).
+
+Requests and answers are framed as one JSON object per line:
+    request: {"id": 1, "selected": 0, "file1": "...", "file2": "...", "plots": "png", "decimate": 1}
+    answer:  {"id": 1, "success": true, "result": "..."}
+"selected" is 0 for the longitudinal axis, 1 for the lateral axis and 2 for both (main_combined, with the
+lateral stability derivatives in "file3"), file1/file2/file3 are the strings main_lon/main_lat/main_combined
+receive on their command line and result is the text they print.
+"plots" and "decimate" are optional, "plots": "data" sends the mode responses as typed arrays.
+"format": "ndjson" streams the results as they are computed: one {"id": 1, "record": {...}} line per
+finished stage (see service/protocol.py) before the answer, which then has no "result".
+"timings": true adds the wall/cpu time of every stage to the answer under "timings" ("memory": true also
+measures their peak memory) and "profile": "cprofile" or "tracemalloc" dumps a profile of the request
+to AS_PROFILE_DIR (the temporary folder by default) and gives its path under "profile".
+Every successful answer carries the aircraft and control matrices under "matrices" (nothing is written
+to the working directory) and "export": true also writes them to a unique file in AS_EXPORT_DIR
+(the temporary folder by default) whose path is given under "export".
+The heavy imports and geometric.json are loaded once when the worker starts and every answer carries
+the hit/miss counters of the result cache under "cache".
+'''
+import time
+
+STARTED = time.perf_counter()
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socketserver
+import sys
+import tempfile
+import traceback
+
+import main_combined
+import main_lat
+import main_lon
+from calculation.src.pipeline import load_geometry
+from service.instrumentation import instrument, profile
+from service.rendering import start_renderer, use_renderer
+from service.result_cache import default_cache
+
+RUNNERS = {
+    0: main_lon.run,
+    1: main_lat.run,
+    2: main_combined.run,
+}
+
+
+def profile_path(request, kind):
+    directory = os.environ.get("AS_PROFILE_DIR") or tempfile.gettempdir()
+    fd, path = tempfile.mkstemp(prefix=f"as-{os.getpid()}-{request.get('id')}-", suffix=f".{kind}", dir=directory)
+    os.close(fd)
+    return path
+
+
+def request_files(request):
+    # flight conditions and stability derivatives, the combined analysis also takes the lateral ones
+    if int(request["selected"]) == 2:
+        return [request["file1"], request["file2"], request["file3"]]
+    return [request["file1"], request["file2"]]
+
+
+def export_directory():
+    return os.environ.get("AS_EXPORT_DIR") or tempfile.gettempdir()
+
+
+def handle_request(request, geometric_content, write=None):
+    buffer = io.StringIO()
+    try:
+        runner = RUNNERS[int(request["selected"])]
+        answer = {"id": request.get("id"), "success": True}
+
+        with contextlib.ExitStack() as stack:
+            if request.get("profile"):
+                answer["profile"] = profile_path(request, request["profile"])
+                stack.enter_context(profile(request["profile"], answer["profile"]))
+            instrumentation = None
+            if request.get("timings") or request.get("memory"):
+                instrumentation = stack.enter_context(instrument(bool(request.get("memory"))))
+
+            stream = None
+            if request.get("format") == "ndjson" and write is not None:
+                def stream(record):
+                    if record["type"] == "end" and not record["success"]:
+                        answer.update(success=False, error="An error occurred.")
+                    write({"id": request.get("id"), "record": record})
+
+            with contextlib.redirect_stdout(buffer):
+                response = runner(*request_files(request), geometric_content,
+                                  request.get("plots", "png"), int(request.get("decimate", 1)), stream,
+                                  export_directory() if request.get("export") else None)
+
+        if response is not None and response["success"]:
+            answer["matrices"] = response["data"]
+            if "path" in response:
+                answer["export"] = response["path"]
+        if stream is None:
+            answer["result"] = buffer.getvalue()
+        answer["cache"] = default_cache().stats()
+        if instrumentation is not None:
+            answer["timings"] = instrumentation.timings()
+        return answer
+    except Exception:
+        traceback.print_exc(file=sys.stderr)
+        return {"id": request.get("id"), "success": False, "error": "An error occurred."}
+
+
+def serve(lines, write, geometric_content):
+    write({"event": "ready", "pid": os.getpid(), "startup": time.perf_counter() - STARTED})
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError:
+            write({"id": None, "success": False, "error": "Invalid request."})
+            continue
+        write(handle_request(request, geometric_content, write))
+
+
+def serve_stdio(geometric_content):
+    # keep a handle on the real stdout, the analyses print into their own buffer
+    out = sys.stdout
+
+    def write(message):
+        out.write(json.dumps(message) + "\n")
+        out.flush()
+
+    serve(sys.stdin, write, geometric_content)
+
+
+def serve_socket(path, geometric_content):
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            lines = (line.decode("utf-8") for line in self.rfile)
+
+            def write(message):
+                self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+            serve(lines, write, geometric_content)
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    # requests are answered one after another, concurrency comes from running several workers
+    with socketserver.UnixStreamServer(path, RequestHandler) as server:
+        server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aircraft stability compute worker")
+    parser.add_argument("--socket", help="serve requests on this unix socket instead of stdin/stdout")
+    parser.add_argument("--geometry", default="calculation/flights/geometricData/geometric.json",
+                        help="geometric data of the aircraft")
+    args = parser.parse_args()
+
+    geometric_content = load_geometry(args.geometry)
+    # the API runs one worker per cpu, each one draws its plots in threads rather than in its own process pool
+    use_renderer("thread")
+    start_renderer()
+
+    if args.socket:
+        serve_socket(args.socket, geometric_content)
+    else:
+        serve_stdio(geometric_content)
+
+
+if __name__ == "__main__":
+    main()